@@ -8,4 +8,8 @@ class AIGovernanceConfig(AppConfig):
 
     def ready(self):
         """Initialize AI governance components when Django starts"""
-        from . import signals  # noqa
+        from django.db.models.signals import post_migrate
+        from . import signals
+
+        post_migrate.connect(signals.publish_after_migrate, sender=self,
+                             dispatch_uid='ai_governance_publish_content_filters')
@@ -8,15 +8,58 @@ AI Code Governor - نظام حاكم متقدم للتحكم في نماذج ا
 """
 
 import ast
+import json
+import multiprocessing
+import os
 import re
 import subprocess
-from typing import Dict, List, Tuple, Any, Optional
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import cached_property
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple, Any, Optional
 from dataclasses import dataclass
 from enum import Enum
 import logging
 
+from .code_rules import AST_PATTERN_RULES, BlockFacts, collect_facts
+from .governance_rules import CompiledRules, get_governance_rules
+from .prompts import PROJECT_SPECIFIC_RULES, PromptTemplate, get_prompt_template
+from .utils.analysis_cache import AnalysisCache, get_analysis_cache
+from .utils.safe_regex import compile_safe
+
 logger = logging.getLogger('ai_governance.code_governor')
 
+CODE_BLOCK_RE = re.compile(r"```(?:python|py)?\n(.*?)\n```", re.DOTALL | re.IGNORECASE)
+INLINE_CODE_RE = re.compile(r"`([^`\n]+)`")
+PYTHON_KEYWORDS = ('def ', 'class ', 'import ', 'from ', 'if ', 'for ', 'while ', 'try:', 'except:')
+TEST_INDICATORS = ('test_', 'Test', 'pytest', 'unittest', 'assert', 'mock')
+CRITICAL_VIOLATION_WORDS = ('أمان', 'security', 'محظور', 'خطر')
+DEFAULT_ANALYSIS_CHUNK_SIZE = 32
+
+# يُرفع عند تغيير منطق التحليل حتى لا تُستخدم نتائج محفوظة من إصدار سابق
+ANALYSIS_VERSION = '1'
+
+ASSERT_RE = re.compile(r'assert\s+')
+MOCK_USAGE_RE = re.compile(r'mock\.|Mock\(|patch\(')
+DOCUMENTATION_COMMENT_RE = re.compile(r'#.*\w+')
+FUNCTION_DEF_RE = re.compile(r'def\s+(\w+)\s*\(')
+CLASS_DEF_RE = re.compile(r'class\s+(\w+)\s*\(')
+
+HARDCODED_PASSWORD_RE = compile_safe(r'password\s*=\s*[\'"][^\'"]+[\'"]', re.IGNORECASE)
+DANGEROUS_CALL_RE = compile_safe(r'\b(eval|exec)\s*\(', 0)
+SQL_INJECTION_RE = compile_safe(r'execute\s*\(\s*[\'"].*%.*[\'"]', 0)
+WILDCARD_IMPORT_RE = compile_safe(r'from\s+\*\s+import|import\s+\*', 0)
+
+
+def _looks_like_python(text: str) -> bool:
+    """النص كود Python حقيقي (يحتوي على كلمات مفتاحية Python)"""
+    return any(keyword in text for keyword in PYTHON_KEYWORDS)
+
+
+def _looks_like_test(text: str) -> bool:
+    """كتلة الكود تبدو اختباراً"""
+    return any(indicator in text for indicator in TEST_INDICATORS)
+
 
 class CodeQualityLevel(Enum):
     """مستويات جودة الكود"""
@@ -47,6 +90,78 @@ class CodeAnalysisResult:
     violations: List[str]
     suggestions: List[str]
     is_approved: bool
+    
+    def to_compact(self) -> str:
+        """تمثيل JSON مضغوط للتخزين في الكاش"""
+        return json.dumps([
+            self.has_code, self.has_tests, self.code_quality.value, self.test_quality.value,
+            self.coverage_estimate, self.violations, self.suggestions, self.is_approved,
+        ], ensure_ascii=False, separators=(',', ':'))
+    
+    @classmethod
+    def from_compact(cls, payload: str) -> 'CodeAnalysisResult':
+        (has_code, has_tests, code_quality, test_quality,
+         coverage_estimate, violations, suggestions, is_approved) = json.loads(payload)
+        return cls(
+            has_code=has_code,
+            has_tests=has_tests,
+            code_quality=CodeQualityLevel(code_quality),
+            test_quality=TestQualityLevel(test_quality),
+            coverage_estimate=coverage_estimate,
+            violations=violations,
+            suggestions=suggestions,
+            is_approved=is_approved,
+        )
+
+
+class CodeBlock(str):
+    """
+    كتلة كود مستخرجة من الاستجابة
+
+    تُحلل مرة واحدة فقط: شجرة AST ونتائج الأنماط ونتائج الفحوصات تُحفظ
+    على الكتلة نفسها لتتشاركها جميع مراحل التحليل
+    """
+
+    @cached_property
+    def tree(self) -> Optional[ast.AST]:
+        """شجرة AST للكتلة أو None إذا لم تكن كود Python صالح"""
+        try:
+            return ast.parse(self)
+        except SyntaxError:
+            return None
+
+    @cached_property
+    def facts(self) -> Optional[BlockFacts]:
+        """الحقائق البنيوية من مرور AST واحد (None للنص غير القابل للتحليل)"""
+        return collect_facts(self.tree) if self.tree is not None else None
+
+    @cached_property
+    def lowered(self) -> str:
+        return self.lower()
+
+    @cached_property
+    def assert_count(self) -> int:
+        if self.facts is not None:
+            return self.facts.assert_count
+        return len(ASSERT_RE.findall(self))
+
+    @cached_property
+    def _memo(self) -> Dict[Any, Any]:
+        return {}
+
+    def memoize(self, key: Any, compute: Callable[[], Any]) -> Any:
+        """حساب نتيجة فحص مرة واحدة لكل كتلة"""
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
+
+
+@dataclass
+class AnalysisContext:
+    """سياق تحليل استجابة واحدة: الكتل مستخرجة ومصنفة مرة واحدة"""
+    response: str
+    code_blocks: List[CodeBlock]
+    test_blocks: List[CodeBlock]
 
 
 @dataclass
@@ -64,10 +179,27 @@ class CodeGovernor:
     يضمن جودة الكود والاختبارات قبل السماح بالاستخدام
     """
     
-    def __init__(self):
+    def __init__(self, rules_path: Optional[str] = None, analysis_cache: Optional[AnalysisCache] = None):
         self.rules = self._load_governance_rules()
-        self.mandatory_patterns = self._load_mandatory_patterns()
-        self.forbidden_patterns = self._load_forbidden_patterns()
+        # الأنماط من governance/ai_governance_rules.yaml مجمّعة ومشتركة على مستوى العملية
+        self.rules_path = rules_path
+        self.compiled_rules = get_governance_rules(rules_path)
+        self.analysis_cache = analysis_cache if analysis_cache is not None else get_analysis_cache()
+    
+    @property
+    def mandatory_patterns(self) -> Dict[str, List[str]]:
+        """أنماط إجبارية يجب وجودها في الكود"""
+        return self.compiled_rules.mandatory_patterns
+    
+    @property
+    def forbidden_patterns(self) -> Dict[str, List[str]]:
+        """أنماط محظورة في الكود"""
+        return self.compiled_rules.forbidden_patterns
+    
+    def refresh_rules(self) -> CompiledRules:
+        """إعادة تحميل القواعد إذا تغير ملف الحوكمة (فحص stat فقط إذا لم يتغير)"""
+        self.compiled_rules = get_governance_rules(self.rules_path)
+        return self.compiled_rules
         
     def _load_governance_rules(self) -> List[AIGovernanceRule]:
         """تحميل قواعد الحوكمة"""
@@ -110,74 +242,38 @@ class CodeGovernor:
             )
         ]
     
-    def _load_mandatory_patterns(self) -> Dict[str, List[str]]:
-        """أنماط إجبارية يجب وجودها في الكود"""
-        return {
-            "test_patterns": [
-                r"def test_\w+\(",
-                r"class Test\w+\(",
-                r"@pytest\.",
-                r"assert\s+",
-                r"self\.assert\w+\("
-            ],
-            "security_patterns": [
-                r"@login_required",
-                r"@permission_required",
-                r"authenticate\(",
-                r"validate_\w+\(",
-                r"sanitize_\w+\("
-            ],
-            "documentation_patterns": [
-                r'"""[\s\S]*?"""',
-                r"# TODO:",
-                r"# FIXME:",
-                r"Args:",
-                r"Returns:"
-            ]
-        }
-    
-    def _load_forbidden_patterns(self) -> Dict[str, List[str]]:
-        """أنماط محظورة في الكود"""
-        return {
-            "fake_test_patterns": [
-                r"pass\s*$",
-                r"assert True",
-                r"assert 1 == 1",
-                r"# TODO: implement test",
-                r"# placeholder test",
-                r"mock\.return_value = True",
-                r"@patch.*return_value=True"
-            ],
-            "security_violations": [
-                r"eval\(",
-                r"exec\(",
-                r"__import__\(",
-                r"input\(\)",
-                r"raw_input\(\)",
-                r"shell=True",
-                r"password\s*=\s*['\"].*['\"]",
-                r"secret\s*=\s*['\"].*['\"]"
-            ],
-            "bad_practices": [
-                r"except:\s*pass",
-                r"except Exception:\s*pass",
-                r"print\(",
-                r"import \*",
-                r"global \w+",
-                r"# hack",
-                r"# quick fix"
-            ]
-        }
-    
-    def analyze_ai_response(self, response: str, context: Dict[str, Any] = None) -> CodeAnalysisResult:
+    def analyze_ai_response(self, response: str, context: Dict[str, Any] = None,
+                            use_cache: bool = True) -> CodeAnalysisResult:
         """
         تحليل شامل لاستجابة الذكاء الاصطناعي
+        
+        النتيجة محفوظة بمفتاح hash نص الاستجابة وإصدار القواعد، فإعادة التحقق
+        من نفس الاستجابة (إعادة توليد، إعادة تحميل الصفحة) لا تعيد التحليل
         """
+        rules = self.refresh_rules()
+        if not use_cache:
+            return self._analyze(response)
+        
+        version = f"{ANALYSIS_VERSION}:{rules.version}"
+        payload = self.analysis_cache.get(response, version)
+        if payload is not None:
+            try:
+                return CodeAnalysisResult.from_compact(payload)
+            except (ValueError, TypeError) as e:
+                logger.warning(f"تعذر قراءة نتيجة تحليل محفوظة، إعادة التحليل: {e}")
+        
+        result = self._analyze(response)
+        self.analysis_cache.set(response, version, result.to_compact())
+        return result
+    
+    def _analyze(self, response: str) -> CodeAnalysisResult:
+        """التحليل الفعلي لاستجابة واحدة"""
         logger.info("بدء تحليل استجابة الذكاء الاصطناعي")
         
-        # استخراج الكود من الاستجابة
-        code_blocks = self._extract_code_blocks(response)
-        test_blocks = self._extract_test_blocks(response)
+        # استخراج الكود من الاستجابة (مرة واحدة لكل التحليل)
+        context = self.build_context(response)
+        code_blocks = context.code_blocks
+        test_blocks = context.test_blocks
         
         # تحليل جودة الكود
         code_quality = self._analyze_code_quality(code_blocks)
@@ -212,38 +308,111 @@ class CodeGovernor:
         
         return result
     
-    def _extract_code_blocks(self, response: str) -> List[str]:
+    def analyze_many(self, responses: Iterable[str], workers: Optional[int] = None,
+                     chunk_size: int = DEFAULT_ANALYSIS_CHUNK_SIZE) -> List[CodeAnalysisResult]:
+        """تحليل مجموعة استجابات على عدة عمليات مع الحفاظ على الترتيب"""
+        return list(self.iter_analyze_many(responses, workers=workers, chunk_size=chunk_size))
+    
+    def iter_analyze_many(self, responses: Iterable[str], workers: Optional[int] = None,
+                          chunk_size: int = DEFAULT_ANALYSIS_CHUNK_SIZE) -> Iterator[CodeAnalysisResult]:
+        """
+        تحليل متدفق لمجموعة استجابات باستخدام ProcessPoolExecutor
+        
+        تُقسم الاستجابات إلى دفعات بحجم chunk_size وتُرسل للعمليات بالتدريج
+        (دفعتان لكل عملية على الأكثر قيد التنفيذ)، والنتائج تُعاد بنفس ترتيب
+        المدخلات فور جاهزيتها. workers=1 يحلل في نفس العملية.
+        """
+        workers = max(1, workers or os.cpu_count() or 1)
+        chunk_size = max(1, chunk_size)
+        chunks = _iter_chunks(responses, chunk_size)
+        
+        if workers == 1:
+            for chunk in chunks:
+                for response in chunk:
+                    yield self.analyze_ai_response(response)
+            return
+        
+        # spawn بدلاً من fork حتى لا ترث العمليات حالة العملية الأم (اتصالات، خيوط)
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_analysis_worker,
+                                 initargs=(self.rules_path,)) as executor:
+            in_flight = deque()
+            for chunk in chunks:
+                in_flight.append(executor.submit(_analyze_chunk, chunk))
+                while len(in_flight) >= workers * 2:
+                    yield from in_flight.popleft().result()
+            while in_flight:
+                yield from in_flight.popleft().result()
+    
+    def build_context(self, response: str) -> AnalysisContext:
+        """استخراج الكتل وتصنيفها مرة واحدة"""
+        code_blocks = self._extract_code_blocks(response)
+        return AnalysisContext(
+            response=response,
+            code_blocks=code_blocks,
+            test_blocks=self._select_test_blocks(code_blocks),
+        )
+    
+    def _extract_code_blocks(self, response: str) -> List[CodeBlock]:
         """استخراج كتل الكود من الاستجابة"""
         # البحث عن كتل الكود المحاطة بـ ```
-        code_pattern = r"```(?:python|py)?\n(.*?)\n```"
-        code_blocks = re.findall(code_pattern, response, re.DOTALL | re.IGNORECASE)
+        code_blocks = CODE_BLOCK_RE.findall(response)
         
         # البحث عن كتل الكود المحاطة بـ `
-        inline_code_pattern = r"`([^`\n]+)`"
-        inline_codes = re.findall(inline_code_pattern, response)
+        inline_codes = INLINE_CODE_RE.findall(response)
         
         # فلترة الكود الحقيقي (يحتوي على كلمات مفتاحية Python)
-        python_keywords = ['def ', 'class ', 'import ', 'from ', 'if ', 'for ', 'while ', 'try:', 'except:']
-        
         real_code_blocks = []
         for block in code_blocks + inline_codes:
-            if any(keyword in block for keyword in python_keywords):
-                real_code_blocks.append(block.strip())
+            if _looks_like_python(block):
+                real_code_blocks.append(CodeBlock(block.strip()))
         
         return real_code_blocks
     
-    def _extract_test_blocks(self, response: str) -> List[str]:
+    def _extract_test_blocks(self, response: str) -> List[CodeBlock]:
         """استخراج كتل الاختبارات من الاستجابة"""
-        code_blocks = self._extract_code_blocks(response)
-        test_blocks = []
-        
-        test_indicators = ['test_', 'Test', 'pytest', 'unittest', 'assert', 'mock']
-        
-        for block in code_blocks:
-            if any(indicator in block for indicator in test_indicators):
-                test_blocks.append(block)
-        
-        return test_blocks
+        return self._select_test_blocks(self._extract_code_blocks(response))
+    
+    def _select_test_blocks(self, code_blocks: List[CodeBlock]) -> List[CodeBlock]:
+        """اختيار كتل الاختبارات من كتل الكود المستخرجة"""
+        return [block for block in code_blocks if _looks_like_test(block)]
+    
+    def _as_block(self, code: str) -> CodeBlock:
+        """تحويل النص إلى CodeBlock (الكتل المستخرجة تُستخدم كما هي)"""
+        return code if isinstance(code, CodeBlock) else CodeBlock(code)
+    
+    def _pattern_hits(self, code: str, category: str) -> List[str]:
+        """
+        الأنماط المحظورة من فئة معينة الموجودة في الكتلة (محفوظة على الكتلة)
+        الأنماط المعروفة تُقيّم على حقائق AST، والباقي (التعليقات والنص غير
+        القابل للتحليل) بالتعابير النمطية
+        """
+        block = self._as_block(code)
+        return block.memoize(('patterns', category), lambda: self._match_patterns(block, category))
+    
+    def _match_patterns(self, block: CodeBlock, category: str) -> List[str]:
+        compiled_category = self.compiled_rules.forbidden.get(category)
+        if compiled_category is None:
+            return []
+        
+        facts = block.facts
+        # تعبير مجمّع واحد يستبعد الكتل التي لا يطابقها أي نمط نصي بدون فجوات .*
+        combined = compiled_category.combined if facts is None else compiled_category.text_combined
+        text_matched = combined is not None and combined.search(block) is not None
+        
+        hits = []
+        for pattern, compiled in compiled_category.patterns:
+            rule = AST_PATTERN_RULES.get(pattern) if facts is not None else None
+            if rule is not None:
+                matched = rule(facts)
+            elif pattern in compiled_category.gapped:
+                matched = compiled.search(block) is not None
+            else:
+                matched = text_matched and compiled.search(block) is not None
+            if matched:
+                hits.append(pattern)
+        return hits
     
     def _analyze_code_quality(self, code_blocks: List[str]) -> CodeQualityLevel:
         """تحليل جودة الكود"""
@@ -327,20 +496,19 @@ class CodeGovernor:
         # استخراج الدوال والكلاسات من الكود
         code_functions = []
         for block in code_blocks:
-            functions = re.findall(r'def\s+(\w+)\s*\(', block)
-            classes = re.findall(r'class\s+(\w+)\s*\(', block)
-            code_functions.extend(functions + classes)
+            facts = self._as_block(block).facts
+            if facts is not None:
+                code_functions.extend(facts.function_names + facts.class_names)
+            else:
+                code_functions.extend(FUNCTION_DEF_RE.findall(block) + CLASS_DEF_RE.findall(block))
         
         if not code_functions:
             return 0.0
         
         # البحث عن اختبارات لكل دالة/كلاس
-        tested_functions = 0
-        for func in code_functions:
-            for test_block in test_blocks:
-                if func.lower() in test_block.lower():
-                    tested_functions += 1
-                    break
+        # أسماء الدوال (\w+) لا تحتوي على \0 فلا يمكن أن تعبر الحد بين كتلتين
+        lowered_tests = "\0".join(self._as_block(test_block).lowered for test_block in test_blocks)
+        tested_functions = sum(1 for func in code_functions if func.lower() in lowered_tests)
         
         coverage = tested_functions / len(code_functions)
         return min(coverage, 1.0)
@@ -358,12 +526,16 @@ class CodeGovernor:
             if self._is_fake_test(test_block):
                 violations.append(f"الاختبار رقم {i+1} يبدو وهمياً أو غير فعال")
         
-        # فحص الأنماط المحظورة
-        all_code = " ".join(code_blocks + test_blocks)
+        # فحص الأنماط المحظورة في كل كتلة
+        blocks = list({id(block): self._as_block(block) for block in code_blocks + test_blocks}.values())
         
         for category, patterns in self.forbidden_patterns.items():
+            block_hits = set()
+            for block in blocks:
+                block_hits.update(self._pattern_hits(block, category))
+            
             for pattern in patterns:
-                if re.search(pattern, all_code, re.IGNORECASE):
+                if pattern in block_hits:
                     violations.append(f"تم العثور على نمط محظور ({category}): {pattern}")
         
         # فحص الأمان
@@ -385,7 +557,7 @@ class CodeGovernor:
                 if 'assert' not in test_block:
                     suggestions.append("تأكد من وجود assertions واضحة في الاختبارات")
                 
-                if 'mock' in test_block.lower() and 'return_value' in test_block:
+                if 'mock' in self._as_block(test_block).lowered and 'return_value' in test_block:
                     suggestions.append("تجنب الاعتماد المفرط على mocks - استخدم بيانات حقيقية عند الإمكان")
         
         for code_block in code_blocks:
@@ -411,23 +583,23 @@ class CodeGovernor:
             return False
         
         # رفض في حالة وجود انتهاكات أمنية خطيرة
-        critical_violations = [v for v in violations if any(word in v.lower() for word in ['أمان', 'security', 'محظور', 'خطر'])]
+        critical_violations = [v for v in violations if self._is_critical_violation(v)]
         if critical_violations:
             return False
         
         return True
     
+    def _is_critical_violation(self, violation: str) -> bool:
+        """انتهاك يمنع قبول الاستجابة مهما كانت بقية النتائج"""
+        return any(word in violation.lower() for word in CRITICAL_VIOLATION_WORDS)
+    
     def _has_proper_structure(self, code: str) -> bool:
         """فحص البنية الصحيحة للكود"""
-        try:
-            ast.parse(code)
-            return True
-        except SyntaxError:
-            return False
+        return self._as_block(code).tree is not None
     
     def _has_documentation(self, code: str) -> bool:
         """فحص وجود التوثيق"""
-        return '"""' in code or "'''" in code or re.search(r'#.*\w+', code)
+        return '"""' in code or "'''" in code or DOCUMENTATION_COMMENT_RE.search(code)
     
     def _has_error_handling(self, code: str) -> bool:
         """فحص معالجة الأخطاء"""
@@ -435,29 +607,23 @@ class CodeGovernor:
     
     def _has_security_issues(self, code: str) -> bool:
         """فحص المشاكل الأمنية"""
-        for pattern in self.forbidden_patterns['security_violations']:
-            if re.search(pattern, code, re.IGNORECASE):
-                return True
-        return False
+        return bool(self._pattern_hits(code, 'security_violations'))
     
     def _follows_best_practices(self, code: str) -> bool:
         """فحص اتباع أفضل الممارسات"""
-        bad_patterns = self.forbidden_patterns['bad_practices']
-        for pattern in bad_patterns:
-            if re.search(pattern, code, re.IGNORECASE):
-                return False
-        return True
+        return not self._pattern_hits(code, 'bad_practices')
     
     def _is_fake_test(self, test_code: str) -> bool:
         """فحص ما إذا كان الاختبار وهمياً"""
-        fake_patterns = self.forbidden_patterns['fake_test_patterns']
-        for pattern in fake_patterns:
-            if re.search(pattern, test_code, re.IGNORECASE):
-                return True
+        block = self._as_block(test_code)
+        return block.memoize('is_fake_test', lambda: self._check_fake_test(block))
+    
+    def _check_fake_test(self, block: CodeBlock) -> bool:
+        if self._pattern_hits(block, 'fake_test_patterns'):
+            return True
         
         # فحص إضافي: اختبار يحتوي على assert واحد فقط وبسيط
-        assert_count = len(re.findall(r'assert\s+', test_code))
-        if assert_count == 1 and ('True' in test_code or '1 == 1' in test_code):
+        if block.assert_count == 1 and ('True' in block or '1 == 1' in block):
             return True
         
         return False
@@ -466,12 +632,12 @@ class CodeGovernor:
         """فحص ما إذا كان الاختبار ضعيفاً"""
         # اختبار ضعيف إذا كان:
         # 1. لا يحتوي على assertions كافية
-        assert_count = len(re.findall(r'assert\s+', test_code))
+        assert_count = self._as_block(test_code).assert_count
         if assert_count < 2:
             return True
         
         # 2. يعتمد بشكل مفرط على mocks
-        mock_count = len(re.findall(r'mock\.|Mock\(|patch\(', test_code))
+        mock_count = len(MOCK_USAGE_RE.findall(test_code))
         if mock_count > assert_count:
             return True
         
@@ -486,66 +652,54 @@ class CodeGovernor:
         security_issues = []
         
         for i, code in enumerate(code_blocks):
-            # فحص كلمات المرور المكشوفة
-            if re.search(r'password\s*=\s*[\'"][^\'"]+[\'"]', code, re.IGNORECASE):
-                security_issues.append(f"كتلة الكود {i+1}: كلمة مرور مكشوفة في الكود")
-            
-            # فحص استخدام eval أو exec
-            if re.search(r'\b(eval|exec)\s*\(', code):
-                security_issues.append(f"كتلة الكود {i+1}: استخدام دوال خطيرة (eval/exec)")
-            
-            # فحص SQL injection محتمل
-            if re.search(r'execute\s*\(\s*[\'"].*%.*[\'"]', code):
-                security_issues.append(f"كتلة الكود {i+1}: احتمالية SQL injection")
-            
-            # فحص استيراد غير آمن
-            if re.search(r'from\s+\*\s+import|import\s+\*', code):
-                security_issues.append(f"كتلة الكود {i+1}: استيراد غير آمن (*)")
+            security_issues.extend(self._block_security_issues(code, i + 1))
         
         return security_issues
     
-    def generate_governance_prompt(self, original_prompt: str) -> str:
-        """
-        إنشاء prompt محكوم يضمن اتباع قواعد الحوكمة
-        """
-        governance_instructions = """
-        
-        === قواعد حوكمة الذكاء الاصطناعي الإجبارية ===
-        
-        يجب عليك الالتزام الصارم بالقواعد التالية:
-        
-        1. **لا تكتب أي كود بدون اختبارات شاملة**
-           - كل دالة يجب أن تحتوي على اختبار واحد على الأقل
-           - الاختبارات يجب أن تغطي الحالات العادية والاستثنائية
-           - استخدم assertions حقيقية وليس assert True
+    def _block_security_issues(self, code: str, number: int) -> List[str]:
+        """المشاكل الأمنية في كتلة واحدة (number هو ترقيم الكتلة في الرسائل)"""
+        security_issues = []
         
-        2. **لا تقدم اختبارات وهمية أو غير فعالة**
-           - تجنب: assert True, assert 1==1, pass
-           - تجنب: اختبارات تحتوي على TODO فقط
-           - تجنب: الاعتماد المفرط على mocks بدون assertions حقيقية
+        facts = self._as_block(code).facts
+        if facts is not None:
+            checks = (
+                facts.has_secret('password', non_empty=True),
+                bool(facts.calls & {'eval', 'exec'}),
+                facts.formatted_sql_execute,
+                facts.wildcard_import,
+            )
+        else:
+            checks = (
+                HARDCODED_PASSWORD_RE.search(code),
+                DANGEROUS_CALL_RE.search(code),
+                SQL_INJECTION_RE.search(code),
+                WILDCARD_IMPORT_RE.search(code),
+            )
+        has_password, has_dangerous_call, has_sql_injection, has_wildcard_import = checks
         
-        3. **اتبع معايير الأمان**
-           - لا تستخدم eval() أو exec()
-           - لا تكشف كلمات المرور في الكود
-           - استخدم معالجة الأخطاء المناسبة
+        # فحص كلمات المرور المكشوفة
+        if has_password:
+            security_issues.append(f"كتلة الكود {number}: كلمة مرور مكشوفة في الكود")
         
-        4. **اتبع أفضل ممارسات البرمجة**
-           - أضف docstrings للدوال والكلاسات
-           - استخدم أسماء متغيرات واضحة
-           - تجنب الكود المكرر
+        # فحص استخدام eval أو exec
+        if has_dangerous_call:
+            security_issues.append(f"كتلة الكود {number}: استخدام دوال خطيرة (eval/exec)")
         
-        5. **تنسيق الاستجابة**
-           - ابدأ بشرح مختصر لما ستفعله
-           - اكتب الكود الرئيسي أولاً
-           - اكتب الاختبارات ثانياً
-           - اختتم بتعليمات التشغيل
+        # فحص SQL injection محتمل
+        if has_sql_injection:
+            security_issues.append(f"كتلة الكود {number}: احتمالية SQL injection")
         
-        إذا لم تتمكن من كتابة اختبارات شاملة، فلا تكتب الكود أصلاً.
+        # فحص استيراد غير آمن
+        if has_wildcard_import:
+            security_issues.append(f"كتلة الكود {number}: استيراد غير آمن (*)")
         
-        === الطلب الأصلي ===
+        return security_issues
+    
+    def generate_governance_prompt(self, original_prompt: str) -> str:
         """
-        
-        return governance_instructions + original_prompt
+        إنشاء prompt محكوم يضمن اتباع قواعد الحوكمة
+        """
+        return get_prompt_template().render(original_prompt)
     
     def validate_and_improve_response(self, response: str) -> Tuple[str, bool]:
         """
@@ -589,6 +743,125 @@ class CodeGovernor:
         return "\n".join(improvements)
 
 
+@dataclass
+class BlockVerdict:
+    """نتيجة فحص كتلة كود اكتملت أثناء البث"""
+    index: int
+    code: str
+    is_test: bool
+    violations: List[str]
+    abort: bool
+
+
+class StreamingCodeGovernor:
+    """
+    حاكم تدريجي للاستجابات المتدفقة
+    
+    يستقبل الاستجابة على أجزاء عبر feed()، ويحلل كل كتلة كود محاطة بـ ```
+    فور وصول سياج الإغلاق. إذا ظهر في أي كتلة انتهاك حرج (نمط محظور أو
+    مشكلة أمنية) يصبح should_abort صحيحاً، لأن التحليل الكامل سيرفض
+    الاستجابة حتماً، فيمكن إيقاف التوليد مبكراً. finalize() يعيد نتيجة
+    analyze_ai_response على النص الكامل.
+    """
+    
+    def __init__(self, governor: Optional[CodeGovernor] = None):
+        self.governor = governor or CodeGovernor()
+        self.governor.refresh_rules()
+        self._buffer = ''
+        self._scan_from = 0
+        self.verdicts: List[BlockVerdict] = []
+        self.violations: List[str] = []
+        self.should_abort = False
+    
+    @property
+    def text(self) -> str:
+        """النص المستلم حتى الآن"""
+        return self._buffer
+    
+    def feed(self, chunk: str) -> List[BlockVerdict]:
+        """إضافة جزء من الاستجابة وإرجاع نتائج الكتل التي اكتملت به"""
+        if not chunk:
+            return []
+        
+        # أي كتلة تكتمل بهذا الجزء تنتهي بسياج إغلاق يقع (ولو جزئياً) داخله
+        window_start = max(self._scan_from, len(self._buffer) - 2)
+        self._buffer += chunk
+        if self._buffer.find('```', window_start) == -1:
+            return []
+        
+        verdicts = []
+        while True:
+            match = CODE_BLOCK_RE.search(self._buffer, self._scan_from)
+            if match is None:
+                break
+            self._scan_from = match.end()
+            if _looks_like_python(match.group(1)):
+                verdicts.append(self._check_block(CodeBlock(match.group(1).strip())))
+        return verdicts
+    
+    def finalize(self) -> CodeAnalysisResult:
+        """التحليل الكامل للنص بعد انتهاء البث"""
+        return self.governor.analyze_ai_response(self._buffer)
+    
+    def _check_block(self, block: CodeBlock) -> BlockVerdict:
+        governor = self.governor
+        index = len(self.verdicts) + 1
+        
+        violations = [
+            f"تم العثور على نمط محظور ({category}): {pattern}"
+            for category in governor.forbidden_patterns
+            for pattern in governor._pattern_hits(block, category)
+        ]
+        violations.extend(governor._block_security_issues(block, index))
+        
+        is_test = _looks_like_test(block)
+        if is_test and governor._is_fake_test(block):
+            violations.append(f"كتلة الكود {index}: الاختبار يبدو وهمياً أو غير فعال")
+        
+        verdict = BlockVerdict(
+            index=index,
+            code=str(block),
+            is_test=is_test,
+            violations=violations,
+            abort=any(governor._is_critical_violation(v) for v in violations),
+        )
+        
+        self.verdicts.append(verdict)
+        self.violations.extend(violations)
+        if verdict.abort and not self.should_abort:
+            self.should_abort = True
+            logger.info(f"إيقاف مبكر للاستجابة المتدفقة عند كتلة الكود {index}")
+        return verdict
+
+
+_worker_governor: Optional[CodeGovernor] = None
+
+
+def _init_analysis_worker(rules_path: Optional[str] = None):
+    """إعداد عملية العامل: CodeGovernor واحد يُستخدم لكل الدفعات"""
+    global _worker_governor
+    _worker_governor = CodeGovernor(rules_path)
+
+
+def _analyze_chunk(responses: List[str]) -> List[CodeAnalysisResult]:
+    """تحليل دفعة من الاستجابات داخل عملية العامل"""
+    if _worker_governor is None:
+        _init_analysis_worker()
+    return [_worker_governor.analyze_ai_response(response) for response in responses]
+
+
+def _iter_chunks(items: Iterable[str], chunk_size: int) -> Iterator[List[str]]:
+    """تجميع عناصر متدفقة في دفعات"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
 class AIPromptEnforcer:
     """
     نظام فرض قواعد الـ prompts للذكاء الاصطناعي
@@ -600,40 +873,20 @@ class AIPromptEnforcer:
     def enforce_coding_standards(self, prompt: str, context: Dict[str, Any] = None) -> str:
         """فرض معايير البرمجة على الـ prompt"""
         
-        # إضافة قواعد الحوكمة للـ prompt
-        governed_prompt = self.code_governor.generate_governance_prompt(prompt)
-        
-        # إضافة سياق إضافي إذا لزم الأمر
-        if context and context.get('project_type'):
-            project_specific_rules = self._get_project_specific_rules(context['project_type'])
-            governed_prompt += f"\n\n=== قواعد خاصة بمشروع {context['project_type']} ===\n{project_specific_rules}"
-        
-        return governed_prompt
+        # قواعد الحوكمة وقواعد المشروع محسوبة مسبقاً لكل نوع مشروع
+        return self.get_template(context).render(prompt)
+    
+    def get_template(self, context: Dict[str, Any] = None) -> PromptTemplate:
+        """القالب المحسوب مسبقاً لنوع المشروع في السياق"""
+        return get_prompt_template((context or {}).get('project_type') or None)
+    
+    def estimate_prompt_tokens(self, prompt: str, context: Dict[str, Any] = None) -> int:
+        """تقدير عدد tokens للـ prompt المحكوم دون إنشائه (لفحص الحصص)"""
+        return self.get_template(context).estimate_prompt_tokens(prompt)
     
     def _get_project_specific_rules(self, project_type: str) -> str:
         """الحصول على قواعد خاصة بنوع المشروع"""
-        rules = {
-            'django': """
-            - استخدم Django ORM بدلاً من SQL مباشر
-            - أضف اختبارات للـ models والـ views والـ serializers
-            - استخدم Django's built-in authentication
-            - اتبع Django's naming conventions
-            """,
-            'fastapi': """
-            - استخدم Pydantic models للـ validation
-            - أضف type hints لجميع الدوال
-            - استخدم dependency injection
-            - اكتب اختبارات للـ endpoints باستخدام TestClient
-            """,
-            'microservice': """
-            - اتبع مبادئ الـ microservices
-            - أضف health checks
-            - استخدم logging مناسب
-            - اكتب اختبارات للـ integration بين الخدمات
-            """
-        }
-        
-        return rules.get(project_type, "")
+        return PROJECT_SPECIFIC_RULES.get(project_type, "")
 
 
 # مثال على الاستخدام
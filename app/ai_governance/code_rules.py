@@ -0,0 +1,219 @@
+"""
+AST Rule Engine - محرك قواعد الكود المبني على شجرة AST
+
+يجمع كل الحقائق البنيوية عن كتلة كود (الاستدعاءات، الاستيرادات، معالجات
+الاستثناءات، الـ asserts، دوال الاختبار) في مرور واحد بـ ast.NodeVisitor،
+ثم تُقيّم الأنماط المعروفة في CodeGovernor كقواعد على هذه الحقائق بدلاً من
+تشغيل تعبير نمطي لكل قاعدة على نص الكتلة. النصوص والتعليقات لا تُنتج
+نتائج خاطئة لأن القواعد تنظر إلى العقد فقط.
+
+الأنماط غير المعروفة هنا (أو الكتل التي لا يمكن تحليلها) تبقى على التعابير النمطية.
+"""
+
+import ast
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set
+
+SECRET_NAMES = ('password', 'secret')
+
+
+@dataclass
+class BlockFacts:
+    """الحقائق البنيوية المستخرجة من كتلة كود في مرور واحد"""
+    calls: Set[str] = field(default_factory=set)
+    calls_without_args: Set[str] = field(default_factory=set)
+    shell_true: bool = False
+    secret_literals: Dict[str, List[str]] = field(default_factory=dict)
+    bare_except_pass: bool = False
+    broad_except_pass: bool = False
+    wildcard_import: bool = False
+    uses_global: bool = False
+    assert_count: int = 0
+    assert_true: bool = False
+    assert_tautology: bool = False
+    mock_return_true: bool = False
+    patch_return_true: bool = False
+    pass_only_functions: List[str] = field(default_factory=list)
+    formatted_sql_execute: bool = False
+    function_names: List[str] = field(default_factory=list)
+    class_names: List[str] = field(default_factory=list)
+
+    def has_secret(self, name: str, non_empty: bool = False) -> bool:
+        values = self.secret_literals.get(name, [])
+        return any(values) if non_empty else bool(values)
+
+
+def _call_name(node: ast.AST) -> Optional[str]:
+    """اسم الدالة المستدعاة: eval(...) -> eval و obj.execute(...) -> execute"""
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    return None
+
+
+def _root_name(node: ast.AST) -> Optional[str]:
+    """الاسم الأول في سلسلة الوصول: mock.patch.object -> mock"""
+    while isinstance(node, (ast.Attribute, ast.Call)):
+        node = node.value if isinstance(node, ast.Attribute) else node.func
+    return node.id if isinstance(node, ast.Name) else None
+
+
+def _target_name(node: ast.AST) -> Optional[str]:
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    return None
+
+
+def _is_constant(node: ast.AST, value) -> bool:
+    return isinstance(node, ast.Constant) and node.value is value
+
+
+def _is_str(node: ast.AST) -> bool:
+    return isinstance(node, ast.Constant) and isinstance(node.value, str)
+
+
+def _body_is_pass(body: List[ast.stmt]) -> bool:
+    """الجسم عبارة pass فقط (مع docstring اختيارية)"""
+    if body and isinstance(body[0], ast.Expr) and _is_str(body[0].value):
+        body = body[1:]
+    return len(body) == 1 and isinstance(body[0], ast.Pass)
+
+
+class CodeRuleVisitor(ast.NodeVisitor):
+    """مرور واحد على شجرة الكتلة يملأ BlockFacts"""
+
+    def __init__(self):
+        self.facts = BlockFacts()
+
+    def _record_secret(self, name: Optional[str], value: ast.AST):
+        if not name or not _is_str(value):
+            return
+        lowered = name.lower()
+        for secret in SECRET_NAMES:
+            if secret in lowered:
+                self.facts.secret_literals.setdefault(secret, []).append(value.value)
+
+    def visit_Call(self, node: ast.Call):
+        name = _call_name(node.func)
+        if name:
+            self.facts.calls.add(name)
+            if not node.args and not node.keywords:
+                self.facts.calls_without_args.add(name)
+
+        for keyword in node.keywords:
+            if keyword.arg == 'shell' and _is_constant(keyword.value, True):
+                self.facts.shell_true = True
+            self._record_secret(keyword.arg, keyword.value)
+
+        if name == 'execute' and node.args:
+            query = node.args[0]
+            if isinstance(query, ast.BinOp) and isinstance(query.op, ast.Mod):
+                query = query.left
+            if _is_str(query) and '%' in query.value:
+                self.facts.formatted_sql_execute = True
+
+        self.generic_visit(node)
+
+    def visit_Assign(self, node: ast.Assign):
+        for target in node.targets:
+            self._visit_assignment(target, node.value)
+        self.generic_visit(node)
+
+    def visit_AnnAssign(self, node: ast.AnnAssign):
+        if node.value is not None:
+            self._visit_assignment(node.target, node.value)
+        self.generic_visit(node)
+
+    def _visit_assignment(self, target: ast.AST, value: ast.AST):
+        self._record_secret(_target_name(target), value)
+        if (isinstance(target, ast.Attribute) and target.attr == 'return_value'
+                and _is_constant(value, True)
+                and (_root_name(target.value) or '').lower().endswith('mock')):
+            self.facts.mock_return_true = True
+
+    def visit_ExceptHandler(self, node: ast.ExceptHandler):
+        if node.body and isinstance(node.body[0], ast.Pass):
+            if node.type is None:
+                self.facts.bare_except_pass = True
+            elif isinstance(node.type, ast.Name) and node.type.id == 'Exception':
+                self.facts.broad_except_pass = True
+        self.generic_visit(node)
+
+    def visit_ImportFrom(self, node: ast.ImportFrom):
+        if any(alias.name == '*' for alias in node.names):
+            self.facts.wildcard_import = True
+        self.generic_visit(node)
+
+    def visit_Global(self, node: ast.Global):
+        self.facts.uses_global = True
+
+    def visit_Assert(self, node: ast.Assert):
+        self.facts.assert_count += 1
+        test = node.test
+        if _is_constant(test, True):
+            self.facts.assert_true = True
+        elif (isinstance(test, ast.Compare) and len(test.ops) == 1 and isinstance(test.ops[0], ast.Eq)
+              and isinstance(test.left, ast.Constant) and isinstance(test.comparators[0], ast.Constant)
+              and test.left.value == test.comparators[0].value):
+            self.facts.assert_tautology = True
+        self.generic_visit(node)
+
+    def _visit_function(self, node):
+        self.facts.function_names.append(node.name)
+        for argument, default in zip(reversed(node.args.args), reversed(node.args.defaults)):
+            self._record_secret(argument.arg, default)
+        for argument, default in zip(node.args.kwonlyargs, node.args.kw_defaults):
+            if default is not None:
+                self._record_secret(argument.arg, default)
+        if _body_is_pass(node.body):
+            self.facts.pass_only_functions.append(node.name)
+        for decorator in node.decorator_list:
+            if (isinstance(decorator, ast.Call) and _root_name(decorator.func) == 'patch'
+                    and any(k.arg == 'return_value' and _is_constant(k.value, True) for k in decorator.keywords)):
+                self.facts.patch_return_true = True
+        self.generic_visit(node)
+
+    visit_FunctionDef = _visit_function
+    visit_AsyncFunctionDef = _visit_function
+
+    def visit_ClassDef(self, node: ast.ClassDef):
+        if node.bases or node.keywords:
+            self.facts.class_names.append(node.name)
+        self.generic_visit(node)
+
+
+def collect_facts(tree: ast.AST) -> BlockFacts:
+    """جمع الحقائق البنيوية من شجرة AST في مرور واحد"""
+    visitor = CodeRuleVisitor()
+    visitor.visit(tree)
+    return visitor.facts
+
+
+# قواعد AST مكافئة للأنماط المعروفة في CodeGovernor (النمط -> شرط على الحقائق).
+# الأنماط الخاصة بالتعليقات (# hack وغيرها) لا تظهر في AST فتبقى تعابير نمطية.
+AST_PATTERN_RULES: Dict[str, Callable[[BlockFacts], bool]] = {
+    # fake_test_patterns
+    r"pass\s*$": lambda facts: any(name.startswith('test') for name in facts.pass_only_functions),
+    r"assert True": lambda facts: facts.assert_true,
+    r"assert 1 == 1": lambda facts: facts.assert_tautology,
+    r"mock\.return_value = True": lambda facts: facts.mock_return_true,
+    r"@patch.*return_value=True": lambda facts: facts.patch_return_true,
+    # security_violations
+    r"eval\(": lambda facts: 'eval' in facts.calls,
+    r"exec\(": lambda facts: 'exec' in facts.calls,
+    r"__import__\(": lambda facts: '__import__' in facts.calls,
+    r"input\(\)": lambda facts: 'input' in facts.calls_without_args,
+    r"raw_input\(\)": lambda facts: 'raw_input' in facts.calls_without_args,
+    r"shell=True": lambda facts: facts.shell_true,
+    r"password\s*=\s*['\"].*['\"]": lambda facts: facts.has_secret('password'),
+    r"secret\s*=\s*['\"].*['\"]": lambda facts: facts.has_secret('secret'),
+    # bad_practices
+    r"except:\s*pass": lambda facts: facts.bare_except_pass,
+    r"except Exception:\s*pass": lambda facts: facts.broad_except_pass,
+    r"print\(": lambda facts: 'print' in facts.calls,
+    r"import \*": lambda facts: facts.wildcard_import,
+    r"global \w+": lambda facts: facts.uses_global,
+}
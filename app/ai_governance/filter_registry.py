@@ -0,0 +1,163 @@
+"""
+Content Filter Registry
+
+Compiles active AIContentFilter rows into matchers that are shared by every
+ContentFilterManager in the process. The compiled set is keyed by a version
+derived from the rows' updated_at values; the version and a serialized snapshot
+of the rows are published to the cache whenever a filter changes and after
+migrations, so workers pick up changes without a restart and requests never
+query the filter table. When the published snapshot is missing (cold or
+evicted cache) requests keep the last compiled set, or none, while a
+background thread rebuilds and republishes it.
+"""
+
+import hashlib
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from django.conf import settings
+from django.core.cache import cache
+import logging
+
+logger = logging.getLogger('ai_governance')
+
+VERSION_CACHE_KEY = 'ai_governance:content_filters:version'
+SNAPSHOT_CACHE_KEY = 'ai_governance:content_filters:snapshot'
+
+RULE_FIELDS = [
+    'id', 'name', 'filter_type', 'keywords', 'patterns', 'threshold',
+    'block_request', 'flag_for_review', 'modify_response', 'updated_at',
+]
+
+
+def compute_filter_version(rules: List[Dict[str, Any]]) -> str:
+    """Derive the filter-set version from the ids and updated_at of active rows"""
+    digest = hashlib.sha1()
+    for rule in rules:
+        digest.update(f"{rule['id']}:{rule['updated_at']}\n".encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def build_snapshot() -> Dict[str, Any]:
+    """Read active filters from the database into a cacheable snapshot"""
+    from .models import AIContentFilter
+
+    rules = []
+    for row in AIContentFilter.objects.filter(is_active=True).order_by('pk').values(*RULE_FIELDS):
+        row['updated_at'] = row['updated_at'].isoformat() if row['updated_at'] else ''
+        rules.append(row)
+
+    return {'version': compute_filter_version(rules), 'rules': rules}
+
+
+def publish_snapshot() -> Dict[str, Any]:
+    """Rebuild the snapshot from the database and publish it to all workers"""
+    snapshot = build_snapshot()
+    cache.set_many({
+        SNAPSHOT_CACHE_KEY: snapshot,
+        VERSION_CACHE_KEY: snapshot['version'],
+    }, timeout=None)
+    logger.info(f"Published content filter set version {snapshot['version']} ({len(snapshot['rules'])} filters)")
+    return snapshot
+
+
+class ContentFilterRegistry:
+    """
+    Per-process cache of compiled database filters.
+
+    The published version is read from the cache at most once every
+    VERSION_CHECK_INTERVAL seconds; the snapshot is only fetched (and the
+    filters recompiled) when that version changes. A failed or pending first
+    load leaves the version at '' so retries follow the same interval.
+    """
+
+    def __init__(self, check_interval: Optional[float] = None, background_rebuild: Optional[bool] = None):
+        config = getattr(settings, 'AI_GOVERNANCE', {})
+        self.check_interval = (
+            check_interval if check_interval is not None
+            else config.get('FILTER_VERSION_CHECK_INTERVAL', 5)
+        )
+        self.background_rebuild = (
+            background_rebuild if background_rebuild is not None
+            else config.get('FILTER_BACKGROUND_REBUILD', True)
+        )
+        self._lock = threading.Lock()
+        self._version = None
+        self._filters: Tuple = ()
+        self._checked_at = 0.0
+        self._rebuilding = False
+
+    @property
+    def version(self) -> str:
+        """Version of the compiled filter set ('' before the first load)"""
+        return self._version or ''
+
+    def get_filters(self) -> Tuple:
+        """Return the compiled filters, refreshing them if the version changed"""
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < self.check_interval:
+            return self._filters
+
+        with self._lock:
+            if self._version is not None and now - self._checked_at < self.check_interval:
+                return self._filters
+            try:
+                self._refresh()
+            except Exception as e:
+                # Keep serving the last compiled set rather than failing the request
+                logger.error(f"Failed to refresh content filters: {e}")
+            if self._version is None:
+                self._version = ''
+            self._checked_at = now
+
+        return self._filters
+
+    def invalidate(self):
+        """Force the next get_filters() call to re-check the published version"""
+        self._checked_at = 0.0
+
+    def _refresh(self):
+        """Recompile the filters if the published version differs from ours"""
+        version = cache.get(VERSION_CACHE_KEY)
+        if version is not None and version == self._version:
+            return
+
+        snapshot = cache.get(SNAPSHOT_CACHE_KEY)
+        if snapshot is None or (version is not None and snapshot['version'] != version):
+            # Cold cache: rebuild once and share the result with the other workers
+            if not self.background_rebuild:
+                snapshot = publish_snapshot()
+            else:
+                self._schedule_rebuild()
+                return
+
+        self._install(snapshot)
+
+    def _schedule_rebuild(self):
+        """Rebuild and publish the snapshot off the request thread (one rebuild at a time)"""
+        if self._rebuilding:
+            return
+        self._rebuilding = True
+        threading.Thread(target=self._rebuild, name='content-filter-rebuild', daemon=True).start()
+
+    def _rebuild(self):
+        from django.db import connection
+
+        try:
+            publish_snapshot()
+        except Exception as e:
+            logger.error(f"Failed to rebuild content filters: {e}")
+        finally:
+            connection.close()
+            self._rebuilding = False
+            self.invalidate()
+
+    def _install(self, snapshot: Dict[str, Any]):
+        """Compile a snapshot into filter instances"""
+        from .filters import DatabaseContentFilter
+
+        self._filters = tuple(DatabaseContentFilter(rule) for rule in snapshot['rules'])
+        self._version = snapshot['version']
+
+
+content_filter_registry = ContentFilterRegistry()
@@ -6,9 +6,13 @@ These filters analyze and control AI-generated content
 
 import re
 import json
+import hashlib
 from abc import ABC, abstractmethod
 from typing import Dict, List, Tuple, Any
 from django.conf import settings
+from .utils.verdict_cache import get_verdict_cache
+from .utils.text_index import Lexicon, TokenIndex
+from .utils.safe_regex import RegexTimeout, SafePattern, compile_safe
 import logging
 
 logger = logging.getLogger('ai_governance')
@@ -38,6 +42,15 @@ class BaseContentFilter(ABC):
         """
         pass
 
+    def filter_many(self, texts: List[str], kind: str = 'prompt',
+                    context: Dict[str, Any] = None) -> List[Tuple[bool, str, Dict[str, Any]]]:
+        """
+        Filter a batch of prompts or responses (kind: 'prompt' or 'response')
+        Returns one (is_allowed, modified_text, metadata) tuple per text
+        """
+        filter_method = getattr(self, f'filter_{kind}')
+        return [filter_method(text, context) for text in texts]
+
 
 class ProfanityFilter(BaseContentFilter):
     """Filter for profanity and inappropriate content"""
@@ -45,6 +58,7 @@ class ProfanityFilter(BaseContentFilter):
     def __init__(self, config: Dict[str, Any] = None):
         super().__init__(config)
         self.profanity_words = self._load_profanity_words()
+        self.lexicon = Lexicon(self.profanity_words)
         self.severity_levels = {
             'mild': 0.3,
             'moderate': 0.6,
@@ -73,7 +87,8 @@ class ProfanityFilter(BaseContentFilter):
 
     def filter_prompt(self, prompt: str, context: Dict[str, Any] = None) -> Tuple[bool, str, Dict[str, Any]]:
         """Filter input prompt for profanity"""
-        score, detected_words = self._calculate_profanity_score(prompt)
+        index = TokenIndex(prompt)
+        score, detected_words = self._calculate_profanity_score(prompt, index)
         
         metadata = {
             'profanity_score': score,
@@ -86,12 +101,13 @@ class ProfanityFilter(BaseContentFilter):
             return False, "", metadata
         
         # Clean the prompt by replacing mild profanity
-        cleaned_prompt = self._clean_text(prompt, detected_words)
+        cleaned_prompt = self._clean_text(prompt, detected_words, index)
         return True, cleaned_prompt, metadata
 
     def filter_response(self, response: str, context: Dict[str, Any] = None) -> Tuple[bool, str, Dict[str, Any]]:
         """Filter AI response for profanity"""
-        score, detected_words = self._calculate_profanity_score(response)
+        index = TokenIndex(response)
+        score, detected_words = self._calculate_profanity_score(response, index)
         
         metadata = {
             'profanity_score': score,
@@ -104,19 +120,13 @@ class ProfanityFilter(BaseContentFilter):
             return False, "عذراً، لا يمكنني تقديم هذا المحتوى.", metadata
         
         # Clean the response
-        cleaned_response = self._clean_text(response, detected_words)
+        cleaned_response = self._clean_text(response, detected_words, index)
         return True, cleaned_response, metadata
 
-    def _calculate_profanity_score(self, text: str) -> Tuple[float, List[str]]:
+    def _calculate_profanity_score(self, text: str, index: TokenIndex = None) -> Tuple[float, List[str]]:
         """Calculate profanity score for text"""
-        text_lower = text.lower()
-        detected_words = []
-        total_score = 0.0
-        
-        for word, severity in self.profanity_words.items():
-            if word in text_lower:
-                detected_words.append(word)
-                total_score += severity
+        detected_words = self.lexicon.find(index if index is not None else TokenIndex(text))
+        total_score = sum(self.profanity_words[word] for word in detected_words)
         
         # Normalize score
         max_possible_score = len(detected_words) * 1.0
@@ -124,18 +134,13 @@ class ProfanityFilter(BaseContentFilter):
         
         return normalized_score, detected_words
 
-    def _clean_text(self, text: str, detected_words: List[str]) -> str:
+    def _clean_text(self, text: str, detected_words: List[str], index: TokenIndex = None) -> str:
         """Clean text by replacing mild profanity"""
-        cleaned_text = text
-        for word in detected_words:
-            if self.profanity_words[word] <= 0.4:  # Only clean mild profanity
-                cleaned_text = re.sub(
-                    re.escape(word), 
-                    '*' * len(word), 
-                    cleaned_text, 
-                    flags=re.IGNORECASE
-                )
-        return cleaned_text
+        mild_words = [word for word in detected_words if self.profanity_words[word] <= 0.4]
+        if not mild_words:  # Only clean mild profanity
+            return text
+        
+        return self.lexicon.mask(index if index is not None else TokenIndex(text), mild_words)
 
 
 class BiasDetectionFilter(BaseContentFilter):
@@ -144,6 +149,10 @@ class BiasDetectionFilter(BaseContentFilter):
     def __init__(self, config: Dict[str, Any] = None):
         super().__init__(config)
         self.bias_patterns = self._load_bias_patterns()
+        self._compiled_bias_patterns = {
+            bias_type: [compile_safe(pattern) for pattern in patterns]
+            for bias_type, patterns in self.bias_patterns.items()
+        }
 
     def _load_bias_patterns(self) -> Dict[str, List[str]]:
         """Load bias detection patterns"""
@@ -207,10 +216,14 @@ class BiasDetectionFilter(BaseContentFilter):
         detected_biases = {}
         total_matches = 0
         
-        for bias_type, patterns in self.bias_patterns.items():
+        for bias_type, patterns in self._compiled_bias_patterns.items():
             matches = []
             for pattern in patterns:
-                found_matches = re.findall(pattern, text, re.IGNORECASE)
+                try:
+                    found_matches = pattern.findall(text)
+                except RegexTimeout:
+                    # Fail closed: a scan that did not finish counts as a match
+                    found_matches = [pattern.pattern]
                 if found_matches:
                     matches.extend(found_matches)
                     total_matches += len(found_matches)
@@ -230,6 +243,7 @@ class FactCheckFilter(BaseContentFilter):
     def __init__(self, config: Dict[str, Any] = None):
         super().__init__(config)
         self.suspicious_patterns = self._load_suspicious_patterns()
+        self._compiled_suspicious_patterns = [compile_safe(pattern) for pattern in self.suspicious_patterns]
 
     def _load_suspicious_patterns(self) -> List[str]:
         """Load patterns that might indicate misinformation"""
@@ -278,9 +292,9 @@ class FactCheckFilter(BaseContentFilter):
         """Check for suspicious content patterns"""
         detected_patterns = []
         
-        for pattern in self.suspicious_patterns:
-            if re.search(pattern, text, re.IGNORECASE):
-                detected_patterns.append(pattern)
+        for pattern in self._compiled_suspicious_patterns:
+            if pattern.search(text):
+                detected_patterns.append(pattern.pattern)
         
         # Calculate suspicion score
         suspicion_score = min(len(detected_patterns) * 0.3, 1.0)
@@ -288,12 +302,113 @@ class FactCheckFilter(BaseContentFilter):
         return suspicion_score, detected_patterns
 
 
+class DatabaseContentFilter(BaseContentFilter):
+    """Filter compiled from an AIContentFilter row (see filter_registry)"""
+    
+    def __init__(self, rule: Dict[str, Any]):
+        super().__init__({'threshold': rule.get('threshold', 0.5)})
+        self.rule_id = rule['id']
+        self.name = rule['name']
+        self.filter_type = rule['filter_type']
+        self.block_request = rule.get('block_request', False)
+        self.flag_for_review = rule.get('flag_for_review', True)
+        self.modify_response = rule.get('modify_response', False)
+        self.metadata_key = f"{self.filter_type}_filter_{self.rule_id}"
+        self.keywords = self._compile_keywords(rule.get('keywords') or [])
+        self.patterns = self._compile_patterns(rule.get('patterns') or [])
+
+    def _compile_keywords(self, keywords: List[str]) -> Lexicon:
+        """Compile keywords and phrases into a lexicon matched on token boundaries"""
+        words = {str(keyword).strip().lower() for keyword in keywords}
+        words.discard('')
+        return Lexicon(sorted(words))
+
+    def _compile_patterns(self, patterns: List[str]) -> List[SafePattern]:
+        """Compile regex patterns for guarded evaluation, skipping invalid ones"""
+        compiled = []
+        for pattern in patterns:
+            try:
+                compiled.append(compile_safe(pattern))
+            except (re.error, TypeError) as e:
+                logger.warning(f"Invalid pattern in content filter '{self.name}': {pattern!r} ({e})")
+        return compiled
+
+    def filter_prompt(self, prompt: str, context: Dict[str, Any] = None) -> Tuple[bool, str, Dict[str, Any]]:
+        """Filter input prompt against the configured keywords and patterns"""
+        return self._apply(prompt, 'prompt', "")
+
+    def filter_response(self, response: str, context: Dict[str, Any] = None) -> Tuple[bool, str, Dict[str, Any]]:
+        """Filter AI response against the configured keywords and patterns"""
+        return self._apply(response, 'response', "عذراً، لا يمكنني تقديم هذا المحتوى.")
+
+    def _apply(self, text: str, kind: str, blocked_text: str) -> Tuple[bool, str, Dict[str, Any]]:
+        """Score the text and apply the configured actions"""
+        index = TokenIndex(text) if self.keywords else None
+        score, matches = self._calculate_score(text, index)
+        
+        metadata = {
+            f'{self.metadata_key}_score': score,
+            f'{self.metadata_key}_matches': matches,
+            'filter_type': f'{self.filter_type}_{kind}'
+        }
+        
+        # The filter fires once the score reaches the threshold, so a single
+        # match (0.5) triggers a row with the default threshold
+        if not matches or score < self.threshold:
+            return True, text, metadata
+        
+        logger.warning(f"Content filter '{self.name}' matched {kind}: {matches}")
+        
+        if self.flag_for_review:
+            metadata['flagged_for_review'] = True
+        
+        if self.block_request:
+            return False, blocked_text, metadata
+        
+        if kind == 'response' and self.modify_response and index is not None:
+            text = self.keywords.mask(index)
+        
+        return True, text, metadata
+
+    def _calculate_score(self, text: str, index: TokenIndex = None) -> Tuple[float, List[str]]:
+        """Calculate match score for text"""
+        matches = []
+        
+        if index is not None:
+            for entry, occurrences in self.keywords.count(index):
+                matches.extend([entry] * occurrences)
+        
+        for pattern in self.patterns:
+            if pattern.search(text):
+                matches.append(pattern.pattern)
+        
+        # Each match halves the remaining distance to 1.0
+        score = 1.0 - 0.5 ** len(matches)
+        
+        return score, matches
+
+
 class ContentFilterManager:
-    """Manager class for coordinating multiple content filters"""
+    """
+    Manager class for coordinating multiple content filters
+    
+    Verdicts are memoized by the hash of the normalized text (see
+    utils.verdict_cache.normalize_text) plus the filter-set version; filters
+    always see and return the caller's original text.
+    Calls that pass a context bypass the verdict cache.
+    """
+    
+    BLOCKED_TEXT = {
+        'prompt': "",
+        'response': "عذراً، لا يمكنني تقديم هذا المحتوى.",
+    }
     
     def __init__(self):
         self.filters = []
         self._load_filters()
+        
+        cache_config = getattr(settings, 'AI_GOVERNANCE', {}).get('VERDICT_CACHE', {})
+        self.verdict_cache = get_verdict_cache() if cache_config.get('ENABLED', True) else None
 
     def _load_filters(self):
         """Load and initialize all content filters"""
@@ -310,44 +425,76 @@ class ContentFilterManager:
                 filter_class = filter_classes[filter_path]
                 self.filters.append(filter_class())
 
+    def _active_filters(self) -> List[BaseContentFilter]:
+        """Static filters from settings followed by the compiled database filters"""
+        from .filter_registry import content_filter_registry
+        return self.filters + list(content_filter_registry.get_filters())
+
+    @property
+    def filter_set_version(self) -> str:
+        """Version covering the static filter configuration and the database filters"""
+        from .filter_registry import content_filter_registry
+        static_signature = ','.join(
+            f"{type(f).__name__}:{f.threshold}:{int(f.is_active)}" for f in self.filters
+        )
+        digest = hashlib.sha1(static_signature.encode('utf-8')).hexdigest()[:8]
+        return f"{digest}-{content_filter_registry.version}"
+
     def filter_prompt(self, prompt: str, context: Dict[str, Any] = None) -> Tuple[bool, str, Dict[str, Any]]:
         """Apply all filters to prompt"""
-        current_prompt = prompt
-        all_metadata = {}
-        
-        for filter_instance in self.filters:
-            if not filter_instance.is_active:
-                continue
-                
-            is_allowed, modified_prompt, metadata = filter_instance.filter_prompt(current_prompt, context)
-            
-            # Merge metadata
-            all_metadata.update(metadata)
-            
-            if not is_allowed:
-                return False, "", all_metadata
-            
-            current_prompt = modified_prompt
-        
-        return True, current_prompt, all_metadata
+        return self._filter_memoized(prompt, context, 'prompt')
 
     def filter_response(self, response: str, context: Dict[str, Any] = None) -> Tuple[bool, str, Dict[str, Any]]:
         """Apply all filters to response"""
-        current_response = response
+        return self._filter_memoized(response, context, 'response')
+
+    def filter_many(self, texts: List[str], kind: str = 'prompt',
+                    context: Dict[str, Any] = None) -> List[Tuple[bool, str, Dict[str, Any]]]:
+        """
+        Apply all filters to a batch of prompts or responses
+        The filter set and its version are resolved once for the whole batch
+        """
+        filters = self._active_filters()
+        version = self.filter_set_version
+        return [self._filter_with(filters, version, text, context, kind) for text in texts]
+
+    def _filter_memoized(self, text: str, context: Dict[str, Any], kind: str) -> Tuple[bool, str, Dict[str, Any]]:
+        """Serve the verdict from the cache or run the filters and remember it"""
+        filters = self._active_filters()
+        return self._filter_with(filters, self.filter_set_version, text, context, kind)
+
+    def _filter_with(self, filters: List[BaseContentFilter], version: str, text: str,
+                     context: Dict[str, Any], kind: str) -> Tuple[bool, str, Dict[str, Any]]:
+        """Filter one text against an already resolved filter set"""
+        if context or self.verdict_cache is None:
+            return self._run_filters(filters, text, context, kind)
+        
+        verdict = self.verdict_cache.get(text, kind, version)
+        if verdict is None:
+            verdict = self._run_filters(filters, text, context, kind)
+            self.verdict_cache.set(text, kind, version, verdict)
+        
+        return verdict
+
+    def _run_filters(self, filters: List[BaseContentFilter], text: str,
+                     context: Dict[str, Any], kind: str) -> Tuple[bool, str, Dict[str, Any]]:
+        """Apply filters in order, stopping at the first one that blocks"""
+        current_text = text
         all_metadata = {}
         
-        for filter_instance in self.filters:
+        for filter_instance in filters:
             if not filter_instance.is_active:
                 continue
-                
-            is_allowed, modified_response, metadata = filter_instance.filter_response(current_response, context)
+            
+            filter_method = getattr(filter_instance, f'filter_{kind}')
+            is_allowed, modified_text, metadata = filter_method(current_text, context)
             
             # Merge metadata
             all_metadata.update(metadata)
             
             if not is_allowed:
-                return False, "عذراً، لا يمكنني تقديم هذا المحتوى.", all_metadata
+                return False, self.BLOCKED_TEXT[kind], all_metadata
             
-            current_response = modified_response
+            current_text = modified_text
         
-        return True, current_response, all_metadata
+        return True, current_text, all_metadata
@@ -0,0 +1,222 @@
+"""
+Governance Rules Loader
+
+Loads the `code_governor` section of governance/ai_governance_rules.yaml and
+compiles its patterns once per process. Every CodeGovernor (the Django app,
+the pre-commit hook, the benchmark) shares the same compiled rules.
+
+The file is stat'ed on each lookup; it is only re-read when its mtime or size
+changes, and only recompiled when the content hash changes too. If the file
+is missing, unreadable or PyYAML is not installed, the built-in defaults
+below are used so the governor keeps working.
+"""
+
+import hashlib
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+import logging
+
+from .code_rules import AST_PATTERN_RULES
+from .utils.safe_regex import SafePattern, combine_safe, compile_safe, split_by_gaps
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+logger = logging.getLogger('ai_governance')
+
+DEFAULT_RULES_PATH = Path(__file__).resolve().parent.parent.parent / 'governance' / 'ai_governance_rules.yaml'
+
+# Used when the YAML file (or its code_governor section) is unavailable
+DEFAULT_MANDATORY_PATTERNS: Dict[str, List[str]] = {
+    "test_patterns": [
+        r"def test_\w+\(",
+        r"class Test\w+\(",
+        r"@pytest\.",
+        r"assert\s+",
+        r"self\.assert\w+\("
+    ],
+    "security_patterns": [
+        r"@login_required",
+        r"@permission_required",
+        r"authenticate\(",
+        r"validate_\w+\(",
+        r"sanitize_\w+\("
+    ],
+    "documentation_patterns": [
+        r'"""[\s\S]*?"""',
+        r"# TODO:",
+        r"# FIXME:",
+        r"Args:",
+        r"Returns:"
+    ]
+}
+
+DEFAULT_FORBIDDEN_PATTERNS: Dict[str, List[str]] = {
+    "fake_test_patterns": [
+        r"pass\s*$",
+        r"assert True",
+        r"assert 1 == 1",
+        r"# TODO: implement test",
+        r"# placeholder test",
+        r"mock\.return_value = True",
+        r"@patch.*return_value=True"
+    ],
+    "security_violations": [
+        r"eval\(",
+        r"exec\(",
+        r"__import__\(",
+        r"input\(\)",
+        r"raw_input\(\)",
+        r"shell=True",
+        r"password\s*=\s*['\"].*['\"]",
+        r"secret\s*=\s*['\"].*['\"]"
+    ],
+    "bad_practices": [
+        r"except:\s*pass",
+        r"except Exception:\s*pass",
+        r"print\(",
+        r"import \*",
+        r"global \w+",
+        r"# hack",
+        r"# quick fix"
+    ]
+}
+
+
+@dataclass(frozen=True)
+class PatternCategory:
+    """
+    Compiled forbidden patterns of one category.
+
+    `combined` matches if any gap-free pattern does; `text_combined` only
+    covers the gap-free patterns without an AST rule, which are the only
+    ones a parsed block still has to be scanned for. Patterns with `.*`
+    gaps (`gapped`) are never folded into the combined matcher, so they
+    keep their linear split evaluation and are checked one by one.
+    """
+    patterns: Tuple[Tuple[str, SafePattern], ...]
+    combined: Optional[SafePattern]
+    text_combined: Optional[SafePattern]
+    gapped: FrozenSet[str]
+
+    @classmethod
+    def compile(cls, patterns: List[str]) -> 'PatternCategory':
+        simple, gapped = split_by_gaps(patterns)
+        return cls(
+            patterns=tuple((pattern, compile_safe(pattern)) for pattern in patterns),
+            combined=combine_safe(simple),
+            text_combined=combine_safe([pattern for pattern in simple if pattern not in AST_PATTERN_RULES]),
+            gapped=frozenset(gapped),
+        )
+
+
+@dataclass(frozen=True)
+class CompiledRules:
+    """Compiled CodeGovernor rules for one version of the rules file"""
+    version: str
+    source: str
+    mandatory_patterns: Dict[str, List[str]]
+    forbidden_patterns: Dict[str, List[str]]
+    forbidden: Dict[str, PatternCategory]
+
+
+def compile_rules(config: Optional[Dict[str, Any]], version: str, source: str) -> CompiledRules:
+    """Compile the code_governor section of the rules file (missing keys fall back to the defaults)"""
+    config = config or {}
+    mandatory = config.get('mandatory_patterns') or DEFAULT_MANDATORY_PATTERNS
+    forbidden = config.get('forbidden_patterns') or DEFAULT_FORBIDDEN_PATTERNS
+
+    mandatory = {category: [str(p) for p in patterns or []] for category, patterns in mandatory.items()}
+    forbidden = {category: [str(p) for p in patterns or []] for category, patterns in forbidden.items()}
+
+    return CompiledRules(
+        version=version,
+        source=source,
+        mandatory_patterns=mandatory,
+        forbidden_patterns=forbidden,
+        forbidden={category: PatternCategory.compile(patterns) for category, patterns in forbidden.items()},
+    )
+
+
+DEFAULT_RULES = compile_rules(None, version='builtin', source='builtin')
+
+
+class GovernanceRulesLoader:
+    """
+    Per-process cache of compiled rules, keyed by rules file path.
+
+    Each entry remembers the file's (mtime_ns, size) and content hash: an
+    unchanged stat returns the compiled rules directly, a changed stat with
+    identical content only refreshes the stat.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[Tuple[int, int], str, CompiledRules]] = {}
+
+    def get(self, path: Optional[os.PathLike] = None) -> CompiledRules:
+        """Compiled rules for the given file (default: governance/ai_governance_rules.yaml)"""
+        path = str(path or DEFAULT_RULES_PATH)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return DEFAULT_RULES
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        entry = self._entries.get(path)
+        if entry is not None and entry[0] == signature:
+            return entry[2]
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == signature:
+                return entry[2]
+            try:
+                rules = self._load(path, signature, entry)
+            except Exception as e:
+                # Keep serving the last compiled rules rather than failing the analysis
+                logger.error(f"Failed to load governance rules from {path}: {e}")
+                rules = entry[2] if entry is not None else DEFAULT_RULES
+            return rules
+
+    def invalidate(self, path: Optional[os.PathLike] = None):
+        """Drop the cached rules for a file (all files if path is None)"""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(str(path), None)
+
+    def _load(self, path: str, signature: Tuple[int, int], entry) -> CompiledRules:
+        with open(path, 'rb') as f:
+            content = f.read()
+        digest = hashlib.sha256(content).hexdigest()[:16]
+
+        if entry is not None and entry[1] == digest:
+            # Touched but unchanged: keep the compiled rules
+            self._entries[path] = (signature, digest, entry[2])
+            return entry[2]
+
+        if yaml is None:
+            logger.warning("PyYAML is not installed; using built-in governance rules")
+            rules = DEFAULT_RULES
+        else:
+            document = yaml.safe_load(content) or {}
+            rules = compile_rules(document.get('code_governor'), version=digest, source=path)
+            logger.info(f"Compiled governance rules version {digest} from {path}")
+
+        self._entries[path] = (signature, digest, rules)
+        return rules
+
+
+governance_rules = GovernanceRulesLoader()
+
+
+def get_governance_rules(path: Optional[os.PathLike] = None) -> CompiledRules:
+    """Shared compiled governance rules for the process"""
+    return governance_rules.get(path)
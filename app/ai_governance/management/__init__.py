@@ -0,0 +1 @@
+# Management commands - حوكمة الذكاء الاصطناعي
@@ -0,0 +1,202 @@
+"""
+Management command لإعادة تقييم سجلات AIRequest التاريخية بالفلاتر الحالية
+
+Streams AIRequest rows in (created_at, id) order, scores prompt/response
+batches across a process pool with ContentFilterManager.filter_many and
+writes bias_score/quality_score back with bulk_update. Progress is
+checkpointed after every batch so an interrupted backfill can resume.
+"""
+import json
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from app.ai_governance.models import AIRequest
+
+_worker_manager = None
+
+
+def _init_worker():
+    """إعداد عملية العامل: Django ومدير الفلاتر"""
+    global _worker_manager
+    import django
+    django.setup()
+
+    from app.ai_governance.filters import ContentFilterManager
+    _worker_manager = ContentFilterManager()
+
+
+def _verdict_scores(verdict):
+    """(is_allowed, risk, bias) من نتيجة فلتر واحدة"""
+    is_allowed, _, metadata = verdict
+    scores = [value for key, value in metadata.items()
+              if key.endswith('_score') and isinstance(value, (int, float))]
+    return is_allowed, max(scores, default=0.0), metadata.get('bias_score', 0.0)
+
+
+def score_batch(rows):
+    """
+    تقييم دفعة من (id, prompt, response)
+
+    - bias_score: أعلى درجة تحيز بين الطلب والاستجابة
+    - quality_score: 1 - أعلى درجة خطر من أي فلتر، و0 إذا حُجب أي منهما
+    """
+    if _worker_manager is None:
+        _init_worker()
+
+    prompts = _worker_manager.filter_many([row[1] for row in rows], kind='prompt')
+    responses = _worker_manager.filter_many([row[2] or '' for row in rows], kind='response')
+
+    results = []
+    for row, prompt_verdict, response_verdict in zip(rows, prompts, responses):
+        prompt_allowed, prompt_risk, prompt_bias = _verdict_scores(prompt_verdict)
+        response_allowed, response_risk, response_bias = _verdict_scores(response_verdict)
+
+        if prompt_allowed and response_allowed:
+            quality_score = round(1.0 - min(max(prompt_risk, response_risk), 1.0), 4)
+        else:
+            quality_score = 0.0
+
+        results.append((row[0], round(min(max(prompt_bias, response_bias), 1.0), 4), quality_score))
+
+    return results
+
+
+class Command(BaseCommand):
+    help = 'إعادة تقييم bias_score و quality_score لطلبات الذكاء الاصطناعي التاريخية'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='عدد السجلات في كل دفعة (افتراضي: 2000)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='عدد العمليات المتوازية (1 للتشغيل في نفس العملية)',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            default='.rescore_ai_requests.checkpoint.json',
+            help='ملف حفظ التقدم للاستئناف',
+        )
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='تجاهل ملف التقدم والبدء من أول سجل',
+        )
+        parser.add_argument(
+            '--status',
+            default=None,
+            help='إعادة تقييم الطلبات بحالة محددة فقط (مثل completed)',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options['chunk_size'])
+        workers = max(1, options['workers'])
+        checkpoint_path = Path(options['checkpoint'])
+
+        checkpoint = {} if options['reset'] else self.load_checkpoint(checkpoint_path)
+        processed = checkpoint.get('processed', 0)
+
+        queryset = self.build_queryset(checkpoint, options['status'])
+        self.stdout.write(
+            self.style.SUCCESS(f'بدء إعادة التقييم (دفعات {chunk_size}، {workers} عملية)...')
+        )
+        if checkpoint:
+            self.stdout.write(f"استئناف بعد {checkpoint['id']} ({processed} سجل سابق)")
+
+        batches = self.iter_batches(queryset, chunk_size)
+
+        if workers == 1:
+            for batch in batches:
+                processed = self.apply_batch(batch, score_batch(batch), processed, checkpoint_path)
+        else:
+            # spawn بدلاً من fork حتى لا ترث العمليات اتصال قاعدة البيانات المفتوح
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                     initializer=_init_worker) as executor:
+                in_flight = deque()
+                for batch in batches:
+                    in_flight.append((batch, executor.submit(score_batch, batch)))
+                    # ترتيب النتائج يبقى كما هو حتى يكون ملف التقدم صحيحاً
+                    while len(in_flight) >= workers * 2:
+                        done_batch, future = in_flight.popleft()
+                        processed = self.apply_batch(done_batch, future.result(), processed, checkpoint_path)
+                while in_flight:
+                    done_batch, future = in_flight.popleft()
+                    processed = self.apply_batch(done_batch, future.result(), processed, checkpoint_path)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'تمت إعادة تقييم {processed} سجل بنجاح!')
+        )
+
+    def build_queryset(self, checkpoint, status=None):
+        """السجلات المتبقية مرتبة حسب (created_at, id)"""
+        queryset = AIRequest.objects.order_by('created_at', 'id')
+
+        if status:
+            queryset = queryset.filter(status=status)
+
+        if checkpoint:
+            created_at = parse_datetime(checkpoint['created_at'])
+            queryset = queryset.filter(
+                Q(created_at__gt=created_at) |
+                Q(created_at=created_at, id__gt=checkpoint['id'])
+            )
+
+        return queryset.values_list('id', 'prompt', 'response', 'created_at')
+
+    def iter_batches(self, queryset, chunk_size):
+        """قراءة السجلات بشكل متدفق وتجميعها في دفعات"""
+        batch = []
+        for row in queryset.iterator(chunk_size=chunk_size):
+            batch.append(row)
+            if len(batch) >= chunk_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def apply_batch(self, batch, results, processed, checkpoint_path):
+        """كتابة النتائج بـ bulk_update ثم حفظ التقدم"""
+        objects = [
+            AIRequest(id=request_id, bias_score=bias_score, quality_score=quality_score)
+            for request_id, bias_score, quality_score in results
+        ]
+        AIRequest.objects.bulk_update(objects, ['bias_score', 'quality_score'], batch_size=1000)
+
+        processed += len(batch)
+        last_id, _, _, last_created_at = batch[-1]
+        self.save_checkpoint(checkpoint_path, {
+            'created_at': last_created_at.isoformat(),
+            'id': str(last_id),
+            'processed': processed,
+        })
+        self.stdout.write(f'تمت معالجة {processed} سجل')
+        return processed
+
+    def load_checkpoint(self, path):
+        """قراءة ملف التقدم إن وجد"""
+        if not path.exists():
+            return {}
+        try:
+            return json.loads(path.read_text(encoding='utf-8'))
+        except (ValueError, OSError) as e:
+            self.stdout.write(self.style.WARNING(f'تعذر قراءة ملف التقدم، البدء من الأول: {e}'))
+            return {}
+
+    def save_checkpoint(self, path, data):
+        """حفظ التقدم بشكل ذري"""
+        tmp_path = path.with_name(path.name + '.tmp')
+        tmp_path.write_text(json.dumps(data), encoding='utf-8')
+        os.replace(tmp_path, path)
@@ -0,0 +1,30 @@
+"""
+AI Governance Signals
+
+Keep process-local governance caches in sync with the database
+"""
+
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import AIContentFilter
+from .filter_registry import publish_snapshot
+
+logger = logging.getLogger('ai_governance')
+
+
+@receiver([post_save, post_delete], sender=AIContentFilter)
+def republish_content_filters(sender, **kwargs):
+    """Publish a new filter-set version once the change is committed"""
+    transaction.on_commit(publish_snapshot)
+
+
+def publish_after_migrate(sender, **kwargs):
+    """Publish the filter set after migrations so workers start with a warm cache"""
+    try:
+        publish_snapshot()
+    except Exception as e:
+        logger.error(f"Failed to publish content filters after migrate: {e}")
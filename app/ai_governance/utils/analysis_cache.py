@@ -0,0 +1,122 @@
+"""
+Analysis Cache for CodeGovernor
+
+Memoizes CodeAnalysisResult by a hash of the response text and the
+governance rules version, so a response that is validated again
+(regeneration, upstream cache hit, page reload) is not re-analyzed.
+
+Results are stored as compact JSON strings in an in-process LRU and,
+optionally, in the Django cache (Redis). Django is imported lazily so the
+cache also works in the pre-commit hook and other scripts.
+"""
+
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+import logging
+
+from .lru import LRUCache
+
+logger = logging.getLogger('ai_governance')
+
+
+def _settings_config() -> Dict[str, Any]:
+    """AI_GOVERNANCE['ANALYSIS_CACHE'] if Django settings are configured"""
+    try:
+        from django.conf import settings
+        if settings.configured:
+            return getattr(settings, 'AI_GOVERNANCE', {}).get('ANALYSIS_CACHE', {})
+    except ImportError:
+        pass
+    return {}
+
+
+class AnalysisCache:
+    """
+    Two-level cache of serialized analysis results:
+    - an in-process LRU
+    - an optional shared layer in the Django cache (Redis)
+    """
+
+    KEY_PREFIX = 'ai_governance:code_analysis'
+
+    def __init__(self, max_entries: int = 2048, use_shared_cache: bool = False,
+                 shared_timeout: int = 3600):
+        self.local = LRUCache(max_entries)
+        self.use_shared_cache = use_shared_cache
+        self.shared_timeout = shared_timeout
+        self.shared_hits = 0
+        self.shared_misses = 0
+
+    @classmethod
+    def from_settings(cls) -> 'AnalysisCache':
+        config = _settings_config()
+        return cls(
+            max_entries=config.get('MAX_ENTRIES', 2048),
+            use_shared_cache=config.get('SHARED', False),
+            shared_timeout=config.get('TIMEOUT', 3600),
+        )
+
+    def make_key(self, response: str, version: str) -> str:
+        digest = hashlib.sha256(response.encode('utf-8', errors='surrogatepass')).hexdigest()
+        return f"{self.KEY_PREFIX}:{version}:{digest}"
+
+    def get(self, response: str, version: str) -> Optional[str]:
+        """Serialized result for the response under the rules version, or None"""
+        key = self.make_key(response, version)
+        payload = self.local.get(key)
+
+        if payload is None and self.use_shared_cache:
+            try:
+                from django.core.cache import cache
+                payload = cache.get(key)
+            except Exception as e:
+                logger.error(f"Shared analysis cache read failed: {e}")
+                payload = None
+            if payload is None:
+                self.shared_misses += 1
+            else:
+                self.shared_hits += 1
+                self.local.set(key, payload)
+
+        return payload
+
+    def set(self, response: str, version: str, payload: str):
+        """Store a serialized result"""
+        key = self.make_key(response, version)
+        self.local.set(key, payload)
+
+        if self.use_shared_cache:
+            try:
+                from django.core.cache import cache
+                cache.set(key, payload, self.shared_timeout)
+            except Exception as e:
+                logger.error(f"Shared analysis cache write failed: {e}")
+
+    def clear(self):
+        """Drop all locally cached results"""
+        self.local.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss metrics for both layers"""
+        stats = self.local.stats()
+        stats.update({
+            'shared_enabled': self.use_shared_cache,
+            'shared_hits': self.shared_hits,
+            'shared_misses': self.shared_misses,
+        })
+        return stats
+
+
+_analysis_cache = None
+_analysis_cache_lock = threading.Lock()
+
+
+def get_analysis_cache() -> AnalysisCache:
+    """Process-wide analysis cache configured from AI_GOVERNANCE['ANALYSIS_CACHE']"""
+    global _analysis_cache
+    if _analysis_cache is None:
+        with _analysis_cache_lock:
+            if _analysis_cache is None:
+                _analysis_cache = AnalysisCache.from_settings()
+    return _analysis_cache
@@ -0,0 +1,343 @@
+"""
+Guarded Regex Evaluation for AI Governance
+
+Governance patterns (content filters, CodeGovernor rules, database-defined
+filter patterns) are evaluated on untrusted, sometimes huge, text. Patterns
+with an unbounded gap such as `A.*B` backtrack quadratically when A occurs
+often without a following B. SafePattern bounds that cost:
+
+- Patterns with top-level `.*` gaps are split into parts that are searched
+  one after another (each part from where the previous one ended, on the
+  same line unless DOTALL is set), so the cost is a handful of forward
+  scans instead of a backtracking search from every occurrence of A.
+- Inputs longer than the configured cap are matched on their first
+  `max_input_chars` characters only. `search` fails closed: when that
+  prefix has no match, the input is reported as matching (a
+  `CappedMatch`), since the unscanned tail could hold one.
+- With the `regex` package installed, patterns that cannot be split are
+  matched with a per-call timeout. Timeouts fail closed: `search` returns a
+  `CappedMatch` and `findall` raises `RegexTimeout`. Without the package
+  the stdlib engine is used and calls exceeding the budget are only
+  reported once they finish.
+- `findall` never uses the split evaluation (it cannot reproduce findall
+  results), so on gap patterns it is only guarded by the input cap and, with
+  `regex` installed, the timeout.
+
+Truncations, budget overruns and timeouts are counted in `regex_metrics`
+and logged as warnings.
+"""
+
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+import logging
+
+try:
+    import regex as timeout_engine
+except ImportError:
+    timeout_engine = None
+
+logger = logging.getLogger('ai_governance')
+
+DEFAULT_MAX_INPUT_CHARS = 2_000_000
+DEFAULT_TIME_BUDGET = 0.05
+
+# Below this length even worst-case backtracking of a gap pattern stays far
+# under the time budget and is cheaper than the split evaluation's extra scans
+SPLIT_MIN_CHARS = 512
+
+# Constructs that make a split evaluation differ from the original pattern
+_UNSPLITTABLE_RE = re.compile(r'\\[1-9]|\(\?P=|\(\?[aiLmsux-]+\)|\$|\\Z')
+
+
+@dataclass
+class RegexLimits:
+    """Input cap (characters) and per-call time budget (seconds)"""
+    max_input_chars: int = DEFAULT_MAX_INPUT_CHARS
+    time_budget: float = DEFAULT_TIME_BUDGET
+
+
+_limits: Optional[RegexLimits] = None
+
+
+def get_limits() -> RegexLimits:
+    """Limits from AI_GOVERNANCE['SAFE_REGEX'] when Django is configured, else the defaults"""
+    global _limits
+    if _limits is None:
+        config = {}
+        try:
+            from django.conf import settings
+            if settings.configured:
+                config = getattr(settings, 'AI_GOVERNANCE', {}).get('SAFE_REGEX', {})
+        except ImportError:
+            pass
+        _limits = RegexLimits(
+            max_input_chars=config.get('MAX_INPUT_CHARS', DEFAULT_MAX_INPUT_CHARS),
+            time_budget=config.get('TIME_BUDGET', DEFAULT_TIME_BUDGET),
+        )
+    return _limits
+
+
+def configure(max_input_chars: Optional[int] = None, time_budget: Optional[float] = None) -> RegexLimits:
+    """Override the process-wide limits (scripts and tests)"""
+    limits = get_limits()
+    if max_input_chars is not None:
+        limits.max_input_chars = max_input_chars
+    if time_budget is not None:
+        limits.time_budget = time_budget
+    return limits
+
+
+class RegexMetrics:
+    """Counters for guarded evaluations that hit a limit"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._warned = set()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.truncated_inputs = 0
+            self.budget_overruns = 0
+            self.timeouts = 0
+            self.slowest: Dict[str, float] = {}
+
+    def record_truncation(self, pattern: str, length: int, limit: int):
+        with self._lock:
+            self.truncated_inputs += 1
+        logger.warning(
+            f"Governance pattern {pattern!r} matched only the first {limit} of {length} characters"
+        )
+
+    def record_overrun(self, pattern: str, elapsed: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.budget_overruns += 1
+            self.slowest[pattern] = max(self.slowest.get(pattern, 0.0), elapsed)
+            first = pattern not in self._warned
+            self._warned.add(pattern)
+        if first:
+            action = 'timed out' if timed_out else 'exceeded its time budget'
+            logger.warning(f"Governance pattern {pattern!r} {action} ({elapsed * 1000:.1f} ms)")
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                'truncated_inputs': self.truncated_inputs,
+                'budget_overruns': self.budget_overruns,
+                'timeouts': self.timeouts,
+                'slowest_ms': {pattern: round(seconds * 1000, 2) for pattern, seconds in self.slowest.items()},
+            }
+
+
+regex_metrics = RegexMetrics()
+
+
+def split_gaps(pattern: str) -> List[str]:
+    """
+    Split a pattern at its top-level `.*` / `.*?` gaps.
+
+    Returns [pattern] when there is no top-level gap or when the pattern
+    uses constructs (top-level alternation, backreferences, inline flags,
+    end anchors) whose meaning would change if the parts were matched
+    separately. Each part is matched leftmost-first, which is exact for
+    parts whose matches at one position all have the same length (literal
+    words and alternations of them, as in the governance patterns).
+    """
+    if '.*' not in pattern or _UNSPLITTABLE_RE.search(pattern):
+        return [pattern]
+
+    parts = []
+    depth = 0
+    in_class = False
+    start = 0
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\':
+            i += 2
+            continue
+        if in_class:
+            if char == ']':
+                in_class = False
+        elif char == '[':
+            in_class = True
+            if pattern[i + 1:i + 2] == ']':
+                i += 1
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif depth == 0 and char == '|':
+            # A top-level alternative would bind differently once split
+            return [pattern]
+        elif depth == 0 and pattern.startswith('.*', i):
+            end = i + 2
+            if pattern[end:end + 1] in ('?', '+'):
+                end += 1
+            parts.append(pattern[start:i])
+            start = end
+            i = end
+            continue
+        i += 1
+    parts.append(pattern[start:])
+
+    if len(parts) == 1 or any(not part for part in parts):
+        return [pattern]
+    return parts
+
+
+class CappedMatch:
+    """
+    Stands in for a match object when part of the input was never searched
+    (over the input cap without a match in the scanned prefix, or the search
+    timed out), so the input is treated as matching. The span is empty and
+    sits where searching stopped.
+    """
+
+    def __init__(self, pattern: str, position: int):
+        self.pattern = pattern
+        self.position = position
+
+    def group(self, *groups) -> str:
+        return ''
+
+    def start(self, group: int = 0) -> int:
+        return self.position
+
+    def end(self, group: int = 0) -> int:
+        return self.position
+
+    def span(self, group: int = 0) -> Tuple[int, int]:
+        return self.position, self.position
+
+
+class RegexTimeout(Exception):
+    """Raised by SafePattern.findall when the pattern ran out of its time budget"""
+
+    def __init__(self, pattern: str, elapsed: float):
+        super().__init__(f"Governance pattern {pattern!r} timed out ({elapsed * 1000:.1f} ms)")
+        self.pattern = pattern
+        self.elapsed = elapsed
+
+
+class SafePattern:
+    """
+    A compiled governance pattern with bounded evaluation cost.
+
+    `search` returns a match object (for gap patterns: the match of the last
+    part), a `CappedMatch` for over-cap input without a match in the scanned
+    prefix or for a timed-out search, or None; `findall` keeps the stdlib
+    semantics on the scanned prefix and raises `RegexTimeout` on a timeout.
+    """
+
+    def __init__(self, pattern: str, flags: int = re.IGNORECASE):
+        self.pattern = pattern
+        self.flags = flags
+        self.compiled = re.compile(pattern, flags)
+        parts = split_gaps(pattern)
+        self.parts = [re.compile(part, flags) for part in parts] if len(parts) > 1 else None
+        self._timeout_compiled = None
+        if self.parts is None and timeout_engine is not None:
+            try:
+                self._timeout_compiled = timeout_engine.compile(pattern, flags)
+            except Exception:
+                self._timeout_compiled = None
+
+    @property
+    def is_split(self) -> bool:
+        """True when the pattern is evaluated part by part in linear time"""
+        return self.parts is not None
+
+    def _run(self, method: str, text: str):
+        """Evaluate with the input cap and time budget, recording any overrun"""
+        limits = _limits or get_limits()
+        capped = len(text) > limits.max_input_chars
+        if capped:
+            regex_metrics.record_truncation(self.pattern, len(text), limits.max_input_chars)
+            text = text[:limits.max_input_chars]
+
+        started = time.perf_counter()
+        if method == 'search' and self.parts is not None and len(text) > SPLIT_MIN_CHARS:
+            result = self._search_parts(text)
+        elif self._timeout_compiled is not None:
+            try:
+                result = getattr(self._timeout_compiled, method)(text, timeout=limits.time_budget)
+            except TimeoutError:
+                elapsed = time.perf_counter() - started
+                regex_metrics.record_overrun(self.pattern, elapsed, timed_out=True)
+                if method == 'search':
+                    return CappedMatch(self.pattern, 0)
+                raise RegexTimeout(self.pattern, elapsed)
+        else:
+            result = getattr(self.compiled, method)(text)
+
+        elapsed = time.perf_counter() - started
+        if elapsed > limits.time_budget:
+            regex_metrics.record_overrun(self.pattern, elapsed)
+        if capped and method == 'search' and result is None:
+            return CappedMatch(self.pattern, limits.max_input_chars)
+        return result
+
+    def search(self, text: str):
+        """First match in text, or None"""
+        return self._run('search', text)
+
+    def findall(self, text: str) -> List:
+        """All matches in text (stdlib findall semantics); raises RegexTimeout on a timeout"""
+        return self._run('findall', text)
+
+    def _search_parts(self, text: str):
+        """
+        Match the parts in order, each part from where the previous one
+        ended. Without DOTALL a gap cannot cross a line break: when the next
+        part only occurs on a later line, no match of the first part before
+        that line can succeed either, so the search resumes at the start of
+        that line. Every step is a single C-level search that moves forward.
+        """
+        dotall = bool(self.flags & re.DOTALL)
+        first, rest = self.parts[0], self.parts[1:]
+        position = 0
+
+        while True:
+            match = first.search(text, position)
+            if match is None:
+                return None
+
+            end = match.end()
+            for part in rest:
+                match = part.search(text, end)
+                if match is None:
+                    return None
+                if not dotall and text.find('\n', end, match.start()) != -1:
+                    break
+                end = match.end()
+            else:
+                return match
+
+            position = text.rfind('\n', 0, match.start()) + 1
+
+
+def compile_safe(pattern: str, flags: int = re.IGNORECASE) -> SafePattern:
+    """Compile a governance pattern for guarded evaluation"""
+    return SafePattern(pattern, flags)
+
+
+def combine_safe(patterns: List[str], flags: int = re.IGNORECASE) -> Optional[SafePattern]:
+    """One guarded pattern matching wherever any of the (gap-free) patterns matches"""
+    if not patterns:
+        return None
+    return SafePattern('|'.join(f'(?:{pattern})' for pattern in patterns), flags)
+
+
+def split_by_gaps(patterns: List[str]) -> Tuple[List[str], List[str]]:
+    """(patterns without top-level gaps, patterns with gaps)"""
+    simple, gapped = [], []
+    for pattern in patterns:
+        (gapped if len(split_gaps(pattern)) > 1 else simple).append(pattern)
+    return simple, gapped
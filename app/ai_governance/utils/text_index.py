@@ -0,0 +1,346 @@
+"""
+Token Index for AI Governance
+
+Matches lexicon words and phrases on token boundaries of a normalized text:
+'hell' does not match 'hello' and 'كلب' does not match inside a longer word.
+
+Matching runs at substring speed. The text is only changed where it has to
+be (diacritics removed, upper-case forms of the lexicon's letters lowered),
+spelling variants are handled by the patterns instead, and each lexicon word
+is searched for by a regex that starts with the word itself, so the regex
+engine skips ahead with a fast substring search and checks token boundaries
+with lookarounds only where the word occurs.
+"""
+
+import re
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Arabic diacritics (harakat, shadda, sukun, superscript alef) and tatweel are
+# kept inside a token by the tokenizer and removed by the normalizer
+_ARABIC_MARKS = '\u064b-\u065f\u0670'
+_TATWEEL = '\u0640'
+_MARK_CHARS = tuple(chr(code) for code in range(0x064b, 0x0660)) + ('\u0670', _TATWEEL)
+
+_TOKEN_CHARS = rf'\w{_ARABIC_MARKS}{_TATWEEL}'
+TOKEN_RE = re.compile(rf'[{_TOKEN_CHARS}]+')
+_MARKS_RE = re.compile(rf'[{_ARABIC_MARKS}{_TATWEEL}]+')
+_LETTER_VARIANTS = (
+    ('\u0623', '\u0627'), ('\u0625', '\u0627'), ('\u0622', '\u0627'), ('\u0671', '\u0627'),
+    ('\u0649', '\u064a'),
+)
+# Letters of a normalized word and the spellings they stand for in a text
+_LETTER_CLASSES = {
+    letter: '[%s%s]' % (letter, ''.join(variant for variant, target in _LETTER_VARIANTS if target == letter))
+    for letter in {letter for _, letter in _LETTER_VARIANTS}
+}
+
+# Definite article with optional attached conjunction/preposition
+ARTICLE_PREFIXES = ('ال', 'وال', 'فال', 'بال', 'كال', 'لل')
+
+
+def strip_marks(text: str) -> str:
+    """Remove Arabic diacritics and tatweel"""
+    # One substring check per mark is much cheaper than a regex pass over the text
+    for mark in _MARK_CHARS:
+        if mark in text:
+            text = text.replace(mark, '')
+    return text
+
+
+def normalize_for_index(text: str) -> str:
+    """Lower-case and unify Arabic spelling variants (diacritics, tatweel, alef forms)"""
+    if text.isascii():
+        return text.lower()
+    text = strip_marks(text)
+    for variant, letter in _LETTER_VARIANTS:
+        text = text.replace(variant, letter)
+    return text.lower()
+
+
+def tokenize(text: str) -> List[str]:
+    """Normalized tokens of text"""
+    return TOKEN_RE.findall(normalize_for_index(text))
+
+
+class TokenIndex:
+    """
+    One text prepared for lexicon matching.
+
+    Diacritics are removed up front. Each lexicon then lower-cases only the
+    letters it uses (see Lexicon._search); the fully normalized text and its
+    tokens are only computed for lexicons too large to search word by word.
+    """
+
+    __slots__ = ('text', 'stripped', '_searches', '_normalized', '_tokens', '_token_set', '_gaps')
+
+    def __init__(self, text: str):
+        self.text = text or ''
+        self.stripped = self.text if self.text.isascii() else strip_marks(self.text)
+        # Keyed by the lexicon object, not id(): the entry keeps its key alive
+        self._searches: Dict['Lexicon', Tuple[str, List[Tuple[str, '_EntryPatterns']]]] = {}
+        self._normalized: Optional[str] = None
+        self._tokens: Optional[List[str]] = None
+        self._token_set: Optional[Set[str]] = None
+        self._gaps: Optional[Tuple[List[int], List[int]]] = None
+
+    @property
+    def aligned(self) -> bool:
+        """True when normalization kept every character at its original offset"""
+        return len(self.stripped) == len(self.text)
+
+    @property
+    def normalized(self) -> str:
+        if self._normalized is None:
+            self._normalized = normalize_for_index(self.stripped)
+        return self._normalized
+
+    @property
+    def tokens(self) -> List[str]:
+        if self._tokens is None:
+            self._tokens = TOKEN_RE.findall(self.normalized)
+        return self._tokens
+
+    @property
+    def token_set(self) -> Set[str]:
+        if self._token_set is None:
+            self._token_set = set(self.tokens)
+        return self._token_set
+
+    def __contains__(self, token: str) -> bool:
+        return token in self.token_set
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def original_span(self, start: int, end: int) -> Tuple[int, int]:
+        """Span of the original text for a span of the stripped text (marks inside and after included)"""
+        if self.aligned:
+            return start, end
+        if self._gaps is None:
+            # Stripped offset of each removed run of marks and the marks removed up to it
+            positions, removed = [], []
+            total = 0
+            for match in _MARKS_RE.finditer(self.text):
+                positions.append(match.start() - total)
+                total += match.end() - match.start()
+                removed.append(total)
+            self._gaps = positions, removed
+        positions, removed = self._gaps
+
+        def shift(offset: int) -> int:
+            run = bisect_right(positions, offset)
+            return offset + (removed[run - 1] if run else 0)
+
+        return shift(start), shift(end)
+
+
+def _spelling_pattern(token: str) -> str:
+    """Regex for a normalized token that accepts its spelling variants"""
+    return ''.join(_LETTER_CLASSES.get(char) or re.escape(char) for char in token)
+
+
+class _EntryPatterns:
+    """Compiled searches for one lexicon entry"""
+
+    __slots__ = ('length', 'literal', 'pivot_forms', 'upper_letters', 'prefixes', 'any', 'standalone', 'article')
+
+    def __init__(self, phrase: Tuple[str, ...], prefixes: Tuple[str, ...]):
+        token = rf'[{_TOKEN_CHARS}]'
+        word = _spelling_pattern(phrase[0])
+        tail = ''.join(rf'[^{_TOKEN_CHARS}]+' + _spelling_pattern(part) for part in phrase[1:]) + rf'(?!{token})'
+        # The word comes first so the engine can search for it as a substring;
+        # the start boundary (or an attached article) is checked looking back
+        standalone = rf'(?<!{token}{word})'
+        articles = '|'.join(rf'(?<=(?<!{token}){re.escape(prefix)}{word})' for prefix in prefixes)
+
+        self.length = len(phrase[0]) if len(phrase) == 1 else None
+        self.prefixes = tuple(sorted(prefixes, key=len, reverse=True))
+        self.standalone = re.compile(word + standalone + tail)
+        self.any = re.compile(f'{word}(?:{standalone}|{articles}){tail}') if prefixes else self.standalone
+        self.article = re.compile(f'{word}(?:{articles}){tail}') if prefixes else None
+
+        # Part of the word spelled the same in every variant, looked for with str.find first
+        self.literal = re.match('[^%s]*' % ''.join(_LETTER_CLASSES), phrase[0]).group(0)
+        # Upper-case forms of the entry's letters, and one cased letter that
+        # must occur in some case for the entry to occur at all. Upper-case
+        # A-J share their low byte with common Arabic letters, which makes
+        # looking for them in Arabic text slow, so later letters are preferred.
+        upper_forms = {
+            char: {upper for upper in (char.upper(), char.title()) if len(upper) == 1 and upper.lower() == char} - {char}
+            for char in ''.join(phrase)
+        }
+        cased = [char for char, forms in upper_forms.items() if forms]
+        self.upper_letters = tuple(sorted(set().union(*upper_forms.values())))
+        pivot = min(cased, key=lambda char: 'a' <= char <= 'j') if cased else None
+        self.pivot_forms = (pivot,) + tuple(sorted(upper_forms[pivot])) if pivot else ()
+
+    def article_start(self, text: str, start: int) -> int:
+        """Start of the article attached before a match, or start"""
+        for prefix in self.prefixes:
+            if text.startswith(prefix, start - len(prefix)):
+                return start - len(prefix)
+        return start
+
+
+class Lexicon:
+    """
+    A set of words and phrases matched against a TokenIndex.
+
+    Each entry is tokenized and normalized like the text. Arabic entries also
+    match with the definite article attached ('كلب' matches 'والكلب'), so no
+    per-token stemming is needed on the text side.
+
+    Lexicons with up to PREFILTER_MAX_WORDS words search the text for each
+    entry; larger ones first intersect the text's tokens with their words.
+    """
+
+    PREFILTER_MAX_WORDS = 64
+    # Longer non-ASCII texts only have the lexicon's own letters lower-cased
+    LOWER_MAX_LENGTH = 256
+
+    def __init__(self, entries: Iterable[str]):
+        self.entries: List[str] = []
+        self._patterns: Dict[str, _EntryPatterns] = {}
+        self._by_first_token: Dict[str, List[str]] = {}
+        words = set()
+
+        for entry in entries:
+            phrase = tuple(tokenize(str(entry)))
+            if not phrase or entry in self._patterns:
+                continue
+            prefixes = self._prefixes(phrase[0])
+            self.entries.append(entry)
+            self._patterns[entry] = _EntryPatterns(phrase, prefixes)
+            for prefix in ('',) + prefixes:
+                self._by_first_token.setdefault(prefix + phrase[0], []).append(entry)
+            words.add(phrase[0])
+
+        self._entry_patterns = [(entry, self._patterns[entry]) for entry in self.entries]
+        self._cased = any(patterns.pivot_forms for patterns in self._patterns.values())
+        self._first_tokens = frozenset(self._by_first_token)
+        self._search_all = len(words) <= self.PREFILTER_MAX_WORDS
+
+    @staticmethod
+    def _prefixes(word: str) -> Tuple[str, ...]:
+        """Articles an entry's first word may carry"""
+        if word.isascii() or word.startswith('ال'):
+            return ()
+        return ARTICLE_PREFIXES
+
+    def __bool__(self) -> bool:
+        return bool(self.entries)
+
+    def _candidates(self, index: TokenIndex) -> List[str]:
+        """Entries worth searching for, in lexicon order"""
+        if self._search_all:
+            return self.entries
+        candidates = set()
+        for token in self._first_tokens.intersection(index.token_set):
+            candidates.update(self._by_first_token[token])
+        return [entry for entry in self.entries if entry in candidates]
+
+    def _search(self, index: TokenIndex) -> Tuple[str, List[Tuple[str, _EntryPatterns]]]:
+        """The text to search, aligned with index.stripped, and the entries whose literal occurs in it"""
+        search = index._searches.get(self)
+        if search is not None:
+            return search
+
+        text = index.stripped
+        entries = self._entry_patterns if self._search_all else [
+            (entry, self._patterns[entry]) for entry in self._candidates(index)
+        ]
+        lowered = text.lower() if len(text) <= self.LOWER_MAX_LENGTH or text.isascii() else None
+        if lowered is not None and len(lowered) == len(text):
+            # Keep the text itself when nothing was upper-case, so no copy stays alive
+            text = text if lowered == text else lowered
+        elif self._cased:
+            # Lower-case only the letters of entries that can occur; lower()
+            # looks up every character in the Unicode tables
+            entries = [
+                (entry, patterns) for entry, patterns in entries
+                if not patterns.pivot_forms or any(form in text for form in patterns.pivot_forms)
+            ]
+            upper_letters = {letter for _, patterns in entries for letter in patterns.upper_letters}
+            for letter in sorted(upper_letters):
+                if letter in text:
+                    text = text.replace(letter, letter.lower())
+        # A plain substring check per entry before any boundary regex runs;
+        # on short texts this is most of the work
+        entries = [(entry, patterns) for entry, patterns in entries if patterns.literal in text]
+        search = index._searches[self] = (text, entries)
+        return search
+
+    @staticmethod
+    def _occurrences(text: str, patterns: _EntryPatterns) -> List[Tuple[int, int]]:
+        """Spans of the search text where an entry occurs on token boundaries"""
+        if patterns.literal not in text:
+            return []
+        if patterns.article is None:
+            return [match.span() for match in patterns.standalone.finditer(text)]
+        return [(patterns.article_start(text, match.start()), match.end()) for match in patterns.any.finditer(text)]
+
+    def find(self, index: TokenIndex) -> List[str]:
+        """Entries present in the text, in lexicon order"""
+        text, entries = self._search(index)
+        return [entry for entry, patterns in entries if patterns.any.search(text)]
+
+    def count(self, index: TokenIndex) -> List[Tuple[str, int]]:
+        """(entry, occurrences) for entries present in the text, in lexicon order"""
+        text, entries = self._search(index)
+        counts = []
+        for entry, patterns in entries:
+            occurrences = len(self._occurrences(text, patterns))
+            if occurrences:
+                counts.append((entry, occurrences))
+        return counts
+
+    def spans(self, index: TokenIndex, entries: Iterable[str] = None) -> List[Tuple[int, int]]:
+        """Character spans of the original text for the given entries (default: all present entries)"""
+        text, possible = self._search(index)
+        patterns = [item[1] for item in possible] if entries is None else [self._patterns[entry] for entry in entries]
+        spans = [span for entry_patterns in patterns for span in self._occurrences(text, entry_patterns)]
+        if not index.aligned:
+            spans = [index.original_span(start, end) for start, end in spans]
+        return spans
+
+    def mask(self, index: TokenIndex, entries: Iterable[str] = None, mask: str = '*') -> str:
+        """The original text with the given entries (default: all present entries) masked"""
+        text, possible = self._search(index)
+        if entries is None:
+            entries = [entry for entry, _ in possible]
+        patterns = [self._patterns[entry] for entry in entries]
+        if text != index.text or any(entry_patterns.length is None for entry_patterns in patterns):
+            return mask_spans(index.text, self.spans(index, entries), mask)
+
+        # The text needed no changes, so single words are replaced in place.
+        # Occurrences left after that carry an article (or are inside a longer
+        # word); those are masked by their spans.
+        article_spans = []
+        for entry_patterns in patterns:
+            if entry_patterns.literal not in text:
+                continue
+            text = entry_patterns.standalone.sub(mask * entry_patterns.length, text)
+            if entry_patterns.article is not None and entry_patterns.literal in text:
+                article_spans.extend(
+                    (entry_patterns.article_start(text, match.start()), match.end())
+                    for match in entry_patterns.article.finditer(text)
+                )
+        return mask_spans(text, article_spans, mask) if article_spans else text
+
+
+def mask_spans(text: str, spans: Iterable[Tuple[int, int]], mask: str = '*') -> str:
+    """Replace each (start, end) span of text with mask characters; overlapping spans are merged"""
+    parts = []
+    cursor = 0
+    for start, end in sorted(spans):
+        if end <= cursor:
+            continue
+        if start < cursor:
+            start = cursor
+        else:
+            parts.append(text[cursor:start])
+        parts.append(mask * (end - start))
+        cursor = end
+    parts.append(text[cursor:])
+    return ''.join(parts)
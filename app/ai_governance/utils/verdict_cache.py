@@ -0,0 +1,144 @@
+"""
+Verdict Cache for AI Governance
+
+Memoizes filter verdicts by content hash so repeated prompts and responses
+(suggested questions, retries) are filtered in O(1)
+"""
+
+import copy
+import hashlib
+import threading
+import unicodedata
+from typing import Any, Dict, Optional, Tuple
+from django.conf import settings
+from django.core.cache import cache
+import logging
+
+from .lru import LRUCache
+
+logger = logging.getLogger('ai_governance')
+
+
+def normalize_text(text: str) -> str:
+    """
+    Canonical form used for the cache key only (filters see the original text):
+    NFC unicode, LF line endings, no surrounding whitespace
+    """
+    text = unicodedata.normalize('NFC', text or '')
+    return text.replace('\r\n', '\n').replace('\r', '\n').strip()
+
+
+class VerdictCache:
+    """
+    Two-level cache of (is_allowed, text, metadata) verdicts:
+    - an in-process LRU
+    - an optional shared layer in the Django cache (Redis)
+
+    Keys are derived from the normalized text, the direction (prompt/response)
+    and the filter-set version, so changing any filter invalidates old verdicts.
+
+    Texts that differ only in normalization share an entry, but the returned
+    text is always derived from the caller's own text: unchanged texts are
+    stored without a copy and returned as passed in, and texts a filter
+    rewrote are only served to the exact text they were computed from.
+    """
+
+    KEY_PREFIX = 'ai_governance:verdict:v2'
+
+    def __init__(self, max_entries: int = 10000, use_shared_cache: bool = False,
+                 shared_timeout: int = 3600):
+        self.local = LRUCache(max_entries)
+        self.use_shared_cache = use_shared_cache
+        self.shared_timeout = shared_timeout
+        self.shared_hits = 0
+        self.shared_misses = 0
+
+    @classmethod
+    def from_settings(cls) -> 'VerdictCache':
+        config = getattr(settings, 'AI_GOVERNANCE', {}).get('VERDICT_CACHE', {})
+        return cls(
+            max_entries=config.get('MAX_ENTRIES', 10000),
+            use_shared_cache=config.get('SHARED', False),
+            shared_timeout=config.get('TIMEOUT', 3600),
+        )
+
+    def make_key(self, text: str, kind: str, version: str) -> str:
+        digest = hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+        return f"{self.KEY_PREFIX}:{kind}:{version}:{digest}"
+
+    def get(self, text: str, kind: str, version: str) -> Optional[Tuple[bool, str, Dict[str, Any]]]:
+        """Return a copy of the cached verdict for the caller's text, or None"""
+        key = self.make_key(text, kind, version)
+        entry = self.local.get(key)
+
+        if entry is None and self.use_shared_cache:
+            try:
+                entry = cache.get(key)
+            except Exception as e:
+                logger.error(f"Shared verdict cache read failed: {e}")
+                entry = None
+            if entry is None:
+                self.shared_misses += 1
+            else:
+                self.shared_hits += 1
+                entry = tuple(entry)
+                self.local.set(key, entry)
+
+        if entry is None:
+            return None
+
+        is_allowed, result_text, metadata, source = entry
+        if result_text is None:
+            result_text = text
+        elif source is not None and source != text:
+            # Rewritten for a differently formatted text; filter this one again
+            return None
+        return is_allowed, result_text, copy.deepcopy(metadata)
+
+    def set(self, text: str, kind: str, version: str, verdict: Tuple[bool, str, Dict[str, Any]]):
+        """Store the verdict computed for the caller's text"""
+        key = self.make_key(text, kind, version)
+        is_allowed, result_text, metadata = verdict
+        if result_text == text:
+            # Unchanged: served back as whatever text the next caller passes
+            entry = (is_allowed, None, copy.deepcopy(metadata), None)
+        elif not is_allowed:
+            # Blocked text does not depend on the input
+            entry = (is_allowed, result_text, copy.deepcopy(metadata), None)
+        else:
+            entry = (is_allowed, result_text, copy.deepcopy(metadata), text)
+        self.local.set(key, entry)
+
+        if self.use_shared_cache:
+            try:
+                cache.set(key, entry, self.shared_timeout)
+            except Exception as e:
+                logger.error(f"Shared verdict cache write failed: {e}")
+
+    def clear(self):
+        """Drop all locally cached verdicts"""
+        self.local.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss metrics for both layers"""
+        stats = self.local.stats()
+        stats.update({
+            'shared_enabled': self.use_shared_cache,
+            'shared_hits': self.shared_hits,
+            'shared_misses': self.shared_misses,
+        })
+        return stats
+
+
+_verdict_cache = None
+_verdict_cache_lock = threading.Lock()
+
+
+def get_verdict_cache() -> VerdictCache:
+    """Process-wide verdict cache configured from AI_GOVERNANCE['VERDICT_CACHE']"""
+    global _verdict_cache
+    if _verdict_cache is None:
+        with _verdict_cache_lock:
+            if _verdict_cache is None:
+                _verdict_cache = VerdictCache.from_settings()
+    return _verdict_cache
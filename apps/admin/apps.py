@@ -0,0 +1,15 @@
+from django.apps import AppConfig
+
+
+class AdminConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.admin'
+    verbose_name = 'خدمة الإدارة'
+
+    def ready(self):
+        """ربط إشارات إبطال الذاكرة المؤقتة ومعالجات ناقل الإبطال"""
+        from django.apps import apps
+        from . import signals
+
+        if apps.is_installed('app.ai_governance'):
+            signals.connect_content_filters()
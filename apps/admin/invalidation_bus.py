@@ -0,0 +1,209 @@
+"""
+ناقل إبطال الذاكرة المؤقتة بين العمليات عبر Redis pub/sub - مشروع نائبك
+
+عند حفظ أو حذف نموذج مخزن محلياً (الإعدادات، الصلاحيات، مرشحات المحتوى)
+تُنشر رسالة {model, key, version} على قناة Redis. كل عملية (gunicorn worker)
+تشغّل خيط اشتراك خفيفاً يستدعي معالجات النموذج المسجلة فتحذف مدخلاتها المحلية.
+
+ما دام الاشتراك قائماً (is_healthy) يمكن للسجلات المحلية إطالة فترات فحص
+أرقام الإصدارات في Redis؛ إذا انقطع الاشتراك تعود للفحص الدوري القصير، وعند
+إعادة الاتصال تُستدعى كل المعالجات بـ key=None لأن رسائل فترة الانقطاع ضاعت.
+
+بدون حزمة redis أو بدون URL في الإعدادات يبقى الناقل معطلاً وتعمل السجلات
+بالفحص الدوري وحده.
+"""
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+import logging
+
+from django.conf import settings
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHANNEL = 'naebak_admin:invalidation'
+RECONNECT_MIN_DELAY = 1.0
+RECONNECT_MAX_DELAY = 30.0
+# PING دوري حتى يُكتشف الاتصال الميت بدلاً من انتظار رسائل لن تصل
+HEALTH_CHECK_INTERVAL = 15
+
+# معالج يستقبل (key, version)؛ key=None يعني إبطال كل مدخلات النموذج
+Handler = Callable[[Optional[str], Optional[int]], None]
+
+
+class InvalidationBus:
+    """
+    ناشر ومشترك على قناة الإبطال.
+
+    خيط الاشتراك يبدأ عند أول استخدام في كل عملية (وليس في ready())،
+    لأن gunicorn ينشئ العمال بـ fork والخيوط لا تنتقل إلى العملية الابنة.
+    """
+
+    def __init__(self, url: Optional[str] = None, channel: Optional[str] = None):
+        config = getattr(settings, 'ADMIN_SERVICE_SETTINGS', {}).get('INVALIDATION_BUS', {})
+        self.url = url if url is not None else config.get('URL')
+        self.channel = channel or config.get('CHANNEL', DEFAULT_CHANNEL)
+        self._handlers: Dict[str, List[Handler]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self._connected = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._publisher = None
+        self._publisher_pid: Optional[int] = None
+
+    @property
+    def enabled(self) -> bool:
+        """هل الناقل مهيأ (حزمة redis و URL)"""
+        return redis is not None and bool(self.url)
+
+    def is_healthy(self) -> bool:
+        """هل الاشتراك قائم في هذه العملية (يبدأ الخيط إن لم يكن يعمل)"""
+        if not self.enabled:
+            return False
+        self.start()
+        return self._connected.is_set()
+
+    def subscribe(self, model_label: str, handler: Handler):
+        """تسجيل معالج لرسائل نموذج (مثل 'admin.systemsettings')"""
+        with self._lock:
+            if handler not in self._handlers[model_label]:
+                self._handlers[model_label].append(handler)
+
+    def publish(self, model_label: str, key: Optional[Any] = None, version: Optional[int] = None):
+        """نشر رسالة إبطال (أخطاء Redis تُسجل فقط؛ الفحص الدوري يغطيها)"""
+        if not self.enabled:
+            return
+        message = json.dumps({
+            'model': model_label,
+            'key': None if key is None else str(key),
+            'version': version,
+        })
+        try:
+            if self._publisher is None or self._publisher_pid != os.getpid():
+                self._publisher = redis.Redis.from_url(self.url)
+                self._publisher_pid = os.getpid()
+            self._publisher.publish(self.channel, message)
+        except Exception as e:
+            logger.warning(f"Failed to publish invalidation for {model_label}: {e}")
+
+    def dispatch(self, data) -> bool:
+        """تنفيذ معالجات رسالة واردة؛ False إذا كانت الرسالة غير صالحة"""
+        try:
+            if isinstance(data, bytes):
+                data = data.decode('utf-8')
+            message = json.loads(data)
+            model_label = message['model']
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring malformed invalidation message: {e}")
+            return False
+
+        for handler in list(self._handlers.get(model_label, ())):
+            try:
+                handler(message.get('key'), message.get('version'))
+            except Exception as e:
+                logger.error(f"Invalidation handler for {model_label} failed: {e}")
+        return True
+
+    def invalidate_all(self):
+        """استدعاء كل المعالجات بـ key=None (بعد انقطاع قد تكون فيه رسائل ضاعت)"""
+        for model_label in list(self._handlers):
+            self.dispatch(json.dumps({'model': model_label, 'key': None, 'version': None}))
+
+    def start(self):
+        """تشغيل خيط الاشتراك في العملية الحالية إن لم يكن يعمل"""
+        if not self.enabled:
+            return
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._pid == pid and self._thread is not None and self._thread.is_alive():
+                return
+            # عملية جديدة بعد fork: حالة الاتصال الموروثة لا تخصها
+            self._connected.clear()
+            self._pid = pid
+            self._thread = threading.Thread(target=self._listen, name='admin-invalidation-bus', daemon=True)
+            self._thread.start()
+
+    def _listen(self):
+        delay = RECONNECT_MIN_DELAY
+        while True:
+            pubsub = None
+            try:
+                client = redis.Redis.from_url(
+                    self.url, health_check_interval=HEALTH_CHECK_INTERVAL, socket_keepalive=True
+                )
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                self._connected.set()
+                logger.info(f"Subscribed to invalidation channel {self.channel}")
+                # رسائل فترة الانقطاع (أو ما قبل الاشتراك) غير معروفة
+                self.invalidate_all()
+                delay = RECONNECT_MIN_DELAY
+                while True:
+                    item = pubsub.get_message(timeout=1.0)
+                    if item is not None and item.get('type') == 'message':
+                        self.dispatch(item['data'])
+            except Exception as e:
+                logger.warning(f"Invalidation subscription lost, falling back to version polling: {e}")
+            finally:
+                self._connected.clear()
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception as e:
+                        logger.debug(f"Closing invalidation subscription failed: {e}")
+            time.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+
+invalidation_bus = InvalidationBus()
+
+
+class LocalVersion:
+    """
+    نسخة محلية من رقم إصدار في Redis، صالحة ما دام الناقل متصلاً.
+
+    رسائل الناقل ترفع النسخة المحلية (الأرقام تتزايد فقط)؛ رسالة بدون رقم
+    تحذفها. القراءة التي بدأت قبل الحذف لا تُخزن حتى لا يعود رقم قديم.
+    """
+
+    def __init__(self, bus: InvalidationBus = None):
+        self.bus = bus or invalidation_bus
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        self._generation = 0
+
+    def get(self, load: Callable[[], Optional[int]]) -> Optional[int]:
+        """الرقم المحلي إن وُجد والناقل متصل، وإلا load()"""
+        if not self.bus.is_healthy():
+            return load()
+        version = self._version
+        if version is not None:
+            return version
+
+        generation = self._generation
+        version = load()
+        with self._lock:
+            if version is not None and generation == self._generation and \
+                    (self._version is None or version > self._version):
+                self._version = version
+        return version
+
+    def observe(self, key: Optional[str] = None, version: Optional[int] = None):
+        """معالج الناقل: رقم جديد أو حذف النسخة المحلية"""
+        with self._lock:
+            if version is None:
+                self._generation += 1
+                self._version = None
+            elif self._version is None or version > self._version:
+                self._version = version
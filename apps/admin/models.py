@@ -3,7 +3,8 @@
 إدارة النظام والمستخدمين والصلاحيات
 """
 from django.db import models
-from django.contrib.auth.models import AbstractUser, Group, Permission
+from django.db.models.functions import Coalesce
+from django.contrib.auth.models import AbstractUser, Group, Permission, UserManager
 from django.core.validators import RegexValidator, MinLengthValidator
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
@@ -11,6 +12,8 @@ from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 import uuid
 
+from apps.admin.permission_cache import get_effective_permissions, get_permission_snapshot
+
 
 class Governorate(models.Model):
     """
@@ -253,12 +256,74 @@ class AdminRole(models.Model):
     def __str__(self):
         return self.name
     
+    @classmethod
+    def with_users_count(cls, queryset=None):
+        """
+        الأدوار مع عدد المستخدمين النشطين وصلاحياتها في استعلامات مجمعة
+        
+        يضيف active_users_count كحقل محسوب ويجلب الصلاحيات مسبقاً
+        حتى لا يُنفذ استعلام لكل دور عند عرض القوائم.
+        """
+        queryset = cls.objects.all() if queryset is None else queryset
+        # استعلام فرعي وليس Count على الربط: عند جلب الأدوار كـ Prefetch من المستخدمين
+        # يُقيد Django نفس الربط بمستخدمي الصفحة فيصبح العدد خاطئاً
+        active_users = AdminUser.objects.filter(
+            admin_roles=models.OuterRef('pk'), is_active=True
+        ).order_by().values('admin_roles').annotate(count=models.Count('pk')).values('count')
+        return queryset.annotate(
+            active_users_count=Coalesce(models.Subquery(active_users), 0)
+        ).prefetch_related(
+            models.Prefetch('permissions', queryset=Permission.objects.select_related('content_type'))
+        )
+    
     @property
     def users_count(self):
         """عدد المستخدمين بهذا الدور"""
+        # يستخدم العدد المحسوب مسبقاً عند جلب الأدوار عبر with_users_count
+        if hasattr(self, 'active_users_count'):
+            return self.active_users_count
         return self.admin_users.filter(is_active=True).count()
 
 
+class AdminUserQuerySet(models.QuerySet):
+    """استعلامات المستخدمين الإداريين مع فحص الصلاحيات لمجموعة مستخدمين"""
+    
+    def with_admin_permission(self, permission_codename, alias='admin_permission_granted'):
+        """
+        إضافة حقل منطقي يبين امتلاك كل مستخدم لصلاحية محددة
+        
+        الأدوار النشطة التي تمنح الصلاحية تُعرف من سجل الصلاحيات، فيُفحص
+        جميع المستخدمين في نفس الاستعلام دون استعلام لكل مستخدم.
+        """
+        snapshot = get_permission_snapshot()
+        bit = snapshot.codename_bits.get(permission_codename, 0)
+        role_ids = [role_id for role_id, mask in snapshot.role_masks.items() if mask & bit]
+        permission_ids = [pk for pk, permission_bit in snapshot.permission_bits.items() if permission_bit == bit]
+        
+        granted = models.Q()
+        if role_ids:
+            granted |= models.Q(models.Exists(AdminUser.admin_roles.through.objects.filter(
+                adminuser_id=models.OuterRef('pk'), adminrole_id__in=role_ids
+            )))
+        if permission_ids:
+            granted |= models.Q(models.Exists(AdminUser.user_permissions.through.objects.filter(
+                adminuser_id=models.OuterRef('pk'), permission_id__in=permission_ids
+            )))
+        if not granted:
+            return self.annotate(**{alias: models.Value(False, output_field=models.BooleanField())})
+        return self.annotate(**{alias: models.ExpressionWrapper(granted, output_field=models.BooleanField())})
+    
+    def admin_permission_map(self, permission_codename):
+        """قاموس {معرف المستخدم: يملك الصلاحية} لكل مستخدمي الاستعلام في استعلام واحد"""
+        return dict(
+            self.with_admin_permission(permission_codename).values_list('pk', 'admin_permission_granted')
+        )
+
+
+class AdminUserManager(UserManager.from_queryset(AdminUserQuerySet)):
+    """مدير المستخدمين الإداريين (إنشاء المستخدمين + استعلامات الصلاحيات)"""
+
+
 class AdminUser(AbstractUser):
     """
     نموذج المستخدمين الإداريين لمنصة نائبك
@@ -296,7 +361,8 @@ class AdminUser(AbstractUser):
     employee_id = models.CharField('رقم الموظف', max_length=20, unique=True, null=True, blank=True)
     department = models.CharField('القسم', max_length=100, blank=True)
     position = models.CharField('المنصب', max_length=100, blank=True)
-    admin_roles = models.ManyToManyField(AdminRole, verbose_name='الأدوار الإدارية', blank=True)
+    admin_roles = models.ManyToManyField(AdminRole, verbose_name='الأدوار الإدارية', blank=True,
+                                         related_name='admin_users')
     governorate = models.ForeignKey(Governorate, on_delete=models.SET_NULL, null=True, blank=True,
                                   verbose_name='المحافظة المسؤول عنها')
     profile_picture = models.ImageField('صورة الملف الشخصي', upload_to='admin/profiles/', blank=True, null=True)
@@ -309,6 +375,8 @@ class AdminUser(AbstractUser):
     created_by = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True,
                                  verbose_name='أنشئ بواسطة')
     
+    objects = AdminUserManager()
+    
     class Meta:
         verbose_name = 'مستخدم إداري'
         verbose_name_plural = 'المستخدمون الإداريون'
@@ -384,20 +452,40 @@ class AdminUser(AbstractUser):
             bool: True إذا كان المستخدم يملك الصلاحية
         
         Permission Logic:
-        - يفحص الصلاحيات المباشرة أولاً
-        - ثم يفحص صلاحيات الأدوار النشطة
+        - يجمع الصلاحيات المباشرة وصلاحيات الأدوار النشطة
         - يعتبر الأدوار غير النشطة كأنها غير موجودة
         
         Performance:
-        - استعلام محسن مع فهارس على الصلاحيات
-        - تخزين مؤقت للصلاحيات المتكررة
+        - الصلاحيات الفعلية تُحسب كقناع بتات في استعلام واحد (permission_cache)
+        - تُخزن على كائن المستخدم خلال الطلب وفي Redis بين الطلبات
+        - الفحص بعد ذلك مجرد اختبار بت
         
         Usage:
             if user.has_admin_permission('view_complaints'):
                 # السماح بعرض الشكاوى
         """
-        return self.user_permissions.filter(codename=permission_codename).exists() or \
-               self.admin_roles.filter(permissions__codename=permission_codename, is_active=True).exists()
+        snapshot, granted = get_effective_permissions(self)
+        return snapshot.has(granted, permission_codename)
+    
+    def has_admin_permissions(self, permission_codenames):
+        """
+        فحص عدة صلاحيات دفعة واحدة (مثل بناء قوائم الإجراءات في الواجهة)
+        
+        Returns:
+            dict: {كود الصلاحية: True/False} من نفس القناع المخزن
+        """
+        snapshot, granted = get_effective_permissions(self)
+        return {codename: snapshot.has(granted, codename) for codename in permission_codenames}
+    
+    def has_all_admin_permissions(self, permission_codenames):
+        """فحص امتلاك كل الصلاحيات المحددة بعملية قناع واحدة"""
+        snapshot, granted = get_effective_permissions(self)
+        return snapshot.has_all(granted, permission_codenames)
+    
+    def has_any_admin_permission(self, permission_codenames):
+        """فحص امتلاك أي من الصلاحيات المحددة بعملية قناع واحدة"""
+        snapshot, granted = get_effective_permissions(self)
+        return snapshot.has_any(granted, permission_codenames)
 
 
 class AdminActivity(models.Model):
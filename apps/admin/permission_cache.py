@@ -0,0 +1,115 @@
+"""
+ذاكرة مؤقتة للصلاحيات الفعلية للمستخدمين الإداريين - مشروع نائبك
+
+تُحسب صلاحيات المستخدم الفعلية (المخصصة له مباشرة + صلاحيات أدواره النشطة)
+كقناع بتات (permission_registry) من استعلام واحد، وتُحفظ على كائن المستخدم
+طوال الطلب وفي Redis بين الطلبات.
+مفاتيح Redis تحمل رقم إصدار عام يُرفع عند تغيير صلاحيات الأدوار أو حالتها،
+بينما تُحذف مدخلات المستخدم وحده عند تغيير أدواره أو صلاحياته المباشرة
+(انظر signals.py). ما دام ناقل الإبطال متصلاً يُحفظ رقم الإصدار نفسه محلياً
+ويُحدّث من رسائل الناقل بدلاً من قراءته من Redis في كل طلب.
+"""
+import time
+from typing import Iterable, Optional, Tuple
+import logging
+
+from django.core.cache import cache
+from django.db.models import BooleanField, Value
+
+from apps.admin.invalidation_bus import LocalVersion, invalidation_bus
+from apps.admin.permission_registry import PermissionSnapshot, permission_registry
+
+logger = logging.getLogger(__name__)
+
+VERSION_CACHE_KEY = 'admin:permissions:version'
+USER_CACHE_KEY = 'admin:permissions:{version}:{user_id}'
+USER_CACHE_TIMEOUT = 60 * 60
+
+# اسم الخاصية التي تحفظ الصلاحيات على كائن المستخدم خلال الطلب
+INSTANCE_CACHE_ATTR = '_admin_permissions_cache'
+
+local_permissions_version = LocalVersion()
+
+
+def get_permissions_version() -> int:
+    """رقم الإصدار الحالي لصلاحيات الأدوار"""
+    return local_permissions_version.get(_load_permissions_version)
+
+
+def _load_permissions_version() -> int:
+    """قراءة رقم الإصدار من Redis (يُنشأ عند غيابه)"""
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        # قيمة زمنية بدلاً من 1 حتى لا تعود مفاتيح قديمة للحياة بعد حذف المفتاح من Redis
+        cache.add(VERSION_CACHE_KEY, time.time_ns() // 1000, timeout=None)
+        version = cache.get(VERSION_CACHE_KEY)
+    return version
+
+
+def bump_permissions_version(model_label: str = 'admin.adminrole', key: Optional[str] = None):
+    """إبطال صلاحيات جميع المستخدمين المخزنة (تغيير في الأدوار أو الصلاحيات)"""
+    try:
+        version = cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        version = time.time_ns() // 1000
+        cache.set(VERSION_CACHE_KEY, version, timeout=None)
+    local_permissions_version.observe(key, version)
+    invalidation_bus.publish(model_label, key, version)
+    logger.debug("Admin permissions version bumped")
+
+
+def invalidate_user_permissions(user_ids: Iterable[int]):
+    """إبطال الصلاحيات المخزنة لمستخدمين محددين"""
+    version = get_permissions_version()
+    cache.delete_many([USER_CACHE_KEY.format(version=version, user_id=user_id) for user_id in user_ids])
+
+
+def get_permission_snapshot() -> PermissionSnapshot:
+    """لقطة سجل الصلاحيات للإصدار الحالي"""
+    return permission_registry.get(get_permissions_version())
+
+
+def load_permission_mask(user, snapshot: PermissionSnapshot) -> int:
+    """قناع صلاحيات المستخدم من معرفات أدواره وصلاحياته المباشرة في استعلام واحد"""
+    from apps.admin.models import AdminUser
+
+    roles = AdminUser.admin_roles.through.objects.filter(adminuser_id=user.pk).values_list(
+        'adminrole_id', Value(True, output_field=BooleanField())
+    )
+    direct = AdminUser.user_permissions.through.objects.filter(adminuser_id=user.pk).values_list(
+        'permission_id', Value(False, output_field=BooleanField())
+    )
+    role_ids, permission_ids = [], []
+    for pk, is_role in roles.union(direct, all=True):
+        (role_ids if is_role else permission_ids).append(pk)
+    return snapshot.user_mask(role_ids, permission_ids)
+
+
+def get_effective_permissions(user) -> Tuple[PermissionSnapshot, int]:
+    """
+    لقطة سجل الصلاحيات وقناع صلاحيات المستخدم الفعلية
+
+    تُقرأ من كائن المستخدم إن سبق حسابها في نفس الطلب، ثم من Redis،
+    وإلا تُحسب من قاعدة البيانات وتُخزن في الاثنين.
+    """
+    cached = getattr(user, INSTANCE_CACHE_ATTR, None)
+    if cached is not None:
+        return cached
+
+    version = get_permissions_version()
+    snapshot = permission_registry.get(version)
+    key = USER_CACHE_KEY.format(version=version, user_id=user.pk)
+    mask = cache.get(key)
+    if mask is None:
+        mask = load_permission_mask(user, snapshot)
+        cache.set(key, mask, USER_CACHE_TIMEOUT)
+
+    cached = (snapshot, mask)
+    setattr(user, INSTANCE_CACHE_ATTR, cached)
+    return cached
+
+
+def clear_instance_permissions(user):
+    """حذف الصلاحيات المحفوظة على كائن المستخدم في الطلب الحالي"""
+    if hasattr(user, INSTANCE_CACHE_ATTR):
+        delattr(user, INSTANCE_CACHE_ATTR)
@@ -0,0 +1,138 @@
+"""
+سجل الصلاحيات كخرائط بتات - مشروع نائبك
+
+يُعطى كل كود صلاحية رقم بت (بترتيب معرفات Permission، وبت واحد لكل كود لأن
+has_admin_permission يفحص الكود وقد يتكرر نفس الكود في أكثر من تطبيق)،
+وتُمثل صلاحيات كل دور نشط كعدد صحيح واحد. أرقام البتات ثابتة ما دامت
+الصلاحيات لم تتغير؛ إنشاء أو حذف Permission يرفع رقم الإصدار فتُبطل كل
+الأقنعة المخزنة المبنية على الترقيم السابق. صلاحيات المستخدم الفعلية هي
+OR لخرائط أدواره مع بتات صلاحياته المباشرة، فيصبح فحص صلاحية اختبار بت
+وفحص عدة صلاحيات (has_all / has_any) عملية قناع واحدة.
+
+اللقطة (الخرائط) تُبنى باستعلامين وتُشارك بين العمليات عبر الذاكرة المؤقتة
+تحت رقم إصدار الصلاحيات (permission_cache)، وتُحفظ في كل عملية حتى يتغير الإصدار.
+"""
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+import logging
+
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_CACHE_KEY = 'admin:permissions:registry:{version}'
+SNAPSHOT_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+@dataclass(frozen=True)
+class PermissionSnapshot:
+    """خرائط البتات لإصدار واحد من الصلاحيات والأدوار"""
+    version: Optional[int]
+    codename_bits: Dict[str, int]
+    permission_bits: Dict[int, int]
+    role_masks: Dict[int, int]
+
+    def mask(self, codenames: Iterable[str]) -> Optional[int]:
+        """قناع مجموعة أكواد، أو None إذا كان أحدها غير معروف"""
+        mask = 0
+        for codename in codenames:
+            bit = self.codename_bits.get(codename)
+            if bit is None:
+                return None
+            mask |= bit
+        return mask
+
+    def has(self, granted: int, codename: str) -> bool:
+        """اختبار بت صلاحية واحدة"""
+        return bool(granted & self.codename_bits.get(codename, 0))
+
+    def has_all(self, granted: int, codenames: Iterable[str]) -> bool:
+        """هل يملك كل الصلاحيات المطلوبة (كود غير معروف يعني لا)"""
+        mask = self.mask(codenames)
+        return mask is not None and granted & mask == mask
+
+    def has_any(self, granted: int, codenames: Iterable[str]) -> bool:
+        """هل يملك أياً من الصلاحيات المطلوبة"""
+        mask = 0
+        for codename in codenames:
+            mask |= self.codename_bits.get(codename, 0)
+        return bool(granted & mask)
+
+    def codenames(self, granted: int):
+        """أكواد الصلاحيات الممنوحة في قناع (للعرض والتشخيص)"""
+        return frozenset(codename for codename, bit in self.codename_bits.items() if granted & bit)
+
+    def user_mask(self, role_ids: Iterable[int], permission_ids: Iterable[int]) -> int:
+        """OR لخرائط الأدوار النشطة مع بتات الصلاحيات المباشرة"""
+        mask = 0
+        for role_id in role_ids:
+            mask |= self.role_masks.get(role_id, 0)
+        for permission_id in permission_ids:
+            mask |= self.permission_bits.get(permission_id, 0)
+        return mask
+
+
+def build_snapshot(version: Optional[int]) -> PermissionSnapshot:
+    """قراءة الصلاحيات وصلاحيات الأدوار النشطة من قاعدة البيانات"""
+    from apps.admin.models import AdminRole
+
+    codename_bits: Dict[str, int] = {}
+    permission_bits: Dict[int, int] = {}
+    for pk, codename in Permission.objects.order_by('pk').values_list('pk', 'codename'):
+        bit = codename_bits.setdefault(codename, 1 << len(codename_bits))
+        permission_bits[pk] = bit
+
+    role_masks: Dict[int, int] = {}
+    grants = AdminRole.permissions.through.objects.filter(
+        adminrole__is_active=True
+    ).values_list('adminrole_id', 'permission_id')
+    for role_id, permission_id in grants:
+        role_masks[role_id] = role_masks.get(role_id, 0) | permission_bits.get(permission_id, 0)
+
+    return PermissionSnapshot(version, codename_bits, permission_bits, role_masks)
+
+
+class PermissionRegistry:
+    """
+    لقطة خرائط البتات الحالية في العملية.
+
+    تُستبدل عند تغير رقم الإصدار، من الذاكرة المؤقتة المشتركة إن وُجدت
+    وإلا من قاعدة البيانات (ثم تُنشر لبقية العمليات).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot: Optional[PermissionSnapshot] = None
+
+    def get(self, version: Optional[int]) -> PermissionSnapshot:
+        """لقطة الإصدار المطلوب"""
+        snapshot = self._snapshot
+        if snapshot is not None and version is not None and snapshot.version == version:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or version is None or snapshot.version != version:
+                snapshot = self._load(version)
+                self._snapshot = snapshot
+        return snapshot
+
+    def invalidate(self):
+        """إجبار إعادة التحميل عند الطلب التالي"""
+        self._snapshot = None
+
+    def _load(self, version: Optional[int]) -> PermissionSnapshot:
+        key = SNAPSHOT_CACHE_KEY.format(version=version)
+        snapshot = cache.get(key) if version is not None else None
+        if snapshot is None:
+            snapshot = build_snapshot(version)
+            if version is not None:
+                cache.set(key, snapshot, SNAPSHOT_CACHE_TIMEOUT)
+            logger.debug(f"Built admin permission registry version {version} "
+                         f"({len(snapshot.codename_bits)} codenames, {len(snapshot.role_masks)} roles)")
+        return snapshot
+
+
+permission_registry = PermissionRegistry()
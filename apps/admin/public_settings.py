@@ -0,0 +1,88 @@
+"""
+استجابة الإعدادات العامة الجاهزة - مشروع نائبك
+
+نقطة /system-settings/public/ متاحة للجميع وتُطلب مع كل تحميل لصفحات الواجهة.
+يُحفظ جسم JSON المُصيّر (نفس ناتج SystemSettingsSerializer) مع ETag قوي لكل
+إصدار من إصدارات الإعدادات (settings_registry)، في العملية وفي الذاكرة المؤقتة
+المشتركة، فلا تكلف الطلبات في الحالة المستقرة أي استعلام ولا إعادة تحويل.
+"""
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import Optional
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.renderers import JSONRenderer
+
+from apps.admin.settings_registry import system_settings_registry
+
+logger = logging.getLogger(__name__)
+
+PAYLOAD_CACHE_KEY = 'admin:system_settings:public:{version}'
+PAYLOAD_CACHE_TIMEOUT = 24 * 60 * 60
+# مدة التخزين المسموحة للوكلاء (nginx) والمتصفحات؛ قصيرة لأن التغييرات يجب أن تظهر سريعاً
+DEFAULT_MAX_AGE = 10
+
+
+def public_settings_max_age() -> int:
+    """قيمة max-age لاستجابة الإعدادات العامة"""
+    return getattr(settings, 'ADMIN_SERVICE_SETTINGS', {}).get('PUBLIC_SETTINGS_MAX_AGE', DEFAULT_MAX_AGE)
+
+
+@dataclass(frozen=True)
+class PublicSettingsPayload:
+    """جسم الاستجابة المُصيّر ووسم ETag الخاص به"""
+    version: Optional[int]
+    body: bytes
+    etag: str
+
+
+def render_public_settings(version: Optional[int]) -> PublicSettingsPayload:
+    """تحويل الإعدادات العامة إلى JSON كما كانت تُعاد من الـ ViewSet"""
+    from apps.admin.models import SystemSettings
+    from apps.admin.serializers import SystemSettingsSerializer
+
+    public_settings = SystemSettings.objects.filter(is_public=True)
+    body = JSONRenderer().render(SystemSettingsSerializer(public_settings, many=True).data)
+    # الـ ETag من محتوى الإصدار: يبقى نفسه إذا تغير إعداد غير عام فقط
+    etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+    return PublicSettingsPayload(version, body, etag)
+
+
+class PublicSettingsCache:
+    """آخر استجابة مُصيّرة في العملية، تُستبدل عند تغير إصدار الإعدادات"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._payload: Optional[PublicSettingsPayload] = None
+
+    def get(self) -> PublicSettingsPayload:
+        version = system_settings_registry.version
+        payload = self._payload
+        if payload is not None and version is not None and payload.version == version:
+            return payload
+
+        with self._lock:
+            payload = self._payload
+            if payload is None or version is None or payload.version != version:
+                payload = self._load(version)
+                self._payload = payload
+        return payload
+
+    def _load(self, version: Optional[int]) -> PublicSettingsPayload:
+        if version is None:
+            # بدون رقم إصدار (ذاكرة مؤقتة وهمية) لا يمكن معرفة صلاحية نسخة مخزنة
+            return render_public_settings(version)
+
+        key = PAYLOAD_CACHE_KEY.format(version=version)
+        payload = cache.get(key)
+        if payload is None:
+            payload = render_public_settings(version)
+            cache.set(key, payload, PAYLOAD_CACHE_TIMEOUT)
+            logger.debug(f"Rendered public system settings for version {version} ({len(payload.body)} bytes)")
+        return payload
+
+
+public_settings_cache = PublicSettingsCache()
@@ -0,0 +1,155 @@
+"""
+سجل إعدادات النظام - مشروع نائبك
+
+يحمّل كل صفوف SystemSettings مرة واحدة في قاموس من القيم المحوّلة لأنواعها
+(get_typed_value، بما في ذلك json.loads)، فتصبح قراءة الإعداد بحثاً في قاموس.
+رقم الإصدار عداد في Redis يُرفع عند حفظ أو حذف أي إعداد (انظر signals.py)،
+ويُفحص في كل عملية مرة كل VERSION_CHECK_INTERVAL ثوانٍ على الأكثر، أو كل
+SUBSCRIBED_CHECK_INTERVAL ما دام ناقل الإبطال متصلاً (رسائله تُبطل السجل فوراً)؛
+لا يُعاد التحميل من قاعدة البيانات إلا عند تغير الرقم.
+
+القيم مشتركة بين كل مستخدمي العملية: يجب عدم تعديل القوائم والقواميس
+المُعادة من get_setting.
+"""
+import threading
+import time
+from typing import Any, Dict, FrozenSet, Optional
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.admin.invalidation_bus import invalidation_bus
+
+logger = logging.getLogger(__name__)
+
+VERSION_CACHE_KEY = 'admin:system_settings:version'
+VERSION_CHECK_INTERVAL = 5
+SUBSCRIBED_CHECK_INTERVAL = 300
+MODEL_LABEL = 'admin.systemsettings'
+
+_MISSING = object()
+
+
+def get_settings_version() -> Optional[int]:
+    """رقم إصدار الإعدادات الحالي في Redis (يُنشأ عند غيابه)"""
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        # قيمة زمنية حتى لا يتكرر رقم سابق بعد حذف المفتاح من Redis
+        cache.add(VERSION_CACHE_KEY, time.time_ns() // 1000, timeout=None)
+        version = cache.get(VERSION_CACHE_KEY)
+    return version
+
+
+def bump_settings_version(key: Optional[str] = None):
+    """إعلام كل العمليات بتغير الإعدادات"""
+    try:
+        version = cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        version = time.time_ns() // 1000
+        cache.set(VERSION_CACHE_KEY, version, timeout=None)
+    system_settings_registry.invalidate()
+    invalidation_bus.publish(MODEL_LABEL, key, version)
+
+
+class SystemSettingsRegistry:
+    """
+    قيم الإعدادات المحوّلة لأنواعها في العملية الحالية.
+
+    يُقرأ رقم الإصدار من Redis مرة كل check_interval ثوانٍ على الأكثر،
+    وتُعاد قراءة الجدول فقط عند اختلافه عن رقم الإصدار المحمّل.
+    """
+
+    def __init__(self, check_interval: Optional[float] = None, subscribed_check_interval: Optional[float] = None):
+        config = getattr(settings, 'ADMIN_SERVICE_SETTINGS', {})
+        self.check_interval = (
+            check_interval if check_interval is not None
+            else config.get('SYSTEM_SETTINGS_VERSION_CHECK_INTERVAL', VERSION_CHECK_INTERVAL)
+        )
+        self.subscribed_check_interval = (
+            subscribed_check_interval if subscribed_check_interval is not None
+            else config.get('SYSTEM_SETTINGS_SUBSCRIBED_CHECK_INTERVAL', SUBSCRIBED_CHECK_INTERVAL)
+        )
+        self._lock = threading.Lock()
+        self._version = None
+        self._loaded = False
+        self._values: Dict[str, Any] = {}
+        self._public_keys: FrozenSet[str] = frozenset()
+        self._checked_at = 0.0
+
+    @property
+    def version(self) -> Optional[int]:
+        """رقم إصدار القيم المحمّلة"""
+        self._refresh_if_due()
+        return self._version
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """قيمة إعداد بنوعها الصحيح، أو default إذا لم يوجد"""
+        self._refresh_if_due()
+        value = self._values.get(key, _MISSING)
+        return default if value is _MISSING or value is None else value
+
+    def values(self) -> Dict[str, Any]:
+        """كل الإعدادات {المفتاح: القيمة}"""
+        self._refresh_if_due()
+        return self._values
+
+    def public_values(self) -> Dict[str, Any]:
+        """الإعدادات العامة فقط (is_public)"""
+        self._refresh_if_due()
+        return {key: value for key, value in self._values.items() if key in self._public_keys}
+
+    def invalidate(self, key: Optional[str] = None, version: Optional[int] = None):
+        """فحص رقم الإصدار عند القراءة التالية (يصلح معالجاً لناقل الإبطال)"""
+        self._checked_at = 0.0
+
+    def _refresh_if_due(self):
+        now = time.monotonic()
+        interval = self.subscribed_check_interval if invalidation_bus.is_healthy() else self.check_interval
+        if self._loaded and now - self._checked_at < interval:
+            return
+
+        with self._lock:
+            if self._loaded and now - self._checked_at < interval:
+                return
+            try:
+                self._refresh()
+            except Exception as e:
+                # الاستمرار بآخر قيم محمّلة بدلاً من إفشال الطلب
+                logger.error(f"Failed to refresh system settings: {e}")
+            self._checked_at = now
+
+    def _refresh(self):
+        version = get_settings_version()
+        if self._loaded and version is not None and version == self._version:
+            return
+
+        from apps.admin.models import SystemSettings
+
+        values, public_keys = {}, set()
+        for setting in SystemSettings.objects.order_by().only(
+            'key', 'setting_type', 'value', 'default_value', 'is_public'
+        ):
+            values[setting.key] = setting.get_typed_value()
+            if setting.is_public:
+                public_keys.add(setting.key)
+
+        self._values = values
+        self._public_keys = frozenset(public_keys)
+        self._version = version
+        self._loaded = True
+        logger.debug(f"Loaded {len(values)} system settings (version {version})")
+
+
+system_settings_registry = SystemSettingsRegistry()
+
+
+def get_setting(key: str, default: Any = None) -> Any:
+    """
+    قراءة إعداد نظام بنوعه الصحيح من السجل
+
+    Usage:
+        if get_setting('maintenance_mode', False):
+            ...
+    """
+    return system_settings_registry.get(key, default)
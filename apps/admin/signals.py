@@ -0,0 +1,127 @@
+"""
+إشارات خدمة الإدارة - مشروع نائبك
+إبقاء الصلاحيات والإعدادات المخزنة مؤقتاً متزامنة مع قاعدة البيانات،
+ونشر التغييرات على ناقل الإبطال لبقية العمليات
+"""
+from django.contrib.auth.models import Permission
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from apps.admin.invalidation_bus import invalidation_bus
+from apps.admin.models import AdminRole, AdminSettings, AdminUser, SystemSettings
+from apps.admin.permission_cache import (
+    bump_permissions_version, clear_instance_permissions, invalidate_user_permissions,
+    local_permissions_version
+)
+from apps.admin.settings_registry import bump_settings_version, system_settings_registry
+
+M2M_CHANGE_ACTIONS = {'post_add', 'post_remove', 'post_clear'}
+
+
+def _invalidate_user_side(instance, reverse, pk_set):
+    """إبطال صلاحيات المستخدمين المتأثرين بتغيير علاقة من جهة المستخدم"""
+    if not reverse:
+        clear_instance_permissions(instance)
+        user_ids = [instance.pk]
+    elif pk_set:
+        user_ids = list(pk_set)
+    else:
+        # post_clear من جهة الدور أو الصلاحية لا يذكر المستخدمين المتأثرين
+        transaction.on_commit(bump_permissions_version)
+        return
+    transaction.on_commit(lambda: invalidate_user_permissions(user_ids))
+
+
+@receiver(m2m_changed, sender=AdminUser.admin_roles.through)
+def admin_roles_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """تغيير أدوار مستخدم"""
+    if action in M2M_CHANGE_ACTIONS:
+        _invalidate_user_side(instance, reverse, pk_set)
+
+
+@receiver(m2m_changed, sender=AdminUser.user_permissions.through)
+def user_permissions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """تغيير الصلاحيات المخصصة لمستخدم مباشرة"""
+    if action in M2M_CHANGE_ACTIONS:
+        _invalidate_user_side(instance, reverse, pk_set)
+
+
+@receiver(m2m_changed, sender=AdminRole.permissions.through)
+def role_permissions_changed(sender, action, **kwargs):
+    """تغيير صلاحيات دور يؤثر على كل مستخدميه"""
+    if action in M2M_CHANGE_ACTIONS:
+        transaction.on_commit(bump_permissions_version)
+
+
+@receiver(post_init, sender=AdminRole)
+def remember_role_state(sender, instance, **kwargs):
+    """حفظ حالة التفعيل المحملة لمقارنتها عند الحفظ"""
+    # __dict__ وليس الخاصية حتى لا يُحمّل حقل مؤجل باستعلام إضافي
+    instance._loaded_is_active = instance.__dict__.get('is_active')
+
+
+@receiver(post_save, sender=AdminRole)
+def role_saved(sender, instance, created, **kwargs):
+    """تفعيل أو تعطيل دور"""
+    if not created and instance.is_active != instance._loaded_is_active:
+        transaction.on_commit(lambda: bump_permissions_version(sender._meta.label_lower, instance.pk))
+    instance._loaded_is_active = instance.is_active
+
+
+@receiver(post_delete, sender=AdminRole)
+@receiver(post_delete, sender=Permission)
+def role_or_permission_deleted(sender, instance, **kwargs):
+    """الحذف المتتالي لجداول الربط لا يرسل m2m_changed"""
+    pk = instance.pk
+    transaction.on_commit(lambda: bump_permissions_version(sender._meta.label_lower, pk))
+
+
+@receiver(post_save, sender=Permission)
+def permission_created(sender, instance, created, **kwargs):
+    """صلاحية جديدة تغير ترقيم البتات في سجل الصلاحيات"""
+    if created:
+        transaction.on_commit(lambda: bump_permissions_version(sender._meta.label_lower, instance.pk))
+
+
+@receiver([post_save, post_delete], sender=SystemSettings)
+def system_settings_changed(sender, instance, **kwargs):
+    """رفع إصدار الإعدادات بعد حفظ التغيير"""
+    key = instance.key
+    transaction.on_commit(lambda: bump_settings_version(key))
+
+
+@receiver([post_save, post_delete], sender=AdminSettings)
+def admin_settings_changed(sender, instance, **kwargs):
+    """إعلام العمليات التي تخزن إعدادات الخدمة محلياً"""
+    pk = instance.pk
+    transaction.on_commit(lambda: invalidation_bus.publish(sender._meta.label_lower, pk))
+
+
+# رسائل العمليات الأخرى تُبطل السجلات المحلية في هذه العملية
+invalidation_bus.subscribe(AdminRole._meta.label_lower, local_permissions_version.observe)
+invalidation_bus.subscribe(Permission._meta.label_lower, local_permissions_version.observe)
+invalidation_bus.subscribe(SystemSettings._meta.label_lower, system_settings_registry.invalidate)
+
+
+def connect_content_filters():
+    """
+    نشر تغييرات AIContentFilter على الناقل عند تثبيت تطبيق حوكمة الذكاء الاصطناعي
+
+    يُستدعى من AdminConfig.ready بعد ready الخاص بـ app.ai_governance (ترتيب
+    INSTALLED_APPS)، فتُنفذ دالة النشر بعد نشر لقطة المرشحات الجديدة في نفس الـ commit.
+    """
+    from app.ai_governance.filter_registry import content_filter_registry
+    from app.ai_governance.models import AIContentFilter
+
+    label = AIContentFilter._meta.label_lower
+
+    def content_filter_changed(sender, instance, **kwargs):
+        pk = instance.pk
+        transaction.on_commit(lambda: invalidation_bus.publish(label, pk))
+
+    post_save.connect(content_filter_changed, sender=AIContentFilter, weak=False,
+                      dispatch_uid='admin_invalidation_content_filter_saved')
+    post_delete.connect(content_filter_changed, sender=AIContentFilter, weak=False,
+                        dispatch_uid='admin_invalidation_content_filter_deleted')
+    invalidation_bus.subscribe(label, lambda key, version: content_filter_registry.invalidate())
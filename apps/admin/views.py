@@ -6,8 +6,10 @@ from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.contrib.auth.models import Permission
-from django.db.models import Count, Q
+from django.db.models import Count, Prefetch, Q
+from django.http import HttpResponse
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
 from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
 
@@ -15,6 +17,7 @@ from apps.admin.models import (
     Governorate, Party, ComplaintType, AdminRole, AdminUser,
     AdminActivity, SystemSettings, AdminDashboard, AdminSettings
 )
+from apps.admin.public_settings import public_settings_cache, public_settings_max_age
 from apps.admin.serializers import (
     GovernorateSerializer, PartySerializer, ComplaintTypeSerializer,
     AdminRoleSerializer, AdminUserSerializer, AdminUserCreateSerializer,
@@ -258,7 +261,7 @@ class AdminRoleViewSet(viewsets.ModelViewSet):
     يوفر إدارة شاملة للأدوار الإدارية والصلاحيات
     مع حماية أدوار النظام من الحذف.
     """
-    queryset = AdminRole.objects.all()
+    queryset = AdminRole.with_users_count()
     serializer_class = AdminRoleSerializer
     permission_classes = [permissions.IsAuthenticated]
     filterset_fields = ['role_type', 'is_active', 'is_system_role']
@@ -310,7 +313,10 @@ class AdminUserViewSet(viewsets.ModelViewSet):
     يوفر إدارة شاملة للمستخدمين الإداريين مع
     عمليات قفل/إلغاء قفل الحسابات وإدارة الأدوار.
     """
-    queryset = AdminUser.objects.all()
+    # المحافظة والأدوار وصلاحياتها وعدد مستخدمي كل دور تُجلب بعدد ثابت من الاستعلامات
+    queryset = AdminUser.objects.select_related('governorate').prefetch_related(
+        Prefetch('admin_roles', queryset=AdminRole.with_users_count())
+    )
     serializer_class = AdminUserSerializer
     permission_classes = [permissions.IsAuthenticated]
     filterset_fields = ['is_active', 'is_staff', 'is_superuser', 'department', 'governorate']
@@ -451,10 +457,19 @@ class SystemSettingsViewSet(viewsets.ModelViewSet):
     )
     @action(detail=False, methods=['get'], permission_classes=[permissions.AllowAny])
     def public(self, request):
-        """الحصول على الإعدادات العامة فقط"""
-        settings = self.queryset.filter(is_public=True)
-        serializer = self.get_serializer(settings, many=True)
-        return Response(serializer.data)
+        """
+        الحصول على الإعدادات العامة فقط
+        
+        يُعاد JSON المُصيّر مسبقاً لإصدار الإعدادات الحالي مع ETag، و 304
+        إذا أرسل العميل نفس الـ ETag؛ Cache-Control يسمح لـ nginx بتخزين قصير.
+        """
+        payload = public_settings_cache.get()
+        response = get_conditional_response(request, etag=payload.etag)
+        if response is None:
+            response = HttpResponse(payload.body, content_type='application/json')
+        response['ETag'] = payload.etag
+        patch_cache_control(response, public=True, max_age=public_settings_max_age())
+        return response
 
 
 @extend_schema_view(
@@ -0,0 +1,118 @@
+"""
+Cached OpenAPI schema view.
+
+drf-spectacular's SpectacularAPIView regenerates the schema (walking every
+URL pattern, view and serializer) on each request to /api/schema/. The
+schema only changes when the code does, so it is generated lazily on the
+first request and kept per code version:
+
+- in process memory, always (the code cannot change under a running process)
+- in the Django cache (Redis) when OPENAPI_SCHEMA_CACHE['CODE_VERSION'] is
+  set, so the first request after a deploy generates it for all instances
+
+CODE_VERSION comes from APP_VERSION or Cloud Run's K_REVISION. Schemas that
+depend on the requesting user (SERVE_PUBLIC = False) are never cached.
+
+The endpoint is public, so the cache key only holds values from a bounded
+set: `?lang=` is mapped onto settings.LANGUAGES (falling back to
+LANGUAGE_CODE) and a `?version=` outside REST_FRAMEWORK['ALLOWED_VERSIONS']
+is served uncached. The in-process map is an LRU of MAX_ENTRIES schemas.
+"""
+
+import threading
+from typing import Any, Dict, Tuple
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import translation
+from drf_spectacular.views import SpectacularAPIView
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from app.ai_governance.utils.lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 16
+
+_schemas = LRUCache(getattr(settings, 'OPENAPI_SCHEMA_CACHE', {}).get('MAX_ENTRIES', DEFAULT_MAX_ENTRIES))
+_schemas_lock = threading.Lock()
+
+
+def _config() -> Dict[str, Any]:
+    return getattr(settings, 'OPENAPI_SCHEMA_CACHE', {})
+
+
+def schema_language(request) -> str:
+    """The requested (?lang=) or active language as one of settings.LANGUAGES"""
+    language = (request.GET.get('lang') if settings.USE_I18N else None) or translation.get_language()
+    try:
+        return translation.get_supported_language_variant(language or settings.LANGUAGE_CODE)
+    except LookupError:
+        return settings.LANGUAGE_CODE
+
+
+class CachedSpectacularAPIView(SpectacularAPIView):
+    """SpectacularAPIView that generates the schema once per code version"""
+
+    KEY_PREFIX = 'openapi_schema'
+
+    def _get_schema_response(self, request):
+        if not self.serve_public:
+            return super()._get_schema_response(request)
+
+        version = self.api_version or request.version
+        if version is None:
+            version = self._get_version_parameter(request)
+            if version is not None and version not in (api_settings.ALLOWED_VERSIONS or ()):
+                # An arbitrary client value: not worth a cache entry
+                return super()._get_schema_response(request)
+
+        language = schema_language(request)
+        code_version = _config().get('CODE_VERSION', '')
+        key = (code_version, str(version), language, request.path)
+
+        schema = _schemas.get(key)
+        if schema is None:
+            with _schemas_lock:
+                schema = _schemas.get(key)
+                if schema is None:
+                    with translation.override(language):
+                        schema = self._load_or_generate(key, request, version)
+                    _schemas.set(key, schema)
+
+        return Response(
+            data=schema,
+            headers={"Content-Disposition": f'inline; filename="{self._get_filename(request, version)}"'}
+        )
+
+    def _load_or_generate(self, key: Tuple[str, ...], request, version):
+        code_version = key[0]
+        cache_key = f"{self.KEY_PREFIX}:{':'.join(key)}"
+
+        if code_version:
+            try:
+                schema = cache.get(cache_key)
+            except Exception as e:
+                logger.warning(f"OpenAPI schema cache read failed: {e}")
+                schema = None
+            if schema is not None:
+                return schema
+
+        generator = self.generator_class(urlconf=self.urlconf, api_version=version, patterns=self.patterns)
+        schema = generator.get_schema(request=request, public=self.serve_public)
+        logger.info(f"Generated OpenAPI schema for code version {code_version or 'unversioned'}")
+
+        if code_version:
+            try:
+                cache.set(cache_key, schema, _config().get('TIMEOUT'))
+            except Exception as e:
+                logger.warning(f"OpenAPI schema cache write failed: {e}")
+        return schema
+
+
+def clear_schema_cache():
+    """Drop the in-process schemas (tests, settings overrides)"""
+    with _schemas_lock:
+        _schemas.clear()
@@ -201,6 +201,29 @@ SPECTACULAR_SETTINGS = {
     'SCHEMA_PATH_PREFIX': '/api/',
 }
 
+# The generated schema is cached per code version (see config/schema.py)
+OPENAPI_SCHEMA_CACHE = {
+    'CODE_VERSION': env('APP_VERSION', default=env('K_REVISION', default='')),
+    'TIMEOUT': None,
+    # In-process schemas kept (LRU) per code version, API version and language
+    'MAX_ENTRIES': 16,
+}
+
+# In-process caches of the admin app (see apps/admin/settings_registry.py,
+# apps/admin/public_settings.py and apps/admin/invalidation_bus.py)
+ADMIN_SERVICE_SETTINGS = {
+    # Seconds between checks of the SystemSettings version
+    'SYSTEM_SETTINGS_VERSION_CHECK_INTERVAL': env.float('SYSTEM_SETTINGS_VERSION_CHECK_INTERVAL', default=5),
+    'SYSTEM_SETTINGS_SUBSCRIBED_CHECK_INTERVAL': env.float('SYSTEM_SETTINGS_SUBSCRIBED_CHECK_INTERVAL', default=300),
+    # Cache-Control max-age of /system-settings/public/ (nginx micro-cache)
+    'PUBLIC_SETTINGS_MAX_AGE': env.int('PUBLIC_SETTINGS_MAX_AGE', default=10),
+    # Redis pub/sub channel for cross-worker cache invalidation; disabled when no URL is configured
+    'INVALIDATION_BUS': {
+        'URL': env('INVALIDATION_BUS_URL', default=env('REDIS_URL', default='')),
+        'CHANNEL': env('INVALIDATION_BUS_CHANNEL', default='naebak_admin:invalidation'),
+    },
+}
+
 # Logging
 LOGGING = {
     'version': 1,
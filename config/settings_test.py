@@ -0,0 +1,80 @@
+"""
+إعدادات الاختبارات لخدمة الإدارة - مشروع نائبك
+إعدادات الخدمة (settings_updated) مع SQLite في الذاكرة وذاكرة مؤقتة محلية،
+وتطبيق حوكمة الذكاء الاصطناعي، حتى تعمل الاختبارات بدون PostgreSQL أو Redis
+"""
+from config.settings_updated import *  # noqa: F401,F403
+
+DEBUG = False
+
+INSTALLED_APPS = [
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'rest_framework',
+    'rest_framework.authtoken',
+    'app.ai_governance',
+    'apps.admin',
+]
+
+MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+]
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    }
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Fast hashing for users created in tests
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.SessionAuthentication',
+    ],
+    'DEFAULT_FILTER_BACKENDS': [],
+}
+
+SECURE_SSL_REDIRECT = False
+EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'root': {
+        'handlers': ['console'],
+        'level': 'WARNING',
+    },
+}
+
+# Messages are dispatched directly in the tests; no Redis subscription
+ADMIN_SERVICE_SETTINGS = {
+    **ADMIN_SERVICE_SETTINGS,
+    'INVALIDATION_BUS': {'URL': '', 'CHANNEL': 'naebak_admin:invalidation:test'},
+}
+
+AI_GOVERNANCE = {
+    'ENABLED': True,
+    # In-memory SQLite is per connection: rebuild the filter snapshot on the test thread
+    'FILTER_BACKGROUND_REBUILD': False,
+}
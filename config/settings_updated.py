@@ -315,6 +315,14 @@ SPECTACULAR_SETTINGS = {
     'SCHEMA_PATH_PREFIX': '/api/v1/',
 }
 
+# The generated schema is cached per code version (see config/schema.py)
+OPENAPI_SCHEMA_CACHE = {
+    'CODE_VERSION': os.environ.get('APP_VERSION', os.environ.get('K_REVISION', '')),
+    'TIMEOUT': None,
+    # In-process schemas kept (LRU) per code version, API version and language
+    'MAX_ENTRIES': 16,
+}
+
 # Custom settings for Admin Service
 ADMIN_SERVICE_SETTINGS = {
     'MAX_LOGIN_ATTEMPTS': int(os.environ.get('MAX_LOGIN_ATTEMPTS', 5)),
@@ -326,6 +334,17 @@ ADMIN_SERVICE_SETTINGS = {
     'AUTO_BACKUP_ENABLED': os.environ.get('AUTO_BACKUP_ENABLED', 'True').lower() == 'true',
     'BACKUP_FREQUENCY_HOURS': int(os.environ.get('BACKUP_FREQUENCY_HOURS', 24)),
     'MAX_RECORDS_PER_PAGE': int(os.environ.get('MAX_RECORDS_PER_PAGE', 50)),
+    # Seconds between checks of the SystemSettings version (see apps/admin/settings_registry.py)
+    'SYSTEM_SETTINGS_VERSION_CHECK_INTERVAL': float(os.environ.get('SYSTEM_SETTINGS_VERSION_CHECK_INTERVAL', 5)),
+    'SYSTEM_SETTINGS_SUBSCRIBED_CHECK_INTERVAL': float(os.environ.get('SYSTEM_SETTINGS_SUBSCRIBED_CHECK_INTERVAL', 300)),
+    # Cache-Control max-age of /system-settings/public/ (nginx micro-cache, see apps/admin/public_settings.py)
+    'PUBLIC_SETTINGS_MAX_AGE': int(os.environ.get('PUBLIC_SETTINGS_MAX_AGE', 10)),
+    # Redis pub/sub channel for cross-worker cache invalidation (see apps/admin/invalidation_bus.py);
+    # disabled when no URL is configured
+    'INVALIDATION_BUS': {
+        'URL': os.environ.get('INVALIDATION_BUS_URL', os.environ.get('REDIS_URL', '')),
+        'CHANNEL': os.environ.get('INVALIDATION_BUS_CHANNEL', 'naebak_admin:invalidation'),
+    },
 }
 
 # Create logs directory if it doesn't exist
@@ -2,32 +2,131 @@
 """
 AI Governance Pre-commit Hook
 يتحقق من أن الكود المُضاف يتبع قواعد حوكمة الذكاء الاصطناعي
+
+- نتيجة كل ملف تُحفظ في ذاكرة مؤقتة محلية مفتاحها git blob SHA للمحتوى
+  المفحوص وإصدار قواعد الحوكمة، فلا يُعاد تحليل الملفات التي لم تتغير
+- الملفات غير المحفوظة تُحلل على عدة عمليات عبر CodeGovernor.analyze_many
+- مع --changed-hunks تُحلل فقط التعريفات (دوال، كلاسات، جمل) التي تمسها
+  التغييرات المُضافة للـ index
 """
 
 import sys
 import os
 import ast
 import re
+import json
+import argparse
+import hashlib
+import subprocess
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional, Set, Any
+
+PROJECT_ROOT = Path(__file__).parent.parent
 
 # إضافة مسار المشروع للـ Python path
-sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(PROJECT_ROOT))
 
 try:
-    from app.ai_governance.code_governor import CodeGovernor, CodeQualityLevel, TestQualityLevel
+    from app.ai_governance.code_governor import (
+        ANALYSIS_VERSION, CodeGovernor, CodeQualityLevel, TestQualityLevel
+    )
 except ImportError:
     print("⚠️ تعذر استيراد CodeGovernor - سيتم استخدام فحص أساسي")
     CodeGovernor = None
 
+# يُرفع عند تغيير طريقة بناء النتيجة من التحليل
+HOOK_CACHE_VERSION = '1'
+DEFAULT_CACHE_DIR = (PROJECT_ROOT / '.git' / 'ai_governance_cache'
+                     if (PROJECT_ROOT / '.git').is_dir() else PROJECT_ROOT / '.ai_governance_cache')
+
+# أقل من هذا العدد من الملفات يكون التحليل في نفس العملية أسرع من تشغيل العمليات
+PARALLEL_MIN_FILES = 8
+
+HUNK_HEADER_RE = re.compile(r'^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@', re.MULTILINE)
+
+
+def git_blob_sha(data: bytes) -> str:
+    """نفس SHA الذي يحسبه git hash-object للمحتوى"""
+    return hashlib.sha1(b'blob %d\0' % len(data) + data).hexdigest()
+
+
+def staged_changed_lines(file_path: str) -> Optional[Set[int]]:
+    """أرقام الأسطر المُضافة أو المُعدلة في الـ index (None إذا تعذر سؤال git)"""
+    try:
+        diff = subprocess.run(
+            ['git', 'diff', '--cached', '--no-color', '--no-ext-diff', '-U0', '--', file_path],
+            cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    lines = set()
+    for match in HUNK_HEADER_RE.finditer(diff):
+        start = int(match.group(1))
+        count = int(match.group(2)) if match.group(2) is not None else 1
+        # حذف فقط (count == 0): التعريف المحيط بموضع الحذف هو الذي تغير
+        lines.update(range(start, start + count) if count else (max(start, 1),))
+    return lines
+
+
+def select_changed_source(tree: ast.Module, content: str, changed_lines: Set[int]) -> str:
+    """مصدر جمل المستوى الأعلى (مع الـ decorators) التي تمسها الأسطر المتغيرة"""
+    source_lines = content.splitlines()
+    segments = []
+    for node in tree.body:
+        start = min([node.lineno] + [d.lineno for d in getattr(node, 'decorator_list', [])])
+        end = node.end_lineno or node.lineno
+        if any(start <= line <= end for line in changed_lines):
+            segments.append('\n'.join(source_lines[start - 1:end]))
+    return '\n\n'.join(segments)
+
+
+class VerdictCache:
+    """نتائج الفحص لكل ملف على القرص، مفتاحها blob SHA داخل مجلد لكل إصدار قواعد"""
+
+    def __init__(self, cache_dir: Path, version: str):
+        self.directory = Path(cache_dir) / version
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, sha: str) -> Path:
+        return self.directory / sha[:2] / f'{sha}.json'
+
+    def get(self, sha: str) -> Optional[Dict[str, Any]]:
+        try:
+            verdict = json.loads(self._path(sha).read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return verdict
+
+    def set(self, sha: str, verdict: Dict[str, Any]):
+        path = self._path(sha)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # كتابة ذرية حتى لا يقرأ فحص متزامن ملفاً ناقصاً
+            tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+            tmp_path.write_text(json.dumps(verdict, ensure_ascii=False), encoding='utf-8')
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
 
 class AIGovernanceHook:
     """Hook للتحقق من حوكمة الذكاء الاصطناعي قبل الـ commit"""
     
-    def __init__(self):
+    def __init__(self, workers: Optional[int] = None, use_cache: bool = True,
+                 cache_dir: Optional[Path] = None, changed_hunks: bool = False):
         self.governor = CodeGovernor() if CodeGovernor else None
+        self.workers = workers
+        self.changed_hunks = changed_hunks
         self.errors = []
         self.warnings = []
+        self.cache = None
+        if self.governor and use_cache:
+            version = f"{ANALYSIS_VERSION}-{self.governor.compiled_rules.version}-{HOOK_CACHE_VERSION}"
+            self.cache = VerdictCache(cache_dir or DEFAULT_CACHE_DIR, version)
         
     def check_files(self, file_paths: List[str]) -> bool:
         """فحص الملفات المُضافة أو المُعدلة"""
@@ -40,36 +139,116 @@ class AIGovernanceHook:
             return True
         
         all_passed = True
+        pending: List[Tuple[str, str, str]] = []
         
         for file_path in python_files:
-            if not self._check_single_file(file_path):
+            content = self._read_file(file_path)
+            if content is None:
+                all_passed = False
+                continue
+            
+            # تخطي الملفات الفارغة أو ملفات __init__.py
+            if not content.strip() or file_path.endswith('__init__.py'):
+                continue
+            
+            if not self.governor:
+                if not self._check_basic_file(file_path, content):
+                    all_passed = False
+                continue
+            
+            verdict, text = self._cached_or_pending(file_path, content)
+            if verdict is None:
+                pending.append((file_path, text, git_blob_sha(text.encode('utf-8'))))
+            elif not self._record(file_path, verdict):
                 all_passed = False
         
+        if pending:
+            if not self._analyze_pending(pending):
+                all_passed = False
+        
+        if self.cache and (self.cache.hits or self.cache.misses):
+            print(f"   ♻️ {self.cache.hits} من {self.cache.hits + self.cache.misses} ملفات من الذاكرة المؤقتة")
+        
         self._print_results()
         return all_passed
     
-    def _check_single_file(self, file_path: str) -> bool:
-        """فحص ملف واحد"""
+    def _read_file(self, file_path: str) -> Optional[str]:
+        """قراءة الملف (None مع تسجيل خطأ إذا تعذرت القراءة)"""
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+                return f.read()
         except Exception as e:
             self.errors.append(f"❌ {file_path}: تعذر قراءة الملف - {e}")
+            return None
+    
+    def _check_basic_file(self, file_path: str, content: str) -> bool:
+        """فحص ملف واحد بدون CodeGovernor"""
+        if not self._check_basic_structure(file_path, content):
             return False
+        return self._check_basic_rules(file_path, content)
+    
+    def _cached_or_pending(self, file_path: str, content: str) -> Tuple[Optional[Dict[str, Any]], str]:
+        """
+        النتيجة المحفوظة للملف إن وُجدت، وإلا النص الذي يجب تحليله.
+        أخطاء بناء الجملة تُعاد كنتيجة مباشرة.
+        """
+        text = content
+        if self.changed_hunks:
+            try:
+                tree = ast.parse(content)
+            except SyntaxError as e:
+                return self._syntax_error_verdict(e), content
+            changed_lines = staged_changed_lines(file_path)
+            # بدون تغييرات في الـ index (تشغيل يدوي) يُفحص الملف كاملاً
+            if changed_lines:
+                text = select_changed_source(tree, content, changed_lines)
+                if not text.strip():
+                    return {'passed': True, 'errors': [], 'warnings': []}, text
         
-        # تخطي الملفات الفارغة أو ملفات __init__.py
-        if not content.strip() or file_path.endswith('__init__.py'):
-            return True
+        sha = git_blob_sha(text.encode('utf-8'))
+        verdict = self.cache.get(sha) if self.cache else None
+        if verdict is not None:
+            return verdict, text
         
-        # فحص أساسي للبنية
-        if not self._check_basic_structure(file_path, content):
-            return False
+        if not self.changed_hunks:
+            try:
+                ast.parse(content)
+            except SyntaxError as e:
+                verdict = self._syntax_error_verdict(e)
+                if self.cache:
+                    self.cache.set(sha, verdict)
+                return verdict, text
+        
+        return None, text
+    
+    def _analyze_pending(self, pending: List[Tuple[str, str, str]]) -> bool:
+        """تحليل الملفات غير المحفوظة (على عدة عمليات إذا كانت كثيرة) وحفظ نتائجها"""
+        workers = self.workers or os.cpu_count() or 1
+        if len(pending) < PARALLEL_MIN_FILES:
+            workers = 1
+        chunk_size = max(1, len(pending) // (workers * 4))
+        
+        texts = [text for _, text, _ in pending]
+        analyses = self.governor.iter_analyze_many(texts, workers=workers, chunk_size=chunk_size)
         
-        # فحص متقدم باستخدام CodeGovernor إذا كان متاحاً
-        if self.governor:
-            return self._check_with_governor(file_path, content)
-        else:
-            return self._check_basic_rules(file_path, content)
+        all_passed = True
+        for (file_path, text, sha), analysis in zip(pending, analyses):
+            verdict = self._governor_verdict(text, analysis)
+            if self.cache:
+                self.cache.set(sha, verdict)
+            if not self._record(file_path, verdict):
+                all_passed = False
+        return all_passed
+    
+    def _record(self, file_path: str, verdict: Dict[str, Any]) -> bool:
+        """إضافة رسائل نتيجة ملف إلى الأخطاء والتحذيرات"""
+        self.errors.extend(f"❌ {file_path}: {message}" for message in verdict['errors'])
+        self.warnings.extend(f"⚠️ {file_path}: {message}" for message in verdict['warnings'])
+        return verdict['passed']
+    
+    @staticmethod
+    def _syntax_error_verdict(error: SyntaxError) -> Dict[str, Any]:
+        return {'passed': False, 'errors': [f"خطأ في بناء الجملة - {error}"], 'warnings': []}
     
     def _check_basic_structure(self, file_path: str, content: str) -> bool:
         """فحص البنية الأساسية للكود"""
@@ -81,43 +260,38 @@ class AIGovernanceHook:
         
         return True
     
-    def _check_with_governor(self, file_path: str, content: str) -> bool:
-        """فحص متقدم باستخدام CodeGovernor"""
-        analysis = self.governor.analyze_ai_response(content)
-        
-        file_passed = True
+    def _governor_verdict(self, content: str, analysis) -> Dict[str, Any]:
+        """نتيجة الفحص المتقدم من تحليل CodeGovernor (بدون مسار الملف حتى تُحفظ)"""
+        errors = []
+        warnings = []
         
         # فحص جودة الكود
         if analysis.code_quality == CodeQualityLevel.BLOCKED:
-            self.errors.append(f"❌ {file_path}: جودة الكود غير مقبولة")
-            file_passed = False
+            errors.append("جودة الكود غير مقبولة")
         elif analysis.code_quality == CodeQualityLevel.POOR:
-            self.warnings.append(f"⚠️ {file_path}: جودة الكود ضعيفة")
+            warnings.append("جودة الكود ضعيفة")
         
         # فحص الاختبارات
         if analysis.has_code and not analysis.has_tests:
             # تحقق إذا كان الملف يحتوي على دوال أو كلاسات تحتاج اختبارات
             if self._needs_tests(content):
-                self.errors.append(f"❌ {file_path}: الكود يحتاج إلى اختبارات")
-                file_passed = False
+                errors.append("الكود يحتاج إلى اختبارات")
         
         if analysis.test_quality == TestQualityLevel.FAKE_TESTS:
-            self.errors.append(f"❌ {file_path}: الاختبارات وهمية أو غير فعالة")
-            file_passed = False
+            errors.append("الاختبارات وهمية أو غير فعالة")
         
         # فحص التغطية
         if analysis.coverage_estimate < 0.8 and analysis.has_tests:
-            self.warnings.append(f"⚠️ {file_path}: تغطية الاختبارات منخفضة ({analysis.coverage_estimate:.1%})")
+            warnings.append(f"تغطية الاختبارات منخفضة ({analysis.coverage_estimate:.1%})")
         
         # إضافة الانتهاكات
         for violation in analysis.violations:
             if any(word in violation.lower() for word in ['أمان', 'security', 'محظور']):
-                self.errors.append(f"❌ {file_path}: {violation}")
-                file_passed = False
+                errors.append(violation)
             else:
-                self.warnings.append(f"⚠️ {file_path}: {violation}")
+                warnings.append(violation)
         
-        return file_passed
+        return {'passed': not errors, 'errors': errors, 'warnings': warnings}
     
     def _check_basic_rules(self, file_path: str, content: str) -> bool:
         """فحص أساسي للقواعد بدون CodeGovernor"""
@@ -202,16 +376,34 @@ class AIGovernanceHook:
             print("✅ لا توجد أخطاء حرجة")
 
 
-def main():
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='فحص حوكمة الذكاء الاصطناعي للملفات المُضافة')
+    parser.add_argument('files', nargs='*', help='الملفات المراد فحصها')
+    parser.add_argument('--changed-hunks', action='store_true',
+                        help='تحليل التعريفات التي تمسها التغييرات المُضافة للـ index فقط')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='عدد العمليات للتحليل (افتراضي: عدد المعالجات)')
+    parser.add_argument('--no-cache', action='store_true', help='تعطيل الذاكرة المؤقتة للنتائج')
+    parser.add_argument('--cache-dir', default=None,
+                        help=f'مجلد الذاكرة المؤقتة (افتراضي: {DEFAULT_CACHE_DIR})')
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] = None):
     """النقطة الرئيسية للـ hook"""
-    if len(sys.argv) < 2:
+    args = parse_args(argv)
+    if not args.files:
         print("❌ لم يتم تمرير ملفات للفحص")
         return 1
     
-    file_paths = sys.argv[1:]
-    hook = AIGovernanceHook()
+    hook = AIGovernanceHook(
+        workers=args.workers,
+        use_cache=not args.no_cache,
+        cache_dir=Path(args.cache_dir) if args.cache_dir else None,
+        changed_hunks=args.changed_hunks,
+    )
     
-    if hook.check_files(file_paths):
+    if hook.check_files(args.files):
         return 0
     else:
         print("\n❌ فشل فحص حوكمة الذكاء الاصطناعي")
@@ -2,25 +2,184 @@
 """
 Contract Testing Validation Hook
 يتحقق من صحة عقود الـ API بين الخدمات باستخدام Pact.io و Schemathesis
+
+مخطط OpenAPI يُقرأ ويُحلل مرة واحدة لكل محتوى: المخطط المحلل ونتيجة التحقق
+وفهرس العمليات تُحفظ في ذاكرة مؤقتة مفتاحها hash الملف. الفهرس يربط كل
+عملية (METHOD path) بـ hash لكل معامل وجسم طلب واستجابة (مع محتوى الـ $ref
+المستخدمة)، فكشف التغييرات التي تكسر التوافق يقارن فهرس المخطط الحالي
+بفهرس المخطط في git ref سابق ولا يفحص إلا العمليات التي تغير hash-ها.
+الـ ref الافتراضي هو نقطة التفرع (merge-base) مع الفرع الهدف، وإذا كان المخطط
+هناك مطابقاً للحالي تُفحص كل العمليات. النصوص التوثيقية (description و
+summary والأمثلة) لا تدخل في الـ hash، واستجابات العمليات تُقارن بمخططاتها فقط.
 """
 
 import sys
 import subprocess
 import json
 import os
+import hashlib
+import argparse
 import yaml
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 import requests
 
+PROJECT_ROOT = Path(__file__).parent.parent
+CACHE_DIR = (PROJECT_ROOT / '.git' / 'ai_governance_cache' / 'contracts'
+             if (PROJECT_ROOT / '.git').is_dir() else PROJECT_ROOT / '.ai_governance_cache' / 'contracts')
+
+# يُرفع عند تغيير بنية المدخلات المحفوظة (الفهرس، نتيجة التحقق)
+SPEC_CACHE_VERSION = '2'
+HTTP_METHODS = ['GET', 'POST', 'PUT', 'DELETE', 'PATCH']
+# الفرع الذي يُقارن به المخطط إذا لم يُحدد baseline_ref (GITHUB_BASE_REF في طلبات الدمج)
+DEFAULT_TARGET_BRANCH = 'main'
+# مفاتيح توثيقية لا تغير العقد
+DOCUMENTATION_KEYS = frozenset({'description', 'summary', 'example', 'examples', 'externalDocs'})
+# عقد مفاتيحها أسماء (حقول، مكونات) وليست كلمات OpenAPI: حقل اسمه description يبقى
+NAME_MAPS = frozenset({'properties', 'patternProperties', 'schemas', 'responses', 'parameters',
+                       'requestBodies', 'headers', 'securitySchemes'})
+
+
+class NodeDigester:
+    """
+    hash ثابت لعقد المخطط. كل $ref داخلي يُستبدل بـ hash العقدة التي يشير
+    إليها، فتغيير مكوّن في components يغير hash كل عملية تستخدمه. المفاتيح
+    التوثيقية تُحذف فلا يغير تعديل وصف الـ hash.
+    """
+
+    def __init__(self, spec: Dict):
+        self.spec = spec
+        self.memo: Dict[str, str] = {}
+        self.active = set()
+
+    def digest(self, node: Any) -> str:
+        canonical = json.dumps(self._canonical(node), sort_keys=True, separators=(',', ':'),
+                               ensure_ascii=False, default=str)
+        return hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:16]
+
+    def resolve(self, node: Any) -> Any:
+        """العقدة التي يشير إليها $ref داخلي، أو العقدة نفسها"""
+        ref = node.get('$ref') if isinstance(node, dict) else None
+        if not (isinstance(ref, str) and ref.startswith('#/')):
+            return node
+        target: Any = self.spec
+        for part in ref[2:].split('/'):
+            part = part.replace('~1', '/').replace('~0', '~')
+            target = target.get(part) if isinstance(target, dict) else None
+        return target
+
+    def _canonical(self, node: Any, names: bool = False) -> Any:
+        if isinstance(node, dict):
+            ref = node.get('$ref')
+            if isinstance(ref, str) and ref.startswith('#/'):
+                return {'$ref': ref, '#': self._ref_digest(ref)}
+            return {str(key): self._canonical(value, str(key) in NAME_MAPS)
+                    for key, value in node.items() if names or key not in DOCUMENTATION_KEYS}
+        if isinstance(node, list):
+            return [self._canonical(item) for item in node]
+        return node
+
+    def _ref_digest(self, ref: str) -> str:
+        if ref in self.memo:
+            return self.memo[ref]
+        if ref in self.active:
+            # مرجع دائري: الاسم وحده يكفي لقطع الحلقة
+            return ref
+        self.active.add(ref)
+        digest = self.digest(self.resolve({'$ref': ref}))
+        self.active.discard(ref)
+        self.memo[ref] = digest
+        return digest
+
+
+def response_schemas(digester: NodeDigester, response: Any) -> Dict[str, Any]:
+    """مخططات استجابة لكل نوع محتوى (بعد حل $ref للاستجابة)"""
+    response = digester.resolve(response)
+    content = response.get('content') if isinstance(response, dict) else None
+    if not isinstance(content, dict):
+        return {}
+    return {media_type: media.get('schema') if isinstance(media, dict) else None
+            for media_type, media in content.items()}
+
+
+def index_spec(spec: Dict) -> Dict[str, Dict[str, Any]]:
+    """
+    فهرس العمليات: "METHOD path" -> hash العملية، وhash لكل معامل
+    (مع required)، ولجسم الطلب، ولمخططات كل استجابة حسب الـ status
+    """
+    digester = NodeDigester(spec)
+    index = {}
+
+    for path, methods in (spec.get('paths') or {}).items():
+        path_parameters = methods.get('parameters', []) if isinstance(methods, dict) else []
+        for method, details in methods.items():
+            if method.upper() not in HTTP_METHODS:
+                continue
+
+            parameters = {}
+            for parameter in list(path_parameters) + list(details.get('parameters', [])):
+                if '$ref' in parameter:
+                    key = parameter['$ref']
+                else:
+                    key = f"{parameter.get('in')}:{parameter.get('name')}"
+                parameters[key] = [bool(parameter.get('required', False)), digester.digest(parameter)]
+
+            request_body = details.get('requestBody')
+            index[f"{method.upper()} {path}"] = {
+                'hash': digester.digest({'parameters': path_parameters, 'operation': details}),
+                'parameters': parameters,
+                'request_body': ([bool(request_body.get('required', False)), digester.digest(request_body)]
+                                 if request_body else None),
+                'responses': {str(status): digester.digest(response_schemas(digester, response))
+                              for status, response in (details.get('responses') or {}).items()},
+            }
+
+    return index
+
+
+def diff_operation(operation: str, old: Dict[str, Any], new: Dict[str, Any]) -> List[str]:
+    """التغييرات التي قد تكسر التوافق بين نسختين من عملية واحدة"""
+    changes = []
+
+    for key, (required, digest) in new['parameters'].items():
+        previous = old['parameters'].get(key)
+        if previous is None:
+            if required:
+                changes.append(f"{operation}: معامل مطلوب جديد - {key}")
+        elif required and not previous[0]:
+            changes.append(f"{operation}: المعامل {key} أصبح مطلوباً")
+        elif digest != previous[1]:
+            changes.append(f"{operation}: تغير مخطط المعامل {key}")
+
+    old_body, new_body = old['request_body'], new['request_body']
+    if new_body and new_body[0] and not (old_body and old_body[0]):
+        changes.append(f"{operation}: جسم الطلب أصبح مطلوباً")
+    elif new_body and old_body and new_body[1] != old_body[1]:
+        changes.append(f"{operation}: تغير مخطط جسم الطلب")
+
+    for status, digest in old['responses'].items():
+        if status not in new['responses']:
+            changes.append(f"{operation}: تمت إزالة الاستجابة {status}")
+        elif new['responses'][status] != digest:
+            changes.append(f"{operation}: تغير مخطط الاستجابة {status}")
+
+    return changes
+
 
 class ContractValidator:
     """مُتحقق من عقود الـ API"""
     
-    def __init__(self):
-        self.project_root = Path(__file__).parent.parent
+    def __init__(self, baseline_ref: Optional[str] = None, use_cache: bool = True):
+        """
+        baseline_ref: الـ git ref للمخطط السابق. None تعني نقطة التفرع مع الفرع
+        الهدف، والنص الفارغ يعطل المقارنة (تُفحص كل العمليات)
+        """
+        self.project_root = PROJECT_ROOT
         self.pact_dir = self.project_root / 'pacts'
         self.openapi_spec = self.project_root / 'docs' / 'openapi.yaml'
+        self.baseline_ref = baseline_ref
+        self.use_cache = use_cache
+        self._spec_entries: Dict[str, Dict[str, Any]] = {}
         
     def validate_contracts(self) -> bool:
         """التحقق من جميع عقود الـ API"""
@@ -130,46 +289,97 @@ class ContractValidator:
             return True
         
         try:
-            # قراءة ملف OpenAPI
-            with open(self.openapi_spec, 'r') as f:
-                if self.openapi_spec.suffix.lower() == '.yaml':
-                    spec_data = yaml.safe_load(f)
-                else:
-                    spec_data = json.load(f)
-            
+            entry = self._spec_entry(self.openapi_spec.read_bytes())
+        except Exception as e:
+            print(f"❌ خطأ في فحص OpenAPI: {e}")
+            return False
+        
+        passed, messages = entry['validation']
+        for message in messages:
+            print(message)
+        return passed
+    
+    def _spec_entry(self, content: bytes) -> Dict[str, Any]:
+        """
+        المخطط المحلل ونتيجة التحقق وفهرس العمليات لمحتوى ملف، من الذاكرة
+        المؤقتة (في العملية ثم على القرص) أو بالتحليل مرة واحدة
+        """
+        sha = hashlib.sha256(content).hexdigest()
+        if sha in self._spec_entries:
+            return self._spec_entries[sha]
+        
+        cache_file = CACHE_DIR / f'{sha}.json'
+        entry = None
+        if self.use_cache:
+            try:
+                entry = json.loads(cache_file.read_text(encoding='utf-8'))
+                if entry.get('version') != SPEC_CACHE_VERSION:
+                    entry = None
+            except (OSError, ValueError):
+                entry = None
+        
+        if entry is None:
+            text = content.decode('utf-8')
+            if self.openapi_spec.suffix.lower() == '.yaml':
+                spec = yaml.safe_load(text)
+            else:
+                spec = json.loads(text)
+            entry = {
+                'version': SPEC_CACHE_VERSION,
+                # المخطط بصيغة JSON: قراءته في التشغيلات التالية أسرع بكثير من YAML
+                'spec': json.loads(json.dumps(spec, default=str)),
+                'validation': self._check_openapi_structure(spec),
+                'index': index_spec(spec) if isinstance(spec, dict) else {},
+            }
+            if self.use_cache:
+                try:
+                    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+                    tmp_file = cache_file.with_suffix(f'.{os.getpid()}.tmp')
+                    tmp_file.write_text(json.dumps(entry, ensure_ascii=False), encoding='utf-8')
+                    os.replace(tmp_file, cache_file)
+                except OSError:
+                    pass
+        
+        self._spec_entries[sha] = entry
+        return entry
+    
+    def _check_openapi_structure(self, spec_data: Dict) -> Tuple[bool, List[str]]:
+        """التحقق من بنية OpenAPI: (النتيجة، الرسائل)"""
+        messages = []
+        try:
             # التحقق من البنية الأساسية
             required_fields = ['openapi', 'info', 'paths']
             
             for field in required_fields:
                 if field not in spec_data:
-                    print(f"❌ OpenAPI: حقل مطلوب مفقود - {field}")
-                    return False
+                    messages.append(f"❌ OpenAPI: حقل مطلوب مفقود - {field}")
+                    return False, messages
             
             # التحقق من الإصدار
             openapi_version = spec_data.get('openapi', '')
             if not openapi_version.startswith('3.'):
-                print(f"⚠️ OpenAPI: إصدار غير مدعوم - {openapi_version}")
+                messages.append(f"⚠️ OpenAPI: إصدار غير مدعوم - {openapi_version}")
             
             # التحقق من الـ paths
             paths = spec_data.get('paths', {})
             if not paths:
-                print("⚠️ OpenAPI: لا توجد paths محددة")
-                return True
+                messages.append("⚠️ OpenAPI: لا توجد paths محددة")
+                return True, messages
             
             # فحص كل path
             for path, methods in paths.items():
                 for method, details in methods.items():
-                    if method.upper() in ['GET', 'POST', 'PUT', 'DELETE', 'PATCH']:
+                    if method.upper() in HTTP_METHODS:
                         if 'responses' not in details:
-                            print(f"❌ OpenAPI: {method.upper()} {path} - responses مفقود")
-                            return False
+                            messages.append(f"❌ OpenAPI: {method.upper()} {path} - responses مفقود")
+                            return False, messages
             
-            print(f"✅ OpenAPI: صحيح ({len(paths)} paths)")
-            return True
+            messages.append(f"✅ OpenAPI: صحيح ({len(paths)} paths)")
+            return True, messages
             
         except Exception as e:
-            print(f"❌ خطأ في فحص OpenAPI: {e}")
-            return False
+            messages.append(f"❌ خطأ في فحص OpenAPI: {e}")
+            return False, messages
     
     def _run_schemathesis_tests(self) -> bool:
         """تشغيل اختبارات Schemathesis"""
@@ -218,23 +428,19 @@ class ContractValidator:
             return False
     
     def check_api_compatibility(self) -> bool:
-        """فحص توافق الـ API مع الإصدارات السابقة"""
+        """فحص توافق الـ API مع الإصدار السابق (المخطط في baseline_ref)"""
         print("🔄 فحص توافق الـ API...")
         
-        # هذا مثال بسيط - في الواقع ستحتاج لمقارنة مع إصدار سابق
         if not self.openapi_spec.exists():
             print("⚠️ لا يمكن فحص التوافق - ملف OpenAPI غير موجود")
             return True
         
         try:
-            with open(self.openapi_spec, 'r') as f:
-                if self.openapi_spec.suffix.lower() == '.yaml':
-                    current_spec = yaml.safe_load(f)
-                else:
-                    current_spec = json.load(f)
+            content = self.openapi_spec.read_bytes()
+            current_index = self._spec_entry(content)['index']
+            baseline_index = self._baseline_index(content)
             
-            # فحص أساسي للتغييرات المحتملة
-            breaking_changes = self._detect_breaking_changes(current_spec)
+            breaking_changes = self._detect_breaking_changes(current_index, baseline_index)
             
             if breaking_changes:
                 print("⚠️ تغييرات محتملة قد تكسر التوافق:")
@@ -249,30 +455,69 @@ class ContractValidator:
             print(f"❌ خطأ في فحص التوافق: {e}")
             return False
     
-    def _detect_breaking_changes(self, spec: Dict) -> List[str]:
-        """كشف التغييرات التي قد تكسر التوافق"""
+    def _resolve_baseline_ref(self) -> Optional[str]:
+        """
+        baseline_ref، أو نقطة التفرع (merge-base) بين HEAD والفرع الهدف:
+        المقارنة بـ HEAD وحده لا تكشف شيئاً بعد الـ commit (في CI مثلاً)
+        """
+        if self.baseline_ref is not None:
+            return self.baseline_ref or None
+        target = os.environ.get('GITHUB_BASE_REF') or DEFAULT_TARGET_BRANCH
+        for ref in (f'origin/{target}', target):
+            try:
+                return subprocess.run(
+                    ['git', 'merge-base', 'HEAD', ref],
+                    cwd=self.project_root, capture_output=True, text=True, check=True
+                ).stdout.strip()
+            except (OSError, subprocess.CalledProcessError):
+                continue
+        return 'HEAD'
+
+    def _baseline_index(self, current: bytes) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        فهرس المخطط في الـ ref السابق. None (فحص كل العمليات) إذا لم يكن
+        المخطط موجوداً هناك أو كان مطابقاً للمخطط الحالي
+        """
+        baseline_ref = self._resolve_baseline_ref()
+        if not baseline_ref:
+            return None
+        relative_path = self.openapi_spec.relative_to(self.project_root).as_posix()
+        try:
+            content = subprocess.run(
+                ['git', 'show', f'{baseline_ref}:{relative_path}'],
+                cwd=self.project_root, capture_output=True, check=True
+            ).stdout
+        except (OSError, subprocess.CalledProcessError):
+            return None
+        if content == current:
+            return None
+        return self._spec_entry(content)['index']
+    
+    def _detect_breaking_changes(self, index: Dict[str, Dict[str, Any]],
+                                 baseline_index: Optional[Dict[str, Dict[str, Any]]] = None) -> List[str]:
+        """
+        كشف التغييرات التي قد تكسر التوافق. مع فهرس سابق تُفحص فقط العمليات
+        الجديدة أو التي تغير hash-ها، والعمليات المحذوفة.
+        """
         breaking_changes = []
         
-        # هذا مثال بسيط - في الواقع تحتاج لمقارنة مع إصدار سابق
-        paths = spec.get('paths', {})
+        for operation, node in index.items():
+            previous = baseline_index.get(operation) if baseline_index is not None else None
+            if previous is not None and previous['hash'] == node['hash']:
+                continue
+            
+            # فحص الـ responses
+            responses = node['responses']
+            if '200' not in responses and '201' not in responses:
+                breaking_changes.append(f"{operation}: لا يوجد response ناجح")
+            
+            if previous is not None:
+                breaking_changes.extend(diff_operation(operation, previous, node))
         
-        for path, methods in paths.items():
-            for method, details in methods.items():
-                if method.upper() in ['GET', 'POST', 'PUT', 'DELETE', 'PATCH']:
-                    # فحص المعاملات المطلوبة
-                    parameters = details.get('parameters', [])
-                    required_params = [p for p in parameters if p.get('required', False)]
-                    
-                    # فحص الـ request body المطلوب
-                    request_body = details.get('requestBody', {})
-                    if request_body.get('required', False):
-                        # هذا قد يكون تغيير يكسر التوافق إذا كان جديد
-                        pass
-                    
-                    # فحص الـ responses
-                    responses = details.get('responses', {})
-                    if '200' not in responses and '201' not in responses:
-                        breaking_changes.append(f"{method.upper()} {path}: لا يوجد response ناجح")
+        if baseline_index is not None:
+            for operation in baseline_index:
+                if operation not in index:
+                    breaking_changes.append(f"{operation}: تمت إزالة الـ endpoint")
         
         return breaking_changes
     
@@ -289,12 +534,8 @@ class ContractValidator:
             generated_tests_dir = self.project_root / 'tests' / 'generated'
             generated_tests_dir.mkdir(parents=True, exist_ok=True)
             
-            # قراءة مخطط OpenAPI
-            with open(self.openapi_spec, 'r') as f:
-                if self.openapi_spec.suffix.lower() == '.yaml':
-                    spec = yaml.safe_load(f)
-                else:
-                    spec = json.load(f)
+            # مخطط OpenAPI المحلل (من الذاكرة المؤقتة)
+            spec = self._spec_entry(self.openapi_spec.read_bytes())['spec']
             
             # إنشاء اختبارات لكل endpoint
             test_content = self._generate_test_content(spec)
@@ -334,7 +575,7 @@ class TestAPIContracts:
         
         for path, methods in paths.items():
             for method, details in methods.items():
-                if method.upper() in ['GET', 'POST', 'PUT', 'DELETE', 'PATCH']:
+                if method.upper() in HTTP_METHODS:
                     test_method = self._generate_test_method(path, method, details)
                     content += test_method + '\n'
         
@@ -365,9 +606,19 @@ class TestAPIContracts:
         return test_code
 
 
-def main():
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='فحص عقود الـ API')
+    parser.add_argument('--baseline-ref', default=None,
+                        help='git ref للمخطط السابق عند فحص التوافق (افتراضي: نقطة التفرع مع '
+                             'GITHUB_BASE_REF أو main، والنص الفارغ يفحص كل العمليات)')
+    parser.add_argument('--no-cache', action='store_true', help='إعادة تحليل المخطط دون الذاكرة المؤقتة')
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] = None):
     """النقطة الرئيسية للـ hook"""
-    validator = ContractValidator()
+    args = parse_args(argv)
+    validator = ContractValidator(baseline_ref=args.baseline_ref, use_cache=not args.no_cache)
     
     # التحقق من العقود
     contracts_valid = validator.validate_contracts()
@@ -2,67 +2,616 @@
 """
 Test Coverage Check Hook
 يتحقق من أن تغطية الاختبارات تتجاوز الحد الأدنى المطلوب (90%)
+
+وضع --impact (اختيار الاختبارات حسب التأثير):
+- التشغيل الكامل يسجل سياق كل اختبار (--cov-context=test) ويبني منه قاعدة
+  بيانات تربط كل سطر في app/ بالاختبارات التي تنفذه، مع الـ commit المسجل
+- التشغيلات التالية تقارن الشجرة الحالية بذلك الـ commit وتشغل فقط
+  الاختبارات التي تنفذ الأسطر المتغيرة وملفات الاختبار المتغيرة
+- تقرير التغطية يُدمج من التشغيل الكامل (بعد إزاحة أسطر الملفات المتغيرة
+  حسب الـ diff) ومن تشغيل الاختبارات المختارة، فيبقى الحد الأدنى دقيقاً
+- أي تغيير لا يمكن تحديد أثره (إعدادات، قواعد، ملفات خارج app/ و tests/)
+  أو غياب قاعدة البيانات يعيد التشغيل الكامل
+
+وضع --shards N (التشغيل الكامل على N عمليات):
+- الاختبارات تُوزع بخوارزمية LPT (الأطول أولاً إلى العملية الأقل حملاً)
+  حسب مدد التشغيل السابقة المحفوظة على القرص
+- كل عملية تكتب ملف بيانات تغطية خاص بها، ثم تُدمج الملفات في coverage.json
+  الذي يقرأه الفاحص
 """
 
 import sys
 import subprocess
 import json
 import os
+import re
+import argparse
+import sqlite3
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    import coverage
+    from coverage import CoverageData
+except ImportError:
+    coverage = None
+
+PROJECT_ROOT = Path(__file__).parent.parent
+IMPACT_DIR = (PROJECT_ROOT / '.git' / 'ai_governance_cache'
+              if (PROJECT_ROOT / '.git').is_dir() else PROJECT_ROOT / '.ai_governance_cache')
+IMPACT_DB = IMPACT_DIR / 'test_impact.sqlite3'
+BASELINE_DATA = IMPACT_DIR / 'coverage.baseline'
+IMPACT_DATA = IMPACT_DIR / 'coverage.impact'
+COMBINED_DATA = IMPACT_DIR / 'coverage.combined'
+SHARDED_DATA = IMPACT_DIR / 'coverage.sharded'
+DURATIONS_FILE = IMPACT_DIR / 'test_durations.json'
+
+# مدة افتراضية لاختبار بدون تاريخ (ثوان)
+DEFAULT_TEST_DURATION = 0.5
+# مهلة التشغيل الكامل أو كل عملية في الوضع المقسم
+PYTEST_TIMEOUT = 300
+
+# تغييرات تؤثر على كل الاختبارات: تعيد التشغيل الكامل
+FULL_RUN_TRIGGERS = ('pytest.ini', 'setup.cfg', 'conftest.py', 'requirements', 'config/', 'governance/', 'apps/')
+# تغييرات لا تؤثر على الاختبارات
+IGNORED_PREFIXES = ('scripts/', 'docs/', '.github/')
+
+DIFF_FILE_RE = re.compile(r'^diff --git ')
+HUNK_RE = re.compile(r'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+# سطر من مخرجات pytest --durations=0: "0.12s call     tests/x.py::test_y"
+DURATION_LINE_RE = re.compile(r'^(\d+(?:\.\d+)?)s (?:setup|call|teardown)\s+(\S+)$', re.MULTILINE)
+
+
+@dataclass
+class FileChange:
+    """تغييرات ملف واحد بين الـ commit المسجل والشجرة الحالية"""
+    old_path: Optional[str]
+    new_path: Optional[str]
+    hunks: List[Tuple[int, int, int, int]] = field(default_factory=list)
+
+    def changed_old_lines(self) -> Set[int]:
+        """أسطر النسخة القديمة المحذوفة أو المعدلة، والأسطر المجاورة للإضافات"""
+        lines = set()
+        for old_start, old_count, _, _ in self.hunks:
+            if old_count:
+                lines.update(range(old_start, old_start + old_count))
+            else:
+                lines.update((old_start, old_start + 1))
+        return lines
+
+    def remap_line(self, line: int) -> Optional[int]:
+        """رقم السطر في النسخة الجديدة، أو None إذا كان السطر ضمن تغيير"""
+        shift = 0
+        for old_start, old_count, _, new_count in self.hunks:
+            old_end = old_start + old_count - 1 if old_count else old_start
+            if old_count and old_start <= line <= old_end:
+                return None
+            if line > old_end:
+                shift += new_count - old_count
+        return line + shift
+
+
+def parse_diff(diff: str) -> List[FileChange]:
+    """تحليل git diff -U0 إلى تغييرات لكل ملف"""
+    changes = []
+    current = None
+    for line in diff.splitlines():
+        if DIFF_FILE_RE.match(line):
+            current = FileChange(old_path=None, new_path=None)
+            changes.append(current)
+        elif current is None:
+            continue
+        elif line.startswith('--- '):
+            current.old_path = None if line[4:] == '/dev/null' else line[6:]
+        elif line.startswith('+++ '):
+            current.new_path = None if line[4:] == '/dev/null' else line[6:]
+        else:
+            match = HUNK_RE.match(line)
+            if match:
+                old_start, old_count, new_start, new_count = match.groups()
+                current.hunks.append((
+                    int(old_start), 1 if old_count is None else int(old_count),
+                    int(new_start), 1 if new_count is None else int(new_count),
+                ))
+    return changes
+
+
+def parse_collected(output: str) -> List[str]:
+    """
+    معرفات الاختبارات من مخرجات pytest --collect-only -q: الأسطر قبل أول سطر
+    فارغ (بعده ملخص العدد والتحذيرات). المعرف قد يحتوي مسافات داخل معاملات
+    parametrize مثل test_x[a b]
+    """
+    nodeids = []
+    for line in output.splitlines():
+        if not line.strip():
+            break
+        if '::' in line and line.split('::', 1)[0].endswith('.py'):
+            nodeids.append(line.rstrip())
+    return list(dict.fromkeys(nodeids))
+
+
+def balance_shards(nodeids: List[str], durations: Dict[str, float], shards: int) -> List[List[str]]:
+    """
+    توزيع الاختبارات على shards بخوارزمية LPT: الأطول أولاً، كل اختبار
+    للمجموعة ذات أقل مجموع مدد حتى الآن. اختبار بدون تاريخ يأخذ متوسط
+    المدد المعروفة.
+    """
+    known = [durations[nodeid] for nodeid in nodeids if nodeid in durations]
+    default = sum(known) / len(known) if known else DEFAULT_TEST_DURATION
+    ordered = sorted(nodeids, key=lambda nodeid: (-durations.get(nodeid, default), nodeid))
+
+    groups: List[List[str]] = [[] for _ in range(shards)]
+    heap = [(0.0, index) for index in range(shards)]
+    for nodeid in ordered:
+        load, index = heapq.heappop(heap)
+        groups[index].append(nodeid)
+        heapq.heappush(heap, (load + durations.get(nodeid, default), index))
+    return [group for group in groups if group]
+
+
+def collapse_to_files(nodeids: List[str], tests_per_file: Dict[str, int]) -> List[str]:
+    """ملفات الاختبار الموجودة بالكامل في المجموعة تُمرر كملف بدلاً من كل اختباراتها"""
+    counts: Dict[str, int] = {}
+    for nodeid in nodeids:
+        path = nodeid.split('::', 1)[0]
+        counts[path] = counts.get(path, 0) + 1
+    complete = {path for path, count in counts.items() if count == tests_per_file.get(path)}
+    return sorted(complete) + [nodeid for nodeid in nodeids if nodeid.split('::', 1)[0] not in complete]
+
+
+class TestDurations:
+    """مدد الاختبارات من التشغيلات السابقة (مجموع setup و call و teardown)"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        try:
+            self.durations: Dict[str, float] = json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            self.durations = {}
+
+    def update(self, outputs: Iterable[str], collected: Iterable[str]):
+        """تحديث المدد من مخرجات --durations=0 وحذف الاختبارات التي لم تعد موجودة"""
+        measured: Dict[str, float] = {}
+        for output in outputs:
+            for seconds, nodeid in DURATION_LINE_RE.findall(output):
+                measured[nodeid] = measured.get(nodeid, 0.0) + float(seconds)
+        collected = set(collected)
+        self.durations = {
+            nodeid: round(measured.get(nodeid, self.durations.get(nodeid, 0.0)), 4)
+            for nodeid in collected if nodeid in measured or nodeid in self.durations
+        }
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text(json.dumps(self.durations, indent=0, sort_keys=True), encoding='utf-8')
+        except OSError as e:
+            print(f"⚠️ تعذر حفظ مدد الاختبارات: {e}")
+
+
+class TestImpactMap:
+    """قاعدة بيانات SQLite تربط (ملف، سطر) بالاختبارات التي تنفذه"""
+
+    # سياق الأسطر المنفذة خارج أي اختبار (استيراد الوحدات، الـ collection)
+    IMPORT_CONTEXT = ''
+    QUERY_BATCH = 500
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(str(self.path))
+        connection.executescript('''
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS tests (id INTEGER PRIMARY KEY, nodeid TEXT UNIQUE);
+            CREATE TABLE IF NOT EXISTS line_tests (path TEXT, line INTEGER, test_id INTEGER);
+            CREATE INDEX IF NOT EXISTS line_tests_path_line ON line_tests (path, line);
+        ''')
+        return connection
+
+    @property
+    def commit(self) -> Optional[str]:
+        """الـ commit الذي سُجلت عليه الخريطة"""
+        if not self.path.exists():
+            return None
+        with self._connect() as connection:
+            row = connection.execute("SELECT value FROM meta WHERE key = 'commit'").fetchone()
+        return row[0] if row else None
+
+    def record(self, data: 'CoverageData', project_root: Path, commit: str):
+        """إعادة بناء الخريطة من بيانات تغطية تحتوي سياقات الاختبارات"""
+        root = str(project_root.resolve()) + os.sep
+        test_ids: Dict[str, int] = {}
+        rows = []
+        for measured_file in data.measured_files():
+            if not measured_file.startswith(root):
+                continue
+            path = measured_file[len(root):]
+            for line, contexts in data.contexts_by_lineno(measured_file).items():
+                for context in contexts:
+                    # pytest-cov: "<nodeid>|setup" / "|run" / "|teardown"
+                    nodeid = context.rsplit('|', 1)[0]
+                    test_id = test_ids.setdefault(nodeid, len(test_ids) + 1)
+                    rows.append((path, line, test_id))
+
+        with self._connect() as connection:
+            connection.execute('DELETE FROM line_tests')
+            connection.execute('DELETE FROM tests')
+            connection.executemany('INSERT INTO tests (id, nodeid) VALUES (?, ?)',
+                                   [(test_id, nodeid) for nodeid, test_id in test_ids.items()])
+            connection.executemany('INSERT INTO line_tests (path, line, test_id) VALUES (?, ?, ?)', set(rows))
+            connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('commit', ?)", (commit,))
+
+    def tests_for(self, path: str, lines: Set[int]) -> Set[str]:
+        """
+        الاختبارات التي تنفذ الأسطر. إذا كان أحد الأسطر يُنفذ عند الاستيراد
+        (تعريفات، ثوابت) فكل الاختبارات التي تمس الملف.
+        """
+        query = ('SELECT DISTINCT t.nodeid FROM line_tests l JOIN tests t ON t.id = l.test_id '
+                 'WHERE l.path = ?')
+        lines = sorted(lines)
+        nodeids = set()
+        with self._connect() as connection:
+            # دفعات حتى لا يتجاوز عدد المتغيرات حد SQLite
+            for start in range(0, len(lines), self.QUERY_BATCH):
+                batch = lines[start:start + self.QUERY_BATCH]
+                rows = connection.execute(f'{query} AND l.line IN ({",".join("?" * len(batch))})',
+                                          (path, *batch)).fetchall()
+                nodeids.update(row[0] for row in rows)
+            if self.IMPORT_CONTEXT in nodeids:
+                nodeids = {row[0] for row in connection.execute(query, (path,)).fetchall()}
+        nodeids.discard(self.IMPORT_CONTEXT)
+        return nodeids
 
 
 class CoverageChecker:
     """فاحص تغطية الاختبارات"""
     
-    def __init__(self, minimum_coverage: float = 90.0):
+    def __init__(self, minimum_coverage: float = 90.0, shards: int = 1):
         self.minimum_coverage = minimum_coverage
-        self.project_root = Path(__file__).parent.parent
+        self.shards = max(1, shards)
+        self.project_root = PROJECT_ROOT
+        self.impact_map = TestImpactMap(IMPACT_DB)
         
-    def check_coverage(self) -> bool:
-        """فحص تغطية الاختبارات"""
+    def check_coverage(self, record: bool = False) -> bool:
+        """فحص تغطية الاختبارات (مع تسجيل خريطة تأثير الاختبارات إذا طُلب)"""
         print(f"🔍 فحص تغطية الاختبارات (الحد الأدنى: {self.minimum_coverage}%)...")
         
+        if self.shards > 1:
+            if coverage is None:
+                print("⚠️ حزمة coverage غير مثبتة - لا يمكن دمج التغطية، سيتم التشغيل في عملية واحدة")
+            else:
+                passed = self._check_coverage_sharded(record)
+                if passed is not None:
+                    return passed
+        
+        extra_args = []
+        env = None
+        if record:
+            if coverage is None:
+                print("⚠️ حزمة coverage غير مثبتة - لن تُسجل خريطة تأثير الاختبارات")
+                record = False
+            else:
+                IMPACT_DIR.mkdir(parents=True, exist_ok=True)
+                extra_args = ['--cov-context=test']
+                env = dict(os.environ, COVERAGE_FILE=str(BASELINE_DATA))
+        
         try:
             # تشغيل الاختبارات مع قياس التغطية
-            result = subprocess.run([
-                'python', '-m', 'pytest',
-                '--cov=app',
-                '--cov-report=json',
-                '--cov-report=term-missing',
+            result = self._run_pytest([
                 '--cov-fail-under=' + str(self.minimum_coverage),
+                *extra_args,
                 'tests/'
-            ], 
-            cwd=self.project_root,
-            capture_output=True,
-            text=True,
-            timeout=300  # 5 دقائق timeout
-            )
-            
-            # قراءة تقرير التغطية JSON
-            coverage_data = self._read_coverage_report()
-            
-            if coverage_data:
-                self._print_coverage_summary(coverage_data)
-                
-                total_coverage = coverage_data.get('totals', {}).get('percent_covered', 0)
-                
-                if total_coverage >= self.minimum_coverage:
-                    print(f"✅ تغطية الاختبارات مقبولة: {total_coverage:.1f}%")
-                    return True
-                else:
-                    print(f"❌ تغطية الاختبارات منخفضة: {total_coverage:.1f}% (المطلوب: {self.minimum_coverage}%)")
-                    self._print_uncovered_lines(coverage_data)
-                    return False
-            else:
-                print("⚠️ تعذر قراءة تقرير التغطية")
-                return result.returncode == 0
-                
+            ], env=env)
         except subprocess.TimeoutExpired:
             print("❌ انتهت مهلة تشغيل الاختبارات (5 دقائق)")
             return False
         except Exception as e:
             print(f"❌ خطأ في تشغيل فحص التغطية: {e}")
             return False
+        
+        if record and BASELINE_DATA.exists():
+            self._record_impact_map()
+        
+        return self._evaluate_report(result.returncode)
+    
+    def _check_coverage_sharded(self, record: bool) -> Optional[bool]:
+        """
+        تشغيل كامل موزع على عدة عمليات ثم دمج بيانات التغطية في coverage.json.
+        يعيد None إذا تعذر جمع الاختبارات ليعود الفاحص للتشغيل في عملية واحدة
+        """
+        try:
+            nodeids = self._collect_tests()
+        except (OSError, subprocess.SubprocessError) as e:
+            print(f"⚠️ تعذر جمع الاختبارات: {e} - سيتم التشغيل في عملية واحدة")
+            return None
+        if nodeids is None:
+            return None
+        if not nodeids:
+            print("❌ لم تُجمع أي اختبارات")
+            return False
+        
+        durations = TestDurations(DURATIONS_FILE)
+        groups = balance_shards(nodeids, durations.durations, self.shards)
+        tests_per_file: Dict[str, int] = {}
+        for nodeid in nodeids:
+            path = nodeid.split('::', 1)[0]
+            tests_per_file[path] = tests_per_file.get(path, 0) + 1
+        
+        data_file = BASELINE_DATA if record else SHARDED_DATA
+        data_file.parent.mkdir(parents=True, exist_ok=True)
+        shard_files = [Path(f"{data_file}.shard{index}") for index in range(len(groups))]
+        for path in [data_file, *shard_files]:
+            if path.exists():
+                path.unlink()
+        
+        print(f"⚡ تشغيل {len(nodeids)} اختبار على {len(groups)} عمليات...")
+        extra_args = ['--cov-context=test'] if record else []
+        try:
+            with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+                results = list(executor.map(
+                    lambda args: self._run_shard(collapse_to_files(args[0], tests_per_file), args[1], extra_args),
+                    zip(groups, shard_files)
+                ))
+        except subprocess.TimeoutExpired:
+            print(f"❌ انتهت مهلة تشغيل الاختبارات ({PYTEST_TIMEOUT // 60} دقائق)")
+            return False
+        
+        durations.update((result.stdout for result in results), nodeids)
+        
+        failed = [result for result in results if result.returncode not in (0, 5)]
+        if failed:
+            print("❌ فشلت بعض الاختبارات")
+            for result in failed:
+                print(result.stdout[-2000:])
+            return False
+        
+        try:
+            report = coverage.Coverage(data_file=str(data_file), source=[str(self.project_root.resolve() / 'app')])
+            report.combine(data_paths=[str(path) for path in shard_files if path.exists()], strict=True)
+            report.save()
+            report.json_report(outfile=str(self.project_root / 'coverage.json'))
+        except Exception as e:
+            print(f"❌ تعذر دمج بيانات التغطية: {e}")
+            return False
+        
+        if record:
+            self._record_impact_map()
+        
+        return self._evaluate_report(0)
+    
+    def _collect_tests(self) -> Optional[List[str]]:
+        """
+        معرفات كل الاختبارات (pytest --collect-only)، أو None إذا فشل الجمع
+        (خطأ استيراد في ملف اختبار مثلاً): تشغيل جزء من الاختبارات فقط
+        سيعطي تغطية ناقصة دون أن يفشل
+        """
+        result = subprocess.run(
+            ['python', '-m', 'pytest', '--collect-only', '-q', '-o', 'addopts=', 'tests/'],
+            cwd=self.project_root, capture_output=True, text=True, timeout=PYTEST_TIMEOUT
+        )
+        if result.returncode not in (0, 5):
+            print(f"⚠️ فشل جمع الاختبارات (رمز الخروج {result.returncode}) - سيتم التشغيل في عملية واحدة")
+            print(result.stdout[-2000:])
+            return None
+        return parse_collected(result.stdout)
+    
+    def _run_shard(self, targets: List[str], data_file: Path, extra_args: List[str]) -> subprocess.CompletedProcess:
+        """
+        تشغيل مجموعة اختبارات في عملية مستقلة تكتب بيانات تغطيتها في data_file.
+        addopts من pytest.ini تُلغى حتى لا تكتب العمليات تقارير html/xml في نفس
+        الملفات في نفس الوقت، والتقرير يُبنى بعد الدمج.
+        """
+        return subprocess.run([
+            'python', '-m', 'pytest',
+            '-o', 'addopts=',
+            '--strict-markers', '--tb=short', '--disable-warnings',
+            '--cov=app', '--cov-branch', '--cov-report=',
+            '--durations=0', '--durations-min=0',
+            *extra_args,
+            *targets
+        ],
+        cwd=self.project_root,
+        capture_output=True,
+        text=True,
+        env=dict(os.environ, COVERAGE_FILE=str(data_file)),
+        timeout=PYTEST_TIMEOUT
+        )
+    
+    def check_coverage_impact(self) -> bool:
+        """فحص التغطية بتشغيل الاختبارات المتأثرة بالتغييرات فقط"""
+        if coverage is None:
+            print("⚠️ حزمة coverage غير مثبتة - سيتم التشغيل الكامل")
+            return self.check_coverage()
+        
+        recorded_commit = self.impact_map.commit
+        if recorded_commit is None or not BASELINE_DATA.exists():
+            print("ℹ️ لا توجد خريطة تأثير للاختبارات - تشغيل كامل مع التسجيل")
+            return self.check_coverage(record=True)
+        
+        changes = self._changes_since(recorded_commit)
+        if changes is None:
+            print("ℹ️ تعذر تحديد التغييرات منذ آخر تسجيل - تشغيل كامل مع التسجيل")
+            return self.check_coverage(record=True)
+        
+        selected = self._select_tests(changes)
+        if selected is None:
+            return self.check_coverage(record=True)
+        
+        print(f"🎯 تشغيل {len(selected)} اختبار متأثر بالتغييرات "
+              f"(الخريطة مسجلة على {recorded_commit[:10]})...")
+        
+        returncode = 0
+        if selected:
+            try:
+                # الحد الأدنى يُطبق على التقرير المدمج وليس على تشغيل جزئي
+                result = self._run_pytest(
+                    ['--cov-fail-under=0', '--cov-context=test', *sorted(selected)],
+                    env=dict(os.environ, COVERAGE_FILE=str(IMPACT_DATA))
+                )
+            except subprocess.TimeoutExpired:
+                print("❌ انتهت مهلة تشغيل الاختبارات (5 دقائق)")
+                return False
+            # 5: لم تُجمع أي اختبارات (اختبارات محذوفة منذ التسجيل)
+            if result.returncode not in (0, 5):
+                print("❌ فشلت بعض الاختبارات المتأثرة")
+                print(result.stdout[-2000:])
+                return False
+        
+        try:
+            self._write_combined_report(changes, IMPACT_DATA if selected else None)
+        except Exception as e:
+            print(f"⚠️ تعذر دمج تقارير التغطية ({e}) - تشغيل كامل مع التسجيل")
+            return self.check_coverage(record=True)
+        
+        return self._evaluate_report(returncode)
+    
+    def _run_pytest(self, args: List[str], env: Optional[Dict[str, str]] = None) -> subprocess.CompletedProcess:
+        return subprocess.run([
+            'python', '-m', 'pytest',
+            '--cov=app',
+            '--cov-report=json',
+            '--cov-report=term-missing',
+            *args
+        ], 
+        cwd=self.project_root,
+        capture_output=True,
+        text=True,
+        env=env,
+        timeout=PYTEST_TIMEOUT  # 5 دقائق timeout
+        )
+    
+    def _evaluate_report(self, returncode: int) -> bool:
+        """مقارنة تقرير coverage.json بالحد الأدنى"""
+        # قراءة تقرير التغطية JSON
+        coverage_data = self._read_coverage_report()
+        
+        if coverage_data:
+            self._print_coverage_summary(coverage_data)
+            
+            total_coverage = coverage_data.get('totals', {}).get('percent_covered', 0)
+            
+            if total_coverage >= self.minimum_coverage:
+                print(f"✅ تغطية الاختبارات مقبولة: {total_coverage:.1f}%")
+                return True
+            else:
+                print(f"❌ تغطية الاختبارات منخفضة: {total_coverage:.1f}% (المطلوب: {self.minimum_coverage}%)")
+                self._print_uncovered_lines(coverage_data)
+                return False
+        else:
+            print("⚠️ تعذر قراءة تقرير التغطية")
+            return returncode == 0
+    
+    def _git(self, *args: str) -> str:
+        return subprocess.run(['git', *args], cwd=self.project_root, capture_output=True,
+                              text=True, check=True).stdout
+    
+    def _record_impact_map(self):
+        """بناء خريطة تأثير الاختبارات من بيانات التشغيل الكامل"""
+        try:
+            commit = self._git('rev-parse', 'HEAD').strip()
+            data = CoverageData(basename=str(BASELINE_DATA))
+            data.read()
+            self.impact_map.record(data, self.project_root, commit)
+            print(f"🗺️ تم تسجيل خريطة تأثير الاختبارات على {commit[:10]}")
+        except Exception as e:
+            print(f"⚠️ تعذر تسجيل خريطة تأثير الاختبارات: {e}")
+    
+    def _changes_since(self, commit: str) -> Optional[List[FileChange]]:
+        """تغييرات الشجرة الحالية (مع غير المتتبعة) منذ الـ commit المسجل"""
+        try:
+            diff = self._git('diff', '--no-color', '--no-ext-diff', '-U0', commit, '--')
+            untracked = self._git('ls-files', '--others', '--exclude-standard').splitlines()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+        
+        changes = parse_diff(diff)
+        changes.extend(FileChange(old_path=None, new_path=path) for path in untracked)
+        return changes
+    
+    def _select_tests(self, changes: List[FileChange]) -> Optional[Set[str]]:
+        """الاختبارات المتأثرة، أو None إذا احتاج التغيير تشغيلاً كاملاً"""
+        selected = set()
+        for change in changes:
+            path = change.new_path or change.old_path
+            if path.startswith(IGNORED_PREFIXES) or (path.endswith('.md') and not path.startswith('app/')):
+                continue
+            if any(trigger in path for trigger in FULL_RUN_TRIGGERS):
+                print(f"ℹ️ {path} يؤثر على كل الاختبارات - تشغيل كامل مع التسجيل")
+                return None
+            
+            if path.startswith('tests/') and path.endswith('.py'):
+                if change.new_path and not Path(path).name.startswith('__'):
+                    selected.add(change.new_path)
+            elif path.startswith('app/') and path.endswith('.py'):
+                if change.old_path:
+                    selected |= self.impact_map.tests_for(change.old_path, change.changed_old_lines())
+            else:
+                print(f"ℹ️ لا يمكن تحديد أثر {path} - تشغيل كامل مع التسجيل")
+                return None
+        
+        # اختبار داخل ملف مختار بالكامل لا يحتاج تحديداً منفصلاً
+        test_files = {nodeid for nodeid in selected if '::' not in nodeid}
+        return {nodeid for nodeid in selected if '::' not in nodeid or nodeid.split('::', 1)[0] not in test_files}
+    
+    def _write_combined_report(self, changes: List[FileChange], impact_file: Optional[Path]):
+        """
+        دمج بيانات التشغيل الكامل مع بيانات الاختبارات المختارة في coverage.json.
+        أسطر الملفات المتغيرة في البيانات الأساسية تُزاح حسب الـ diff، والأسطر
+        داخل التغييرات تؤخذ من التشغيل الجديد فقط.
+        """
+        root = self.project_root.resolve()
+        baseline = CoverageData(basename=str(BASELINE_DATA))
+        baseline.read()
+        
+        if COMBINED_DATA.exists():
+            COMBINED_DATA.unlink()
+        combined = CoverageData(basename=str(COMBINED_DATA))
+        combined.update(baseline)
+        
+        touched = [change for change in changes if change.old_path and change.old_path.startswith('app/')]
+        combined.purge_files([str(root / change.old_path) for change in touched])
+        
+        for change in touched:
+            if not change.new_path:
+                continue
+            old_file = str(root / change.old_path)
+            new_file = str(root / change.new_path)
+            if baseline.has_arcs():
+                arcs = []
+                for start, end in baseline.arcs(old_file) or []:
+                    # الأرقام السالبة تمثل دخول/خروج الكود الذي يبدأ في ذلك السطر
+                    new_start = self._remap_arc_end(change, start)
+                    new_end = self._remap_arc_end(change, end)
+                    if new_start is not None and new_end is not None:
+                        arcs.append((new_start, new_end))
+                combined.add_arcs({new_file: arcs})
+            else:
+                lines = [change.remap_line(line) for line in baseline.lines(old_file) or []]
+                combined.add_lines({new_file: [line for line in lines if line is not None]})
+        
+        if impact_file is not None:
+            impact = CoverageData(basename=str(impact_file))
+            impact.read()
+            combined.update(impact)
+        combined.write()
+        
+        # purge_files يمسح أسطر الملف فقط ويبقيه في البيانات: الملفات المحذوفة تُستثنى
+        # من التقرير وإلا فشل لغياب مصدرها
+        deleted = [str(root / change.old_path) for change in touched if not change.new_path]
+        report = coverage.Coverage(data_file=str(COMBINED_DATA), source=[str(root / 'app')], omit=deleted)
+        report.load()
+        report.json_report(outfile=str(self.project_root / 'coverage.json'))
+    
+    @staticmethod
+    def _remap_arc_end(change: FileChange, line: int) -> Optional[int]:
+        remapped = change.remap_line(abs(line))
+        if remapped is None:
+            return None
+        return -remapped if line < 0 else remapped
     
     def _read_coverage_report(self) -> dict:
         """قراءة تقرير التغطية من ملف JSON"""
@@ -198,7 +747,6 @@ class CoverageChecker:
                 issues.append(f"اختبار وهمي محتمل: {pattern}")
         
         # فحص عدد الـ assertions
-        import re
         assert_count = len(re.findall(r'\bassert\s+', content))
         test_function_count = len(re.findall(r'def\s+test_\w+', content))
         
@@ -213,12 +761,30 @@ class CoverageChecker:
         return issues
 
 
-def main():
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='فحص تغطية الاختبارات')
+    parser.add_argument('--impact', action='store_true',
+                        help='تشغيل الاختبارات المتأثرة بالتغييرات فقط مع دمج التغطية (التشغيل الكامل عند الحاجة)')
+    parser.add_argument('--record', action='store_true',
+                        help='تشغيل كامل مع تسجيل خريطة تأثير الاختبارات')
+    parser.add_argument('--shards', type=int, default=1,
+                        help='عدد العمليات للتشغيل الكامل (افتراضي: 1، و 0 لعدد المعالجات)')
+    args = parser.parse_args(argv)
+    if args.shards == 0:
+        args.shards = os.cpu_count() or 1
+    return args
+
+
+def main(argv: List[str] = None):
     """النقطة الرئيسية للـ hook"""
-    checker = CoverageChecker()
+    args = parse_args(argv)
+    checker = CoverageChecker(shards=args.shards)
     
     # فحص تغطية الاختبارات
-    coverage_passed = checker.check_coverage()
+    if args.impact:
+        coverage_passed = checker.check_coverage_impact()
+    else:
+        coverage_passed = checker.check_coverage(record=args.record)
     
     # فحص جودة الاختبارات
     quality_passed = checker.check_test_quality()
@@ -233,5 +799,4 @@ def main():
 
 
 if __name__ == "__main__":
-    import re
     sys.exit(main())
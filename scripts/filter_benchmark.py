@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Content Filter Benchmark
+قياس أداء فلاتر المحتوى و CodeGovernor على نصوص مولدة بأحجام مختلفة
+
+يولد نصوصاً عربية وإنجليزية ومختلطة ونصوصاً عدائية (adversarial) من 100 بايت
+حتى 1 ميجابايت، ويقيس لكل فلتر: الإنتاجية (MB/s)، زمن p99، وذروة الذاكرة
+المحجوزة، ثم يقارن النتائج بملف أساس مخزن لاكتشاف التراجع في الأداء.
+
+الاستخدام:
+    python scripts/filter_benchmark.py
+    python scripts/filter_benchmark.py --filters profanity,bias --sizes 100,10000
+    python scripts/filter_benchmark.py --update-baseline
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+
+# إضافة مسار المشروع للـ Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.ai_governance.filters import ProfanityFilter, BiasDetectionFilter, FactCheckFilter
+from app.ai_governance.code_governor import CodeGovernor
+
+
+BENCHMARK_SIZES = [100, 1_000, 10_000, 100_000, 1_000_000]
+CORPUS_KINDS = ['arabic', 'english', 'mixed', 'adversarial']
+DEFAULT_BASELINE = Path(__file__).parent.parent / 'governance' / 'filter_benchmark_baseline.json'
+
+ARABIC_WORDS = [
+    'الحكومة', 'المواطن', 'الخدمة', 'الطلب', 'النظام', 'البيانات', 'التقرير', 'المحافظة',
+    'الانتخابات', 'المجلس', 'القانون', 'التعليم', 'الصحة', 'الطريق', 'المشروع', 'الميزانية',
+    'في', 'من', 'على', 'إلى', 'هذا', 'التي', 'مع', 'عن', 'كان', 'بعد', 'يجب', 'تم',
+    'كلب', 'حمار', 'الرجال', 'النساء', 'أثبتت الدراسات', 'علاج نهائي',
+]
+
+ENGLISH_WORDS = [
+    'the', 'service', 'request', 'citizen', 'report', 'system', 'data', 'council', 'budget',
+    'of', 'and', 'to', 'in', 'is', 'for', 'with', 'on', 'that', 'this', 'was', 'by',
+    'damn', 'hell', 'stupid', 'women', 'men', 'always', 'never', 'all',
+]
+
+CODE_SNIPPETS = [
+    '```python\ndef add(a, b):\n    """Add two numbers"""\n    return a + b\n```\n',
+    '```python\ndef test_add():\n    assert add(1, 2) == 3\n```\n',
+    '```python\nimport os\nos.system(user_input)\n```\n',
+    '```python\nclass TestService(TestCase):\n    def test_ok(self):\n        self.assertTrue(True)\n```\n',
+    'استخدم الدالة `calculate(x)` ثم `return x` في النهاية.\n',
+]
+
+# نصوص تستهدف أسوأ حالات المطابقة: بادئات متكررة بدون نهاية مطابقة،
+# أسطر طويلة بلا مسافات، تشكيل كثيف، وأسوار كود غير مغلقة
+ADVERSARIAL_UNITS = [
+    'أثبتت الدراسات ',
+    'العلماء يؤكدون ',
+    'كل الأطباء ',
+    'حمارحمارحمار',
+    'ا' + 'َّ' * 20 + ' ',
+    'a' * 200,
+    '```python\n',
+    '`x(` ',
+    '"""' + ' ' * 50,
+    'def test_' + 'x' * 100 + ' ',
+]
+
+
+def generate_text(kind: str, size: int, seed: int = 0) -> str:
+    """توليد نص بحجم size بايت (UTF-8) تقريباً من النوع المطلوب"""
+    rng = random.Random(f"{kind}:{size}:{seed}")
+    parts = []
+    length = 0
+
+    while length < size:
+        if kind == 'arabic':
+            part = ' '.join(rng.choice(ARABIC_WORDS) for _ in range(12)) + '.\n'
+        elif kind == 'english':
+            part = ' '.join(rng.choice(ENGLISH_WORDS) for _ in range(12)) + '.\n'
+        elif kind == 'mixed':
+            words = [rng.choice(ARABIC_WORDS if rng.random() < 0.5 else ENGLISH_WORDS) for _ in range(12)]
+            part = ' '.join(words) + '.\n'
+            if rng.random() < 0.2:
+                part += rng.choice(CODE_SNIPPETS)
+        elif kind == 'adversarial':
+            part = rng.choice(ADVERSARIAL_UNITS)
+        else:
+            raise ValueError(f"نوع نص غير معروف: {kind}")
+
+        parts.append(part)
+        length += len(part.encode('utf-8'))
+
+    data = ''.join(parts).encode('utf-8')[:size]
+    return data.decode('utf-8', errors='ignore')
+
+
+def build_targets() -> Dict[str, Callable[[str], object]]:
+    """الدوال المراد قياسها"""
+    governor = CodeGovernor()
+    return {
+        'profanity': ProfanityFilter().filter_response,
+        'bias': BiasDetectionFilter().filter_response,
+        'factcheck': FactCheckFilter().filter_response,
+        # بدون كاش النتائج حتى يقاس التحليل نفسه وليس إعادة استخدام النتيجة
+        'code_governor': lambda text: governor.analyze_ai_response(text, use_cache=False),
+    }
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """حساب النسبة المئوية pct من قائمة قيم"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def measure(func: Callable[[str], object], text: str, min_runs: int, time_budget: float) -> Dict[str, float]:
+    """قياس الإنتاجية وزمن p99 وذروة الذاكرة لدالة واحدة على نص واحد"""
+    size = len(text.encode('utf-8'))
+
+    # تشغيل تمهيدي خارج القياس (تجميع التعابير النمطية، الكاش الداخلي لـ re)
+    func(text)
+
+    latencies = []
+    started = time.perf_counter()
+    while len(latencies) < min_runs or time.perf_counter() - started < time_budget:
+        call_started = time.perf_counter()
+        func(text)
+        latencies.append(time.perf_counter() - call_started)
+        if len(latencies) >= 10_000:
+            break
+    total = sum(latencies)
+
+    # قياس الذاكرة في تشغيل منفصل لأن tracemalloc يبطئ التنفيذ
+    tracemalloc.start()
+    func(text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'bytes': size,
+        'runs': len(latencies),
+        'mb_per_s': round((size * len(latencies)) / (1024 * 1024) / total, 3) if total else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 4),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 4),
+        'peak_alloc_kb': round(peak / 1024, 1),
+    }
+
+
+def run_benchmark(filters: List[str], kinds: List[str], sizes: List[int],
+                  min_runs: int, time_budget: float) -> Dict[str, Dict[str, float]]:
+    """تشغيل جميع التركيبات وإرجاع النتائج بمفتاح filter/kind/size"""
+    targets = build_targets()
+    results = {}
+
+    for kind in kinds:
+        for size in sizes:
+            text = generate_text(kind, size)
+            for name in filters:
+                key = f"{name}/{kind}/{size}"
+                results[key] = measure(targets[name], text, min_runs, time_budget)
+                stats = results[key]
+                print(f"  {key:<36} {stats['mb_per_s']:>10.3f} MB/s  "
+                      f"p99 {stats['p99_ms']:>10.3f} ms  peak {stats['peak_alloc_kb']:>10.1f} KB")
+
+    return results
+
+
+def compare_with_baseline(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+                          tolerance: float) -> List[str]:
+    """مقارنة النتائج بالأساس وإرجاع قائمة التراجعات"""
+    regressions = []
+
+    for key, stats in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+
+        if base['mb_per_s'] and stats['mb_per_s'] < base['mb_per_s'] * (1 - tolerance):
+            regressions.append(
+                f"{key}: الإنتاجية {stats['mb_per_s']} MB/s مقابل {base['mb_per_s']} MB/s في الأساس"
+            )
+        if base['p99_ms'] and stats['p99_ms'] > base['p99_ms'] * (1 + tolerance):
+            regressions.append(
+                f"{key}: زمن p99 {stats['p99_ms']} ms مقابل {base['p99_ms']} ms في الأساس"
+            )
+        if base['peak_alloc_kb'] and stats['peak_alloc_kb'] > base['peak_alloc_kb'] * (1 + tolerance):
+            regressions.append(
+                f"{key}: ذروة الذاكرة {stats['peak_alloc_kb']} KB مقابل {base['peak_alloc_kb']} KB في الأساس"
+            )
+
+    return regressions
+
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    targets = ['profanity', 'bias', 'factcheck', 'code_governor']
+    parser = argparse.ArgumentParser(description='قياس أداء فلاتر المحتوى')
+    parser.add_argument('--filters', default=','.join(targets),
+                        help=f"الفلاتر المراد قياسها ({', '.join(targets)})")
+    parser.add_argument('--kinds', default=','.join(CORPUS_KINDS),
+                        help=f"أنواع النصوص ({', '.join(CORPUS_KINDS)})")
+    parser.add_argument('--sizes', default=','.join(str(s) for s in BENCHMARK_SIZES),
+                        help='أحجام النصوص بالبايت')
+    parser.add_argument('--min-runs', type=int, default=5, help='أقل عدد تشغيلات لكل قياس')
+    parser.add_argument('--time-budget', type=float, default=0.5,
+                        help='الزمن الأدنى بالثواني لكل قياس')
+    parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help='ملف الأساس للمقارنة')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='نسبة التراجع المسموحة قبل الفشل (افتراضي: 0.25)')
+    parser.add_argument('--update-baseline', action='store_true', help='حفظ النتائج كأساس جديد')
+    parser.add_argument('--output', default=None, help='حفظ النتائج في ملف JSON')
+
+    args = parser.parse_args(argv)
+    args.filters = [name for name in args.filters.split(',') if name]
+    args.kinds = [kind for kind in args.kinds.split(',') if kind]
+    args.sizes = [int(size) for size in args.sizes.split(',') if size]
+
+    unknown = set(args.filters) - set(targets)
+    if unknown:
+        parser.error(f"فلاتر غير معروفة: {', '.join(sorted(unknown))}")
+    unknown = set(args.kinds) - set(CORPUS_KINDS)
+    if unknown:
+        parser.error(f"أنواع نصوص غير معروفة: {', '.join(sorted(unknown))}")
+
+    return args
+
+
+def main(argv: List[str] = None):
+    """النقطة الرئيسية لقياس الأداء"""
+    args = parse_args(argv)
+
+    print("⏱️ قياس أداء فلاتر المحتوى...")
+    print(f"   Python {platform.python_version()} على {platform.machine()}")
+    results = run_benchmark(args.filters, args.kinds, args.sizes, args.min_runs, args.time_budget)
+
+    report = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+
+    baseline_path = Path(args.baseline)
+    if args.update_baseline:
+        baseline_path.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f"\n✅ تم تحديث ملف الأساس: {baseline_path}")
+        return 0
+
+    if not baseline_path.exists():
+        print(f"\n⚠️ لا يوجد ملف أساس ({baseline_path}) - استخدم --update-baseline لإنشائه")
+        return 0
+
+    baseline = json.loads(baseline_path.read_text(encoding='utf-8'))
+    regressions = compare_with_baseline(results, baseline.get('results', {}), args.tolerance)
+
+    if regressions:
+        print(f"\n❌ تراجع في الأداء ({len(regressions)}):")
+        for regression in regressions:
+            print(f"  - {regression}")
+        return 1
+
+    print("\n✅ لا يوجد تراجع في الأداء مقارنة بالأساس")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,15 @@
+"""
+Shared pytest configuration
+
+Tests run against config.settings_test (SQLite in memory, local-memory cache)
+unless DJANGO_SETTINGS_MODULE or pytest-django's --ds selects other settings
+"""
+
+import os
+
+import django
+
+
+def pytest_configure():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings_test')
+    django.setup()
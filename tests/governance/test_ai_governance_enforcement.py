@@ -9,9 +9,9 @@ from app.ai_governance.code_governor import (
     CodeGovernor, 
     AIPromptEnforcer,
     CodeQualityLevel,
-    TestQualityLevel,
-    AIGovernanceAnalysis
+    TestQualityLevel
 )
+from app.ai_governance.prompts import estimate_tokens
 
 
 class TestCodeGovernorEnforcement:
@@ -111,6 +111,129 @@ api_key = "sk-1234567890abcdef"  # مفتاح API مكشوف
         assert any("أمني" in violation or "security" in violation.lower() 
                   for violation in analysis.violations)
     
+    @pytest.mark.governance
+    def test_analysis_parses_each_block_once(self):
+        """يجب استخراج الكتل وتحليل كل كتلة مرة واحدة فقط"""
+        response = """
+```python
+def add(a, b):
+    return a + b
+```
+
+```python
+def test_add():
+    assert add(1, 2) == 3
+    assert add(0, 0) == 0
+```
+"""
+        context = self.governor.build_context(response)
+        assert len(context.code_blocks) == 2
+        assert context.test_blocks[0] is context.code_blocks[1]
+        
+        with patch('app.ai_governance.code_governor.ast.parse', wraps=__import__('ast').parse) as mock_parse:
+            analysis = self.governor.analyze_ai_response(response)
+        
+        assert mock_parse.call_count == 2
+        assert analysis.has_tests
+
+    @pytest.mark.governance
+    def test_ast_rules_ignore_strings_and_comments(self):
+        """يجب ألا تُحتسب الأنماط الخطيرة داخل النصوص والتعليقات"""
+        safe_response = '''
+```python
+def describe():
+    """لا تستخدم eval( أو shell=True"""
+    # exec( غير مسموح
+    return "password = 'x'"
+```
+'''
+        unsafe_response = '''
+```python
+def run(expression):
+    return eval(expression)
+```
+'''
+        safe_analysis = self.governor.analyze_ai_response(safe_response)
+        unsafe_analysis = self.governor.analyze_ai_response(unsafe_response)
+
+        assert not any('eval' in v or 'exec' in v or 'shell' in v or 'password' in v
+                       for v in safe_analysis.violations)
+        assert any('eval' in v for v in unsafe_analysis.violations)
+
+    @pytest.mark.governance
+    def test_rules_reload_only_when_file_changes(self, tmp_path):
+        """يجب مشاركة القواعد المجمّعة وإعادة تحميلها فقط عند تغير ملف الحوكمة"""
+        import os
+        from app.ai_governance.governance_rules import get_governance_rules
+
+        rules_file = tmp_path / 'rules.yaml'
+        rules_file.write_text('code_governor:\n  forbidden_patterns:\n    bad_practices: ["# hack"]\n', encoding='utf-8')
+
+        first = get_governance_rules(rules_file)
+        assert CodeGovernor(rules_file).compiled_rules is first
+
+        stat = rules_file.stat()
+        os.utime(rules_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert get_governance_rules(rules_file) is first
+
+        rules_file.write_text('code_governor:\n  forbidden_patterns:\n    bad_practices: ["# quick fix"]\n', encoding='utf-8')
+        os.utime(rules_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10**9))
+        second = get_governance_rules(rules_file)
+
+        assert second is not first
+        assert second.forbidden_patterns == {'bad_practices': ['# quick fix']}
+
+    @pytest.mark.governance
+    def test_analyze_many_preserves_order(self):
+        """يجب أن يعيد analyze_many نفس نتائج التحليل الفردي وبنفس الترتيب"""
+        responses = [
+            "```python\ndef add(a, b):\n    return a + b\n```",
+            "```python\ndef test_add():\n    assert True\n```",
+            "```python\ndef run(x):\n    return eval(x)\n```",
+        ]
+        expected = [self.governor.analyze_ai_response(response) for response in responses]
+
+        assert self.governor.analyze_many(responses, workers=1) == expected
+        assert self.governor.analyze_many(iter(responses), workers=2, chunk_size=1) == expected
+
+    @pytest.mark.governance
+    def test_repeat_validation_uses_cached_analysis(self):
+        """يجب ألا يُعاد تحليل نفس الاستجابة عند التحقق منها مرة أخرى"""
+        from app.ai_governance.utils.analysis_cache import AnalysisCache
+
+        governor = CodeGovernor(analysis_cache=AnalysisCache(max_entries=8))
+        response = "```python\ndef divide(a, b):\n    return a / b\n```"
+
+        first = governor.validate_and_improve_response(response)
+        with patch('app.ai_governance.code_governor.ast.parse') as mock_parse:
+            second = governor.validate_and_improve_response(response)
+
+        assert second == first
+        assert mock_parse.call_count == 0
+        assert governor.analysis_cache.stats()['hits'] == 1
+
+    @pytest.mark.governance
+    def test_streaming_governor_aborts_on_first_unsafe_block(self):
+        """يجب أن يحلل الحاكم المتدفق كل كتلة عند إغلاقها ويوقف التوليد عند انتهاك حرج"""
+        from app.ai_governance.code_governor import StreamingCodeGovernor
+
+        response = (
+            "الحل:\n```python\ndef run(expression):\n    return eval(expression)\n```\n"
+            "والاختبار:\n```python\ndef test_run():\n    assert run('1 + 1') == 2\n```\n"
+        )
+        streaming = StreamingCodeGovernor(self.governor)
+
+        closed = []
+        for start in range(0, len(response), 7):
+            closed.extend(streaming.feed(response[start:start + 7]))
+            if streaming.should_abort:
+                break
+
+        assert len(closed) == 1
+        assert closed[0].abort
+        assert any('eval' in v for v in closed[0].violations)
+        assert not streaming.finalize().is_approved
+
     @pytest.mark.governance
     def test_prompt_enforcer_adds_governance_rules(self):
         """يجب أن يضيف AIPromptEnforcer قواعد الحوكمة للـ prompts"""
@@ -126,7 +249,23 @@ api_key = "sk-1234567890abcdef"  # مفتاح API مكشوف
         assert "assert" in governed_prompt
         assert "pytest" in governed_prompt or "unittest" in governed_prompt
         assert len(governed_prompt) > len(original_prompt)
-    
+
+    @pytest.mark.governance
+    def test_prompt_templates_are_precomputed_per_project_type(self):
+        """يجب أن تُبنى قوالب الـ prompt مرة واحدة لكل نوع مشروع مع عدد tokens محسوب مسبقاً"""
+        django_context = {"project_type": "django"}
+        template = self.enforcer.get_template(django_context)
+
+        assert self.enforcer.get_template(dict(django_context)) is template
+        assert self.enforcer.get_template({}).prefix == template.prefix
+        assert self.enforcer.get_template({"project_type": "fastapi"}).version != template.version
+
+        prompt = "اكتب دالة لحساب المجموع"
+        governed_prompt = self.enforcer.enforce_coding_standards(prompt, context=django_context)
+        assert governed_prompt == template.prefix + prompt + template.suffix
+        assert self.governor.generate_governance_prompt(prompt) == template.prefix + prompt
+        assert self.enforcer.estimate_prompt_tokens(prompt, django_context) == estimate_tokens(governed_prompt)
+
     @pytest.mark.governance
     def test_calculates_coverage_estimate(self):
         """يجب أن يحسب تقدير التغطية بشكل صحيح"""
@@ -0,0 +1,157 @@
+"""
+اختبارات hook حوكمة الذكاء الاصطناعي (scripts/ai_governance_hook.py)
+تتحقق من الذاكرة المؤقتة للنتائج واختيار التعريفات التي تمسها التغييرات
+"""
+
+import ast
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'scripts'))
+
+import ai_governance_hook  # noqa: E402
+from ai_governance_hook import (  # noqa: E402
+    AIGovernanceHook, VerdictCache, git_blob_sha, select_changed_source, staged_changed_lines
+)
+from app.ai_governance.code_governor import ANALYSIS_VERSION  # noqa: E402
+
+
+SOURCE = '''import os
+
+LIMIT = 10
+
+
+@staticmethod
+@property
+def decorated():
+    return LIMIT
+
+
+class Service:
+    def run(self):
+        return os.getcwd()
+'''
+
+
+class TestVerdictCache:
+    """اختبارات الذاكرة المؤقتة لنتائج الملفات"""
+
+    @pytest.mark.governance
+    def test_hits_and_misses(self, tmp_path):
+        """النتيجة المحفوظة تُقرأ بنفس الـ SHA وأي SHA آخر أو ملف تالف يُحسب إخفاقاً"""
+        cache = VerdictCache(tmp_path, 'v1')
+        verdict = {'passed': False, 'errors': ['الكود يحتاج إلى اختبارات'], 'warnings': []}
+        sha = git_blob_sha(b'x = 1\n')
+
+        assert cache.get(sha) is None
+        cache.set(sha, verdict)
+        assert cache.get(sha) == verdict
+        assert cache.get(git_blob_sha(b'x = 2\n')) is None
+
+        (tmp_path / 'v1' / sha[:2] / f'{sha}.json').write_text('{truncated', encoding='utf-8')
+        assert cache.get(sha) is None
+        assert (cache.hits, cache.misses) == (1, 3)
+
+    @pytest.mark.governance
+    def test_versions_use_separate_directories(self, tmp_path):
+        """نتيجة محفوظة بإصدار قواعد لا تُقرأ بإصدار آخر"""
+        sha = git_blob_sha(b'x = 1\n')
+        VerdictCache(tmp_path, 'v1').set(sha, {'passed': True, 'errors': [], 'warnings': []})
+
+        assert VerdictCache(tmp_path, 'v2').get(sha) is None
+        assert VerdictCache(tmp_path, 'v1').get(sha) is not None
+
+    @pytest.mark.governance
+    def test_hook_cache_is_keyed_by_rules_version(self, tmp_path):
+        """مجلد الذاكرة يتضمن إصدار التحليل وإصدار القواعد المُجمعة وإصدار الـ hook"""
+        hook = AIGovernanceHook(cache_dir=tmp_path)
+
+        assert hook.cache.directory == tmp_path / (
+            f"{ANALYSIS_VERSION}-{hook.governor.compiled_rules.version}-{ai_governance_hook.HOOK_CACHE_VERSION}"
+        )
+        assert AIGovernanceHook(use_cache=False, cache_dir=tmp_path).cache is None
+
+    @pytest.mark.governance
+    def test_unchanged_files_are_not_analyzed_again(self, tmp_path):
+        """الفحص الثاني لنفس المحتوى يأخذ النتيجة من الذاكرة دون تحليل"""
+        file_path = tmp_path / 'module.py'
+        file_path.write_text(SOURCE, encoding='utf-8')
+
+        first = AIGovernanceHook(cache_dir=tmp_path / 'cache', workers=1)
+        first_result = first.check_files([str(file_path)])
+
+        second = AIGovernanceHook(cache_dir=tmp_path / 'cache', workers=1)
+        with patch.object(second.governor, 'iter_analyze_many') as analyze:
+            second_result = second.check_files([str(file_path)])
+
+        analyze.assert_not_called()
+        assert second_result == first_result
+        assert (second.errors, second.warnings) == (first.errors, first.warnings)
+        assert (second.cache.hits, second.cache.misses) == (1, 0)
+
+
+class TestChangedHunks:
+    """اختبارات تحديد الأسطر والتعريفات المتغيرة في الـ index"""
+
+    @pytest.mark.governance
+    def test_staged_changed_lines(self):
+        """الإضافات والتعديلات تعطي أسطرها والحذف يعطي موضعه"""
+        diff = (
+            "diff --git a/app/x.py b/app/x.py\n"
+            "--- a/app/x.py\n"
+            "+++ b/app/x.py\n"
+            "@@ -3,0 +4,2 @@ def a():\n"
+            "+    b = 1\n"
+            "+    c = 2\n"
+            "@@ -10 +12 @@ class B:\n"
+            "-    x = 1\n"
+            "+    x = 2\n"
+            "@@ -20,2 +21,0 @@ def c():\n"
+            "-    y = 1\n"
+            "-    z = 2\n"
+            "@@ -1 +0,0 @@\n"
+            "-import os\n"
+        )
+        result = subprocess.CompletedProcess([], 0, stdout=diff)
+        with patch.object(ai_governance_hook.subprocess, 'run', return_value=result):
+            assert staged_changed_lines('app/x.py') == {1, 4, 5, 12, 21}
+
+        error = subprocess.CalledProcessError(128, ['git'])
+        with patch.object(ai_governance_hook.subprocess, 'run', side_effect=error):
+            assert staged_changed_lines('app/x.py') is None
+
+    @pytest.mark.governance
+    def test_select_changed_source(self):
+        """تُختار جمل المستوى الأعلى التي تمسها الأسطر مع الـ decorators"""
+        tree = ast.parse(SOURCE)
+
+        # سطر الـ decorator يختار الدالة كاملة
+        assert select_changed_source(tree, SOURCE, {6}) == (
+            "@staticmethod\n@property\ndef decorated():\n    return LIMIT"
+        )
+        # سطر داخل الكلاس والثابت في أعلى الملف
+        assert select_changed_source(tree, SOURCE, {3, 14}) == (
+            "LIMIT = 10\n\nclass Service:\n    def run(self):\n        return os.getcwd()"
+        )
+        # الأسطر الفارغة بين التعريفات لا تختار شيئاً
+        assert select_changed_source(tree, SOURCE, {4, 11}) == ''
+
+    @pytest.mark.governance
+    def test_only_changed_definitions_are_analyzed(self, tmp_path):
+        """مع --changed-hunks يُحلل مصدر التعريفات المتغيرة فقط"""
+        file_path = tmp_path / 'module.py'
+        file_path.write_text(SOURCE, encoding='utf-8')
+        hook = AIGovernanceHook(use_cache=False, changed_hunks=True)
+
+        with patch.object(ai_governance_hook, 'staged_changed_lines', return_value={14}):
+            verdict, text = hook._cached_or_pending(str(file_path), SOURCE)
+        assert verdict is None
+        assert text == "class Service:\n    def run(self):\n        return os.getcwd()"
+
+        with patch.object(ai_governance_hook, 'staged_changed_lines', return_value={4}):
+            verdict, text = hook._cached_or_pending(str(file_path), SOURCE)
+        assert verdict == {'passed': True, 'errors': [], 'warnings': []}
@@ -0,0 +1,140 @@
+"""
+اختبارات الذاكرة المؤقتة لفحص نسبة الكود إلى الاختبارات (scripts/code_test_ratio_check.py)
+تتحقق من أن النتائج من الذاكرة مطابقة للتحليل الكامل وأنها تُبطل عند تغير الملفات
+"""
+
+import json
+import os
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'scripts'))
+
+import code_test_ratio_check  # noqa: E402
+from code_test_ratio_check import CodeTestRatioChecker, FileSummaryCache  # noqa: E402
+
+
+CODE = '''
+def calculate_total(items):
+    """مجموع الأسعار"""
+    total = 0
+    for item in items:
+        if item.price > 0:
+            total += item.price
+    return total
+
+
+class Invoice:
+    def render(self):
+        return "invoice"
+'''
+
+TESTS = '''
+from app.billing import calculate_total
+
+
+def test_calculate_total():
+    """اختبار المجموع"""
+    assert calculate_total([]) == 0
+'''
+
+
+def make_project(root: Path):
+    (root / 'app').mkdir()
+    (root / 'tests').mkdir()
+    (root / 'app' / 'billing.py').write_text(CODE, encoding='utf-8')
+    (root / 'app' / 'shipping.py').write_text('def ship(order):\n    return order\n', encoding='utf-8')
+    (root / 'tests' / 'test_billing.py').write_text(TESTS, encoding='utf-8')
+
+
+def run_checker(root: Path, cache_path=None):
+    """تشغيل الفحص على مشروع مؤقت: (النتيجة، الملفات والملاحظات، عدد الملفات المحللة)"""
+    checker = CodeTestRatioChecker(use_cache=cache_path is not None, cache_path=cache_path, workers=1)
+    checker.project_root = root
+    checker.app_dir = root / 'app'
+    checker.tests_dir = root / 'tests'
+    passed = checker.check_ratio()
+    outcome = (
+        passed,
+        sorted((str(f.path), f.functions, f.classes, f.complexity_score) for f in checker.code_files),
+        sorted((str(f.path), f.test_functions, sorted(f.tested_targets), f.quality_score)
+               for f in checker.test_files),
+        checker._check_test_coverage(),
+        checker._check_test_quality(),
+    )
+    return outcome, checker.analyzed_files
+
+
+def bump_mtime(path: Path):
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+class TestFileSummaryCache:
+    """اختبارات FileSummaryCache داخل CodeTestRatioChecker"""
+
+    @pytest.mark.governance
+    def test_cached_results_match_uncached_run(self, tmp_path):
+        """التشغيل من الذاكرة يعطي نفس النتائج والملاحظات دون إعادة تحليل"""
+        make_project(tmp_path)
+        cache_path = tmp_path / 'cache.json'
+
+        uncached, _ = run_checker(tmp_path)
+        first, first_analyzed = run_checker(tmp_path, cache_path)
+        with patch.object(code_test_ratio_check, 'summarize_file') as summarize:
+            second, second_analyzed = run_checker(tmp_path, cache_path)
+
+        summarize.assert_not_called()
+        assert first == uncached
+        assert second == uncached
+        assert (first_analyzed, second_analyzed) == (3, 0)
+
+    @pytest.mark.governance
+    def test_changed_files_are_summarized_again(self, tmp_path):
+        """تغير المحتوى يعيد التحليل، وتغير mtime وحده يعيد استخدام الملخص بعد مقارنة الـ hash"""
+        make_project(tmp_path)
+        cache_path = tmp_path / 'cache.json'
+        run_checker(tmp_path, cache_path)
+
+        # mtime فقط: نفس المحتوى فلا تحليل، ويُحدّث mtime المحفوظ
+        billing = tmp_path / 'app' / 'billing.py'
+        bump_mtime(billing)
+        outcome, analyzed = run_checker(tmp_path, cache_path)
+        assert analyzed == 0
+        assert outcome == run_checker(tmp_path)[0]
+        entry = json.loads(cache_path.read_text())['entries']['code:app/billing.py']
+        assert entry['mtime_ns'] == billing.stat().st_mtime_ns
+
+        # محتوى جديد: تحليل الملف المتغير فقط والنتيجة مطابقة للتشغيل بدون ذاكرة
+        (tmp_path / 'app' / 'shipping.py').write_text(
+            'def ship(order):\n    return order\n\n\ndef track(order):\n    return order.id\n', encoding='utf-8'
+        )
+        bump_mtime(tmp_path / 'app' / 'shipping.py')
+        outcome, analyzed = run_checker(tmp_path, cache_path)
+        assert analyzed == 1
+        assert outcome == run_checker(tmp_path)[0]
+        assert any('track' in issue for issue in outcome[3])
+
+    @pytest.mark.governance
+    def test_deleted_files_and_old_versions_are_dropped(self, tmp_path):
+        """مدخلات الملفات المحذوفة تُحذف عند الحفظ، والذاكرة بإصدار قديم تُتجاهل"""
+        make_project(tmp_path)
+        cache_path = tmp_path / 'cache.json'
+        run_checker(tmp_path, cache_path)
+
+        (tmp_path / 'app' / 'shipping.py').unlink()
+        outcome, analyzed = run_checker(tmp_path, cache_path)
+        assert analyzed == 0
+        assert outcome == run_checker(tmp_path)[0]
+        assert sorted(json.loads(cache_path.read_text())['entries']) == [
+            'code:app/billing.py', 'test:tests/test_billing.py'
+        ]
+
+        document = json.loads(cache_path.read_text())
+        document['version'] = 'old'
+        cache_path.write_text(json.dumps(document))
+        assert FileSummaryCache(cache_path).entries == {}
+        assert run_checker(tmp_path, cache_path)[1] == 2
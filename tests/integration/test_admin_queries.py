@@ -0,0 +1,345 @@
+"""
+Query count and permission cache tests for the admin service
+
+The admin list endpoints serialize nested roles, permissions and governorates;
+these tests make sure the number of queries does not grow with the number of rows,
+that cached permission sets and system settings follow database changes, and
+that the public settings endpoint is served from a pre-rendered payload
+"""
+
+import json
+
+import pytest
+from django.contrib.auth.models import Permission
+from django.db import connection
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.admin.models import AdminRole, AdminUser, Governorate, SystemSettings
+from apps.admin.permission_cache import VERSION_CACHE_KEY
+from apps.admin.serializers import SystemSettingsSerializer
+from apps.admin.settings_registry import SystemSettingsRegistry, get_setting, system_settings_registry
+from apps.admin.views import AdminRoleViewSet, AdminUserViewSet, SystemSettingsViewSet
+
+
+@pytest.mark.integration
+class TestAdminListQueryCount(TestCase):
+    """AdminUserViewSet / AdminRoleViewSet list queries must not be N+1"""
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.requester = AdminUser.objects.create_user(username='requester', password='testpass123')
+        self.governorate = Governorate.objects.create(
+            name='القاهرة', name_en='Cairo', code='CAI', region='cairo', capital='القاهرة'
+        )
+        permissions = list(Permission.objects.all()[:6])
+        self.roles = []
+        for index, role_type in enumerate(['content_moderator', 'complaint_manager', 'user_manager']):
+            role = AdminRole.objects.create(name=f'role {index}', name_en=f'role {index}', role_type=role_type)
+            role.permissions.set(permissions[index * 2:index * 2 + 2])
+            self.roles.append(role)
+
+    def _create_users(self, count):
+        start = AdminUser.objects.count()
+        for index in range(start, start + count):
+            user = AdminUser.objects.create_user(
+                username=f'admin{index}',
+                governorate=self.governorate,
+                is_active=index % 3 != 0
+            )
+            user.admin_roles.set(self.roles[:1 + index % 3])
+
+    def _list(self, viewset):
+        request = self.factory.get('/')
+        force_authenticate(request, user=self.requester)
+        with CaptureQueriesContext(connection) as queries:
+            response = viewset.as_view({'get': 'list'})(request)
+            response.render()
+        self.assertEqual(response.status_code, 200)
+        data = response.data
+        return len(queries.captured_queries), data.get('results', data) if isinstance(data, dict) else data
+
+    def test_admin_user_list_query_count_is_constant(self):
+        """Listing more users with more roles does not add queries"""
+        self._create_users(3)
+        few_queries, _ = self._list(AdminUserViewSet)
+
+        self._create_users(12)
+        many_queries, users = self._list(AdminUserViewSet)
+
+        self.assertEqual(few_queries, many_queries)
+        self.assertLessEqual(many_queries, 5)
+        self.assertTrue(any(user['admin_roles'] for user in users))
+
+    def test_admin_role_list_query_count_is_constant(self):
+        """Role user counts are annotated instead of counted per role"""
+        self._create_users(3)
+        few_queries, _ = self._list(AdminRoleViewSet)
+
+        self._create_users(12)
+        many_queries, _ = self._list(AdminRoleViewSet)
+
+        self.assertEqual(few_queries, many_queries)
+
+    def test_annotated_users_count_matches_per_role_count(self):
+        """The annotated count agrees with the per-role query, also when prefetched through users"""
+        self._create_users(15)
+        expected = {role.name: role.admin_users.filter(is_active=True).count() for role in AdminRole.objects.all()}
+
+        _, users = self._list(AdminUserViewSet)
+        nested = {role['name']: role['users_count'] for user in users for role in user['admin_roles']}
+        _, roles = self._list(AdminRoleViewSet)
+
+        self.assertEqual(nested, {name: count for name, count in expected.items() if name in nested})
+        self.assertEqual({role['name']: role['users_count'] for role in roles}, expected)
+
+
+@pytest.mark.integration
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TestAdminPermissionCache(TestCase):
+    """has_admin_permission resolves the permission mask once and tracks changes"""
+
+    def setUp(self):
+        cache.clear()
+        self.permissions = list(Permission.objects.all()[:6])
+        self.role = AdminRole.objects.create(name='moderator', name_en='moderator', role_type='content_moderator')
+        self.inactive_role = AdminRole.objects.create(
+            name='manager', name_en='manager', role_type='user_manager', is_active=False
+        )
+        self.role.permissions.set(self.permissions[:2])
+        self.inactive_role.permissions.set(self.permissions[2:4])
+        self.user = AdminUser.objects.create_user(username='checker', password='testpass123')
+        self.user.admin_roles.set([self.role, self.inactive_role])
+        self.user.user_permissions.add(self.permissions[5])
+
+    def _granted(self, user=None):
+        user = user or AdminUser.objects.get(pk=self.user.pk)
+        return {p.codename for p in self.permissions if user.has_admin_permission(p.codename)}
+
+    def _codenames(self, *indexes):
+        return {self.permissions[index].codename for index in indexes}
+
+    def test_checks_use_one_query_per_request_and_none_when_cached(self):
+        """Many checks cost one query once the registry is built, and none once the mask is cached"""
+        user = AdminUser.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(3):
+            # Cold registry: permissions and role grants, then the user's roles
+            self.assertEqual(self._granted(user), self._codenames(0, 1, 5))
+
+        other = AdminUser.objects.create_user(username='other', password='testpass123')
+        with self.captureOnCommitCallbacks(execute=True):
+            other.admin_roles.add(self.role)
+        other = AdminUser.objects.get(pk=other.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(self._granted(other), self._codenames(0, 1))
+
+        user = AdminUser.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(self._granted(user), self._codenames(0, 1, 5))
+
+    def test_multi_permission_checks(self):
+        """has_all / has_any agree with individual checks, unknown codenames never grant"""
+        user = AdminUser.objects.get(pk=self.user.pk)
+        granted, denied = self._codenames(0, 5), self._codenames(2)
+
+        self.assertTrue(user.has_all_admin_permissions(granted))
+        self.assertFalse(user.has_all_admin_permissions(granted | denied))
+        self.assertFalse(user.has_all_admin_permissions(['no_such_permission']))
+        self.assertTrue(user.has_all_admin_permissions([]))
+        self.assertTrue(user.has_any_admin_permission(denied | granted))
+        self.assertFalse(user.has_any_admin_permission(denied | {'no_such_permission'}))
+        self.assertFalse(user.has_admin_permission('no_such_permission'))
+
+    def test_batch_check_for_one_user(self):
+        """has_admin_permissions answers many codenames from the same cached mask"""
+        user = AdminUser.objects.get(pk=self.user.pk)
+        codenames = [p.codename for p in self.permissions] + ['no_such_permission']
+        user.has_admin_permission(codenames[0])
+
+        with self.assertNumQueries(0):
+            result = user.has_admin_permissions(codenames)
+        self.assertEqual(result, {codename: user.has_admin_permission(codename) for codename in codenames})
+        self.assertEqual({codename for codename, granted in result.items() if granted}, self._codenames(0, 1, 5))
+
+    def test_permission_map_for_many_users(self):
+        """One query checks a permission for every user of a queryset"""
+        users = []
+        for index in range(12):
+            user = AdminUser.objects.create_user(username=f'bulk{index}', password='testpass123')
+            if index % 2 == 0:
+                user.admin_roles.add(self.role)
+            if index % 3 == 0:
+                user.admin_roles.add(self.inactive_role)
+                user.user_permissions.add(self.permissions[2])
+            users.append(user)
+        queryset = AdminUser.objects.filter(username__startswith='bulk')
+        AdminUser.objects.get(pk=self.user.pk).has_admin_permission('warm_registry')
+
+        for index in (0, 2, 3):
+            codename = self.permissions[index].codename
+            with self.assertNumQueries(1):
+                granted = queryset.admin_permission_map(codename)
+            expected = {
+                user.pk: AdminUser.objects.get(pk=user.pk).has_admin_permission(codename) for user in users
+            }
+            self.assertEqual(granted, expected)
+
+        filtered = queryset.with_admin_permission(self.permissions[0].codename).filter(admin_permission_granted=True)
+        self.assertEqual(filtered.count(), 6)
+        self.assertFalse(any(queryset.admin_permission_map('no_such_permission').values()))
+
+    def test_role_changes_invalidate_cached_permissions(self):
+        """Activating a role or changing its permissions is visible immediately"""
+        self.assertEqual(self._granted(), self._codenames(0, 1, 5))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.inactive_role.is_active = True
+            self.inactive_role.save()
+        self.assertEqual(self._granted(), self._codenames(0, 1, 2, 3, 5))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.role.permissions.remove(self.permissions[0])
+        self.assertEqual(self._granted(), self._codenames(1, 2, 3, 5))
+
+    def test_user_changes_invalidate_cached_permissions(self):
+        """Changing a user's roles or direct permissions only drops that user's entry"""
+        self.assertEqual(self._granted(), self._codenames(0, 1, 5))
+        version = cache.get(VERSION_CACHE_KEY)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.admin_roles.remove(self.role)
+        self.assertEqual(self._granted(self.user), self._codenames(5))
+        self.assertEqual(self._granted(), self._codenames(5))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.user_permissions.clear()
+        self.assertEqual(self._granted(), set())
+        self.assertEqual(cache.get(VERSION_CACHE_KEY), version)
+
+    def test_unrelated_role_save_keeps_cache(self):
+        """Saving a role without toggling is_active does not bump the version"""
+        self._granted()
+        version = cache.get(VERSION_CACHE_KEY)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.role.description = 'updated'
+            self.role.save()
+        self.assertEqual(cache.get(VERSION_CACHE_KEY), version)
+
+
+@pytest.mark.integration
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TestSystemSettingsRegistry(TestCase):
+    """get_setting serves typed values from memory and reloads on version changes"""
+
+    def setUp(self):
+        cache.clear()
+        system_settings_registry.invalidate()
+        SystemSettings.objects.create(
+            key='upload_limits', name='upload limits', setting_type='json',
+            value='{"max_files": 5}', is_public=True
+        )
+        SystemSettings.objects.create(key='maintenance_mode', name='maintenance', setting_type='boolean', value='false')
+        SystemSettings.objects.create(
+            key='page_size', name='page size', setting_type='integer', value='', default_value='20'
+        )
+
+    def test_reads_are_typed_and_query_free(self):
+        """All settings load in one query, later reads are dictionary lookups"""
+        with self.assertNumQueries(1):
+            self.assertEqual(get_setting('upload_limits'), {'max_files': 5})
+            self.assertIs(get_setting('maintenance_mode', True), False)
+            self.assertEqual(get_setting('page_size'), 20)
+            self.assertEqual(get_setting('missing', 'fallback'), 'fallback')
+            for _ in range(100):
+                get_setting('upload_limits')
+
+        self.assertEqual(system_settings_registry.public_values(), {'upload_limits': {'max_files': 5}})
+
+    def test_save_and_delete_bump_version(self):
+        """Other processes see a change once they re-check the version"""
+        other_process = SystemSettingsRegistry(check_interval=0)
+        self.assertIs(other_process.get('maintenance_mode'), False)
+
+        setting = SystemSettings.objects.get(key='maintenance_mode')
+        setting.value = 'true'
+        with self.captureOnCommitCallbacks(execute=True):
+            setting.save()
+        self.assertIs(get_setting('maintenance_mode'), True)
+        self.assertIs(other_process.get('maintenance_mode'), True)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            setting.delete()
+        self.assertIsNone(get_setting('maintenance_mode'))
+        self.assertIsNone(other_process.get('maintenance_mode'))
+
+    def test_unchanged_version_does_not_reload(self):
+        """Re-checking an unchanged version costs no database query"""
+        registry = SystemSettingsRegistry(check_interval=0)
+        registry.get('page_size')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(registry.get('page_size'), 20)
+
+
+@pytest.mark.integration
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TestPublicSettingsEndpoint(TestCase):
+    """SystemSettingsViewSet.public serves cached JSON with ETag / 304"""
+
+    def setUp(self):
+        cache.clear()
+        system_settings_registry.invalidate()
+        self.factory = APIRequestFactory()
+        self.public = SystemSettings.objects.create(
+            key='site_name', name='site name', setting_type='string', value='نائبك', is_public=True
+        )
+        SystemSettings.objects.create(
+            key='theme', name='theme', setting_type='json', value='{"color": "#1a73e8"}', is_public=True
+        )
+        SystemSettings.objects.create(key='smtp_password', name='smtp', setting_type='string', value='hidden')
+
+    def _get(self, **headers):
+        request = self.factory.get('/system-settings/public/', **headers)
+        view = SystemSettingsViewSet.as_view({'get': 'public'}, **SystemSettingsViewSet.public.kwargs)
+        response = view(request)
+        return response
+
+    def test_response_matches_serializer_output(self):
+        response = self._get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        expected = SystemSettingsSerializer(SystemSettings.objects.filter(is_public=True), many=True).data
+        self.assertEqual(json.loads(response.content), json.loads(json.dumps(expected, default=str)))
+        self.assertNotIn(b'smtp_password', response.content)
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('max-age=', response['Cache-Control'])
+
+    def test_steady_state_costs_no_queries(self):
+        etag = self._get()['ETag']
+
+        with self.assertNumQueries(0):
+            response = self._get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], etag)
+
+        with self.assertNumQueries(0):
+            response = self._get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+    def test_setting_change_produces_new_etag(self):
+        etag = self._get()['ETag']
+
+        self.public.value = 'Naebak'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.public.save()
+
+        response = self._get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('Naebak', response.content.decode('utf-8'))
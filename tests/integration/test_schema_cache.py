@@ -0,0 +1,75 @@
+"""
+Cached OpenAPI schema view tests
+
+/api/schema/ is public: client-controlled query parameters must map onto a
+bounded set of cache keys so requests cannot grow the cache or force a
+regeneration per distinct value
+"""
+
+import pytest
+from django.test import TestCase, override_settings
+from django.urls import path
+from drf_spectacular.generators import SchemaGenerator
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+from unittest.mock import patch
+
+from config import schema as schema_module
+from config.schema import CachedSpectacularAPIView, clear_schema_cache
+
+
+class PingView(APIView):
+    """Minimal endpoint so the generated schema has a path"""
+
+    def get(self, request):
+        return Response({'ok': True})
+
+
+@pytest.mark.integration
+@override_settings(LANGUAGES=[('ar', 'Arabic'), ('en', 'English')], LANGUAGE_CODE='ar')
+class TestCachedSchemaView(TestCase):
+    """CachedSpectacularAPIView cache keys and bounds"""
+
+    def setUp(self):
+        clear_schema_cache()
+        self.addCleanup(clear_schema_cache)
+        self.factory = APIRequestFactory()
+        self.view = CachedSpectacularAPIView.as_view(patterns=[path('ping/', PingView.as_view())])
+
+    def get_schema(self, **params):
+        response = self.view(self.factory.get('/api/schema/', params))
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_unknown_languages_share_the_default_entry(self):
+        """Unsupported ?lang= values map onto LANGUAGE_CODE instead of adding entries"""
+        with patch.object(SchemaGenerator, 'get_schema', autospec=True,
+                          side_effect=SchemaGenerator.get_schema) as generate:
+            first = self.get_schema()
+            for index in range(1, 5):
+                self.assertEqual(self.get_schema(lang=f'zz{index}'), first)
+            self.get_schema(lang='ar')
+            self.get_schema(lang='en')
+            self.get_schema(lang='en-us')
+
+        # One generation for 'ar' (default and unknown values) and one for 'en'
+        self.assertEqual(generate.call_count, 2)
+        self.assertEqual(len(schema_module._schemas), 2)
+
+    def test_arbitrary_versions_are_not_cached(self):
+        """?version= outside ALLOWED_VERSIONS is served without a cache entry"""
+        self.get_schema()
+        for index in range(3):
+            self.get_schema(version=f'v{index}')
+
+        self.assertEqual(len(schema_module._schemas), 1)
+
+    def test_in_process_cache_is_bounded(self):
+        """The LRU evicts the oldest schema past MAX_ENTRIES"""
+        with patch.object(schema_module, '_schemas', schema_module.LRUCache(1)):
+            self.get_schema(lang='ar')
+            self.get_schema(lang='en')
+
+            self.assertEqual(len(schema_module._schemas), 1)
+            self.assertEqual(schema_module._schemas.stats()['evictions'], 1)
@@ -0,0 +1,155 @@
+"""
+Unit tests for the admin cache invalidation bus
+
+Messages are dispatched directly, so no Redis server is needed
+"""
+
+import json
+from unittest.mock import patch
+
+import pytest
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from apps.admin import invalidation_bus as bus_module
+from apps.admin.invalidation_bus import InvalidationBus, LocalVersion
+from apps.admin.models import SystemSettings
+from apps.admin.settings_registry import VERSION_CACHE_KEY, SystemSettingsRegistry
+
+
+class ConnectedBus(InvalidationBus):
+    """A bus whose subscription is reported as connected"""
+
+    def __init__(self):
+        super().__init__(url='')
+        self.connected = True
+
+    def is_healthy(self):
+        return self.connected
+
+
+def message(model, key=None, version=None):
+    return json.dumps({'model': model, 'key': key, 'version': version}).encode('utf-8')
+
+
+@pytest.mark.unit
+class TestInvalidationBusDispatch(TestCase):
+    """Messages reach the handlers registered for their model"""
+
+    def test_dispatch_calls_model_handlers(self):
+        bus = InvalidationBus(url='')
+        received = []
+        bus.subscribe('admin.systemsettings', lambda key, version: received.append((key, version)))
+        bus.subscribe('admin.adminrole', lambda key, version: received.append(('role', version)))
+
+        self.assertTrue(bus.dispatch(message('admin.systemsettings', 'site_name', 7)))
+        self.assertEqual(received, [('site_name', 7)])
+
+    def test_malformed_messages_and_failing_handlers_are_contained(self):
+        bus = InvalidationBus(url='')
+        received = []
+
+        def failing(key, version):
+            raise RuntimeError('boom')
+
+        bus.subscribe('admin.systemsettings', failing)
+        bus.subscribe('admin.systemsettings', lambda key, version: received.append(key))
+
+        self.assertFalse(bus.dispatch(b'not json'))
+        self.assertFalse(bus.dispatch(json.dumps({'key': 'x'})))
+        self.assertTrue(bus.dispatch(message('admin.systemsettings', 'x')))
+        self.assertEqual(received, ['x'])
+
+    def test_invalidate_all_notifies_every_model(self):
+        bus = InvalidationBus(url='')
+        received = []
+        bus.subscribe('admin.systemsettings', lambda key, version: received.append(('settings', key)))
+        bus.subscribe('auth.permission', lambda key, version: received.append(('permissions', key)))
+
+        bus.invalidate_all()
+        self.assertEqual(sorted(received), [('permissions', None), ('settings', None)])
+
+    def test_bus_without_url_is_disabled(self):
+        bus = InvalidationBus(url='')
+        self.assertFalse(bus.enabled)
+        self.assertFalse(bus.is_healthy())
+        bus.publish('admin.systemsettings', 'x', 1)
+
+    def test_bus_without_redis_package_is_disabled(self):
+        with patch.object(bus_module, 'redis', None):
+            self.assertFalse(InvalidationBus(url='redis://localhost:6379/0').enabled)
+
+
+@pytest.mark.unit
+class TestLocalVersion(TestCase):
+    """The local copy of a Redis version is only trusted while connected"""
+
+    def setUp(self):
+        self.bus = ConnectedBus()
+        self.version = LocalVersion(self.bus)
+        self.loads = []
+
+    def load(self, value):
+        def loader():
+            self.loads.append(value)
+            return value
+        return loader
+
+    def test_connected_bus_serves_local_copy(self):
+        self.assertEqual(self.version.get(self.load(5)), 5)
+        self.assertEqual(self.version.get(self.load(6)), 5)
+        self.assertEqual(self.loads, [5])
+
+        self.version.observe('role', 8)
+        self.assertEqual(self.version.get(self.load(9)), 8)
+        self.version.observe('role', 7)
+        self.assertEqual(self.version.get(self.load(9)), 8)
+
+    def test_disconnected_bus_always_loads(self):
+        self.bus.connected = False
+        self.version.get(self.load(5))
+        self.version.get(self.load(5))
+        self.assertEqual(self.loads, [5, 5])
+
+    def test_reset_during_load_is_not_overwritten(self):
+        def racing_load():
+            # A reconnect lands while the value is being read
+            self.version.observe(None, None)
+            return 3
+
+        self.assertEqual(self.version.get(racing_load), 3)
+        self.assertEqual(self.version.get(self.load(4)), 4)
+
+
+@pytest.mark.unit
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TestSettingsRegistryWithBus(TestCase):
+    """A connected bus lets the registry skip version checks until a message arrives"""
+
+    def setUp(self):
+        cache.clear()
+        self.bus = ConnectedBus()
+        self.setting = SystemSettings.objects.create(
+            key='site_name', name='site name', setting_type='string', value='نائبك'
+        )
+
+    def test_message_invalidates_long_lived_registry(self):
+        registry = SystemSettingsRegistry(check_interval=0, subscribed_check_interval=3600)
+        self.bus.subscribe('admin.systemsettings', registry.invalidate)
+
+        with patch('apps.admin.settings_registry.invalidation_bus', self.bus):
+            self.assertEqual(registry.get('site_name'), 'نائبك')
+
+            SystemSettings.objects.filter(pk=self.setting.pk).update(value='Naebak')
+            cache.incr(VERSION_CACHE_KEY)
+            with self.assertNumQueries(0):
+                self.assertEqual(registry.get('site_name'), 'نائبك')
+
+            self.bus.dispatch(message('admin.systemsettings', 'site_name'))
+            self.assertEqual(registry.get('site_name'), 'Naebak')
+
+            # Subscription dropped: back to polling the version
+            self.bus.connected = False
+            SystemSettings.objects.filter(pk=self.setting.pk).update(value='Naebak 2')
+            cache.incr(VERSION_CACHE_KEY)
+            self.assertEqual(registry.get('site_name'), 'Naebak 2')
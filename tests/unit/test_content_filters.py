@@ -0,0 +1,336 @@
+"""
+Unit tests for the AI content filter pipeline
+
+Compiled database filters, the verdict cache, batch filtering, lexicon
+matching and guarded regex evaluation
+"""
+
+import re
+import time
+import unittest
+
+import pytest
+from unittest.mock import patch
+from django.core.cache import cache
+from django.test import TestCase
+
+from app.ai_governance import filter_registry
+from app.ai_governance.filter_registry import (
+    SNAPSHOT_CACHE_KEY, VERSION_CACHE_KEY, ContentFilterRegistry, content_filter_registry
+)
+from app.ai_governance.filters import (
+    BiasDetectionFilter, ContentFilterManager, DatabaseContentFilter, FactCheckFilter, ProfanityFilter
+)
+from app.ai_governance.models import AIContentFilter
+from app.ai_governance.signals import publish_after_migrate
+from app.ai_governance.utils.safe_regex import (
+    CappedMatch, RegexTimeout, SafePattern, configure, regex_metrics, split_gaps, timeout_engine
+)
+from app.ai_governance.utils.text_index import Lexicon, TokenIndex, mask_spans
+from app.ai_governance.utils.verdict_cache import VerdictCache
+
+
+@pytest.mark.unit
+class TestProfanityMatching(TestCase):
+    """Test profanity lexicon matching"""
+
+    def setUp(self):
+        self.profanity_filter = ProfanityFilter()
+
+    def test_profanity_filter_respects_word_boundaries(self):
+        """Test lexicon matching on whole normalized tokens"""
+        is_allowed, modified_text, metadata = self.profanity_filter.filter_prompt("hello كلبي")
+        self.assertEqual(modified_text, "hello كلبي")
+        self.assertEqual(metadata['detected_words'], [])
+
+        # Diacritics and the definite article do not hide a word
+        is_allowed, modified_text, metadata = self.profanity_filter.filter_prompt("رأيت الكَلْب")
+        self.assertEqual(metadata['detected_words'], ['كلب'])
+        self.assertEqual(modified_text, "رأيت *******")
+
+
+@pytest.mark.unit
+class TestDatabaseContentFilter(TestCase):
+    """Test filters compiled from AIContentFilter rows"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_database_filter_masks_keywords_in_response(self):
+        """Test filter compiled from an AIContentFilter row"""
+        db_filter = DatabaseContentFilter({
+            'id': 7, 'name': 'Custom', 'filter_type': 'custom',
+            'keywords': ['bad phrase'], 'patterns': [r'code\d+', '(['],
+            'threshold': 0.5, 'modify_response': True,
+        })
+
+        is_allowed, modified_response, metadata = db_filter.filter_response("A Bad Phrase with code42")
+
+        self.assertTrue(is_allowed)
+        self.assertEqual(modified_response, "A ********** with code42")
+        self.assertEqual(metadata['custom_filter_7_matches'], ['bad phrase', r'code\d+'])
+        self.assertEqual(metadata['custom_filter_7_score'], 0.75)
+        self.assertTrue(metadata['flagged_for_review'])
+
+    def test_single_match_fires_at_default_threshold(self):
+        """Test one keyword or pattern hit triggers a filter with default settings"""
+        db_filter = DatabaseContentFilter({
+            'id': 8, 'name': 'Default', 'filter_type': 'safety',
+            'keywords': ['forbidden'], 'patterns': [r'secret\d+'], 'block_request': True,
+        })
+
+        for text in ("a forbidden word", "leaks secret42"):
+            is_allowed, filtered_text, metadata = db_filter.filter_prompt(text)
+            self.assertFalse(is_allowed)
+            self.assertEqual(metadata['safety_filter_8_score'], 0.5)
+            self.assertTrue(metadata['flagged_for_review'])
+
+        is_allowed, filtered_text, metadata = db_filter.filter_prompt("nothing to see")
+        self.assertTrue(is_allowed)
+        self.assertEqual(filtered_text, "nothing to see")
+
+        # A zero threshold still needs a match
+        zero = DatabaseContentFilter({'id': 9, 'name': 'Zero', 'filter_type': 'custom',
+                                      'keywords': ['forbidden'], 'threshold': 0.0, 'block_request': True})
+        self.assertTrue(zero.filter_prompt("nothing to see")[0])
+
+    def test_filter_rows_are_loaded_and_reloaded(self):
+        """Test database rows reach the manager and deactivation is picked up"""
+        with self.captureOnCommitCallbacks(execute=True):
+            content_filter = AIContentFilter.objects.create(
+                name='Test Custom Filter',
+                filter_type='custom',
+                description='Test filter',
+                keywords=['test_keyword', 'another_keyword'],
+                threshold=0.3,
+                block_request=True
+            )
+        content_filter_registry.invalidate()
+
+        filter_manager = ContentFilterManager()
+        is_allowed, filtered_text, metadata = filter_manager.filter_prompt("prompt with test_keyword inside")
+
+        self.assertFalse(is_allowed)
+        self.assertEqual(metadata[f'custom_filter_{content_filter.id}_matches'], ['test_keyword'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            content_filter.is_active = False
+            content_filter.save()
+        content_filter_registry.invalidate()
+
+        is_allowed, filtered_text, metadata = filter_manager.filter_prompt("prompt with test_keyword inside")
+        self.assertTrue(is_allowed)
+
+    def test_cold_cache_rebuilds_off_the_request_thread(self):
+        """Test a missing snapshot serves the current set and schedules one rebuild"""
+        registry = ContentFilterRegistry(check_interval=60, background_rebuild=True)
+
+        with patch.object(filter_registry, 'publish_snapshot') as publish, \
+                patch.object(ContentFilterRegistry, '_schedule_rebuild') as schedule:
+            self.assertEqual(registry.get_filters(), ())
+            self.assertEqual(registry.get_filters(), ())
+            publish.assert_not_called()
+            self.assertEqual(schedule.call_count, 1)
+        self.assertEqual(registry.version, '')
+
+        # The rebuild publishes the snapshot and the next call installs it
+        rule = {'id': 3, 'name': 'Rebuilt', 'filter_type': 'custom', 'keywords': ['forbidden'],
+                'patterns': [], 'threshold': 0.5, 'block_request': True, 'flag_for_review': False,
+                'modify_response': False, 'updated_at': ''}
+        snapshot = {'version': 'v1', 'rules': [rule]}
+        published = lambda: cache.set_many({SNAPSHOT_CACHE_KEY: snapshot, VERSION_CACHE_KEY: 'v1'})
+        with patch.object(filter_registry, 'publish_snapshot', side_effect=published), \
+                patch('django.db.connection.close'):
+            registry._rebuild()
+
+        self.assertEqual([f.rule_id for f in registry.get_filters()], [3])
+        self.assertEqual(registry.version, 'v1')
+
+    def test_failed_first_load_is_rate_limited(self):
+        """Test a failing first load is retried once per check interval, not per request"""
+        registry = ContentFilterRegistry(check_interval=60, background_rebuild=False)
+
+        with patch.object(filter_registry, 'publish_snapshot', side_effect=RuntimeError('db down')) as publish, \
+                self.assertLogs('ai_governance', level='ERROR'):
+            self.assertEqual(registry.get_filters(), ())
+            self.assertEqual(registry.get_filters(), ())
+
+        self.assertEqual(publish.call_count, 1)
+        self.assertEqual(registry.version, '')
+
+    def test_snapshot_is_published_after_migrate(self):
+        """Test post_migrate warms the cache so workers start without a rebuild"""
+        with self.captureOnCommitCallbacks(execute=True):
+            content_filter = AIContentFilter.objects.create(name='Warm', filter_type='custom', keywords=['x'])
+        cache.clear()
+
+        publish_after_migrate(sender=None)
+
+        self.assertEqual([rule['id'] for rule in cache.get(SNAPSHOT_CACHE_KEY)['rules']], [content_filter.id])
+
+
+@pytest.mark.unit
+class TestFilterManager(TestCase):
+    """Test verdict memoization and batch filtering"""
+
+    def setUp(self):
+        self.profanity_filter = ProfanityFilter()
+        self.manager = ContentFilterManager()
+        self.manager.filters = [self.profanity_filter]
+        self.manager.verdict_cache = VerdictCache(max_entries=2)
+
+    def test_filter_manager_memoizes_repeated_content(self):
+        """Test that identical content is served from the verdict cache"""
+        with patch.object(self.profanity_filter, '_calculate_profanity_score',
+                          wraps=self.profanity_filter._calculate_profanity_score) as mock_score:
+            first = self.manager.filter_prompt("هذا النص يحتوي على كلمة حمار")
+            second = self.manager.filter_prompt("هذا النص يحتوي على كلمة حمار")
+
+            self.assertEqual(mock_score.call_count, 1)
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.manager.verdict_cache.stats()['hits'], 1)
+
+        # Bounded: older verdicts are evicted
+        self.manager.filter_prompt("نص أول")
+        self.manager.filter_prompt("نص ثان")
+        self.assertEqual(len(self.manager.verdict_cache.local), 2)
+        self.assertEqual(self.manager.verdict_cache.stats()['evictions'], 1)
+
+    def test_filter_manager_returns_the_callers_text(self):
+        """Test normalization only affects the cache key, never the returned text"""
+        clean = "  نص نظيف\r\nبسطرين  "
+        is_allowed, filtered_text, metadata = self.manager.filter_prompt(clean)
+        self.assertEqual(filtered_text, clean)
+
+        # A differently formatted copy shares the verdict and keeps its own formatting
+        with patch.object(self.profanity_filter, '_calculate_profanity_score') as mock_score:
+            is_allowed, filtered_text, metadata = self.manager.filter_prompt("نص نظيف\nبسطرين")
+            self.assertEqual(mock_score.call_count, 0)
+        self.assertEqual(filtered_text, "نص نظيف\nبسطرين")
+
+        # Rewritten text is only reused for the exact same input
+        masked = self.manager.filter_prompt("كلمة حمار\r\n")
+        self.assertEqual(masked[1], "كلمة ****\r\n")
+        self.assertEqual(self.manager.filter_prompt("  كلمة حمار")[1], "  كلمة ****")
+        self.assertEqual(self.manager.filter_prompt("كلمة حمار\r\n"), masked)
+
+    def test_filter_many(self):
+        """Test batch filtering returns one verdict per text in order"""
+        self.manager.verdict_cache = VerdictCache()
+
+        texts = ["نص نظيف", "هذا النص يحتوي على كلمة حمار", "نص نظيف"]
+        results = self.manager.filter_many(texts, kind='prompt')
+
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0], self.manager.filter_prompt("نص نظيف"))
+        self.assertEqual(results[1], self.manager.filter_prompt(texts[1]))
+        self.assertEqual(results[0], results[2])
+
+
+@pytest.mark.unit
+class TestTextIndex(TestCase):
+    """Test token index and lexicon matching"""
+
+    def test_phrase_matching_and_masking(self):
+        """Test phrases match token sequences and spans map to the original text"""
+        lexicon = Lexicon(['bad phrase', 'كلب'])
+        index = TokenIndex("A BAD  phrase, a badphrase and والكلب")
+
+        self.assertEqual(lexicon.find(index), ['bad phrase', 'كلب'])
+        self.assertEqual(lexicon.count(index), [('bad phrase', 1), ('كلب', 1)])
+        self.assertEqual(
+            mask_spans(index.text, lexicon.spans(index)),
+            "A ***********, a badphrase and ******"
+        )
+
+    def test_diacritics_keep_original_offsets(self):
+        """Test masking when normalization removes characters"""
+        lexicon = Lexicon(['حمار'])
+        index = TokenIndex("يا حِمَار!")
+
+        self.assertFalse(index.aligned)
+        self.assertEqual(mask_spans(index.text, lexicon.spans(index)), "يا ******!")
+
+    def test_index_results_are_per_lexicon(self):
+        """Test a lexicon never reads results another lexicon left on the index"""
+        index = TokenIndex("damn it")
+
+        # The first lexicon is dropped right away, so a new one could take over its id()
+        for _ in range(20):
+            self.assertEqual(Lexicon(['damn']).find(index), ['damn'])
+            self.assertEqual(Lexicon(['hell']).find(index), [])
+
+
+@pytest.mark.unit
+class TestSafeRegex(TestCase):
+    """Test guarded evaluation of governance patterns"""
+
+    def test_gap_pattern_matches_like_stdlib(self):
+        """Test split gap patterns agree with re on matches and line breaks"""
+        pattern = r'\b(أثبتت الدراسات)\b.*\b(مؤكد تماماً)\b'
+        safe = SafePattern(pattern)
+
+        self.assertEqual(len(split_gaps(pattern)), 2)
+        self.assertEqual(split_gaps(r'a|b.*c'), [r'a|b.*c'])
+        for text in ["أثبتت الدراسات أن هذا مؤكد تماماً",
+                     "أثبتت الدراسات\nمؤكد تماماً",
+                     "x " * 300 + "أثبتت الدراسات ثم\nأثبتت الدراسات مؤكد تماماً"]:
+            self.assertEqual(safe.search(text) is not None, re.search(pattern, text, re.IGNORECASE) is not None)
+
+    def test_adversarial_input_is_bounded(self):
+        """Test a gap pattern stays fast on input that makes re backtrack quadratically"""
+        text = 'أثبتت الدراسات ' * 20000
+        started = time.perf_counter()
+        score, detected = FactCheckFilter()._check_suspicious_content(text)
+
+        self.assertLess(time.perf_counter() - started, 1.0)
+        self.assertEqual(detected, [])
+
+    def test_over_cap_input_fails_closed(self):
+        """Test input over the cap counts as a match unless its scanned prefix matches"""
+        limits = configure()
+        saved = limits.max_input_chars
+        configure(max_input_chars=100)
+        regex_metrics.reset()
+        try:
+            safe = SafePattern(r'secret\d+')
+            with self.assertLogs('ai_governance', level='WARNING'):
+                match = safe.search('x' * 200 + ' secret42')
+            self.assertIsInstance(match, CappedMatch)
+            self.assertEqual(match.span(), (100, 100))
+
+            match = safe.search('secret1 ' + 'x' * 200)
+            self.assertEqual(match.group(), 'secret1')
+            self.assertIsNone(safe.search('x' * 100))
+            self.assertEqual(safe.findall('secret1 ' + 'x' * 200), ['secret1'])
+            self.assertEqual(regex_metrics.stats()['truncated_inputs'], 3)
+        finally:
+            configure(max_input_chars=saved)
+            regex_metrics.reset()
+
+    @unittest.skipIf(timeout_engine is None, "the regex package provides the timeout")
+    def test_timeout_fails_closed(self):
+        """Test a pattern that runs out of its budget counts as a match"""
+        limits = configure()
+        saved = limits.time_budget
+        configure(time_budget=0.01)
+        regex_metrics.reset()
+        try:
+            safe = SafePattern(r'(a|aa)+c')
+            text = 'a' * 40
+
+            with self.assertLogs('ai_governance', level='WARNING'):
+                self.assertIsInstance(safe.search(text), CappedMatch)
+            with self.assertRaises(RegexTimeout):
+                safe.findall(text)
+            self.assertEqual(regex_metrics.stats()['timeouts'], 2)
+
+            bias_filter = BiasDetectionFilter()
+            bias_filter._compiled_bias_patterns = {'test_bias': [safe]}
+            score, detected = bias_filter._detect_bias(text)
+            self.assertEqual(detected, {'test_bias': [r'(a|aa)+c']})
+            self.assertGreater(score, 0)
+        finally:
+            configure(time_budget=saved)
+            regex_metrics.reset()
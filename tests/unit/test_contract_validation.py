@@ -0,0 +1,120 @@
+"""
+Unit tests for scripts/contract_validation.py
+
+Operation index digests and the baseline used by the compatibility check
+"""
+
+import copy
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'scripts'))
+
+import contract_validation  # noqa: E402
+from contract_validation import ContractValidator, diff_operation, index_spec  # noqa: E402
+
+
+SPEC = {
+    'openapi': '3.0.3',
+    'info': {'title': 'Test', 'version': '1.0.0'},
+    'paths': {
+        '/users/{id}/': {
+            'get': {
+                'summary': 'Get a user',
+                'parameters': [{'in': 'path', 'name': 'id', 'required': True,
+                                'description': 'User id', 'schema': {'type': 'integer'}}],
+                'responses': {
+                    '200': {'description': 'The user',
+                            'content': {'application/json': {'schema': {'$ref': '#/components/schemas/User'}}}},
+                    '404': {'$ref': '#/components/responses/NotFound'},
+                },
+            },
+        },
+    },
+    'components': {
+        'schemas': {
+            'User': {
+                'type': 'object',
+                'description': 'A platform user',
+                'properties': {
+                    'name': {'type': 'string', 'description': 'Full name'},
+                    'description': {'type': 'string'},
+                },
+            },
+        },
+        'responses': {
+            'NotFound': {'description': 'Not found',
+                         'content': {'application/json': {'schema': {'type': 'object'}}}},
+        },
+    },
+}
+OPERATION = 'GET /users/{id}/'
+
+
+def breaking(old_spec, new_spec):
+    """Breaking changes of the operation between two specs"""
+    return diff_operation(OPERATION, index_spec(old_spec)[OPERATION], index_spec(new_spec)[OPERATION])
+
+
+@pytest.mark.unit
+class TestOperationIndex:
+    """Test which edits change the operation digests"""
+
+    def test_documentation_edits_keep_the_digests(self):
+        """Test description and summary edits at any level are not reported"""
+        edited = copy.deepcopy(SPEC)
+        operation = edited['paths']['/users/{id}/']['get']
+        operation['summary'] = 'Fetch a user'
+        operation['parameters'][0]['description'] = 'Numeric user id'
+        operation['responses']['200']['description'] = 'The requested user'
+        edited['components']['schemas']['User']['description'] = 'Someone using the platform'
+        edited['components']['schemas']['User']['properties']['name']['description'] = 'Display name'
+        edited['components']['responses']['NotFound']['description'] = 'No such user'
+
+        assert index_spec(edited) == index_spec(SPEC)
+
+    def test_response_schema_changes_are_reported(self):
+        """Test a schema change behind a $ref, including a field named description, is breaking"""
+        removed = copy.deepcopy(SPEC)
+        del removed['components']['schemas']['User']['properties']['description']
+        assert breaking(SPEC, removed) == [f"{OPERATION}: تغير مخطط الاستجابة 200"]
+
+        retyped = copy.deepcopy(SPEC)
+        retyped['components']['responses']['NotFound']['content']['application/json']['schema'] = {'type': 'string'}
+        assert breaking(SPEC, retyped) == [f"{OPERATION}: تغير مخطط الاستجابة 404"]
+
+
+@pytest.mark.unit
+class TestBaseline:
+    """Test the git ref the current schema is compared with"""
+
+    def setup_method(self):
+        self.validator = ContractValidator(use_cache=False)
+
+    def test_default_baseline_is_the_merge_base(self, monkeypatch):
+        """Test the default ref is the merge-base with the pull request target branch"""
+        monkeypatch.setenv('GITHUB_BASE_REF', 'develop')
+        merge_base = subprocess.CompletedProcess([], 0, stdout='abc123\n')
+        with patch.object(contract_validation.subprocess, 'run', return_value=merge_base) as run:
+            assert self.validator._resolve_baseline_ref() == 'abc123'
+        assert run.call_args[0][0] == ['git', 'merge-base', 'HEAD', 'origin/develop']
+
+        assert ContractValidator(baseline_ref='')._resolve_baseline_ref() is None
+        assert ContractValidator(baseline_ref='v1.2')._resolve_baseline_ref() == 'v1.2'
+
+    def test_unchanged_schema_checks_every_operation(self):
+        """Test a baseline identical to the current schema gives no index to skip operations with"""
+        content = b'openapi: 3.0.3\n'
+        shown = subprocess.CompletedProcess([], 0, stdout=content)
+        with patch.object(self.validator, '_resolve_baseline_ref', return_value='HEAD'), \
+                patch.object(contract_validation.subprocess, 'run', return_value=shown):
+            assert self.validator._baseline_index(content) is None
+
+        # Without a baseline even unchanged operations are checked
+        index = index_spec(SPEC)
+        del index[OPERATION]['responses']['200']
+        assert self.validator._detect_breaking_changes(index, None) == [f"{OPERATION}: لا يوجد response ناجح"]
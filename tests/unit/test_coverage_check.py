@@ -0,0 +1,326 @@
+"""
+Unit tests for scripts/coverage_check.py
+
+Shard balancing, test collection, the stored test durations and the
+impact mode (diff parsing, line remapping, the test impact map and the
+combined coverage report)
+"""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'scripts'))
+
+import coverage_check  # noqa: E402
+from coverage_check import (  # noqa: E402
+    FileChange, balance_shards, collapse_to_files, parse_collected, parse_diff
+)
+
+coverage = pytest.importorskip('coverage')
+
+
+@pytest.mark.unit
+class TestShardBalancing:
+    """Test LPT distribution of tests over shards"""
+
+    def test_longest_tests_go_to_the_least_loaded_shard(self):
+        """Test each test, longest first, joins the shard with the smallest total"""
+        durations = {'t::a': 5.0, 't::b': 4.0, 't::c': 3.0, 't::d': 3.0, 't::e': 2.0}
+
+        groups = balance_shards(list(durations), durations, 2)
+
+        # a(5) -> 0, b(4) -> 1, c(3) -> 1 (4 < 5), d(3) -> 0 (5 < 7), e(2) -> 1 (7 < 8)
+        assert groups == [['t::a', 't::d'], ['t::b', 't::c', 't::e']]
+        assert [sum(durations[nodeid] for nodeid in group) for group in groups] == [8.0, 9.0]
+
+    def test_unknown_tests_take_the_mean_duration(self):
+        """Test tests without history are weighted by the mean of the known durations"""
+        durations = {'t::a': 4.0, 't::b': 2.0}
+
+        groups = balance_shards(['t::new', 't::a', 't::b'], durations, 2)
+
+        # new counts as 3.0: a(4) -> 0, new(3) -> 1, b(2) -> 1
+        assert groups == [['t::a'], ['t::new', 't::b']]
+
+    def test_empty_shards_are_dropped(self):
+        """Test more shards than tests gives one group per test"""
+        assert balance_shards(['t::a', 't::b'], {}, 4) == [['t::a'], ['t::b']]
+
+    def test_complete_files_collapse_to_their_path(self):
+        """Test a shard holding every test of a file runs the file instead"""
+        nodeids = ['tests/a.py::test_1', 'tests/b.py::test_1', 'tests/a.py::test_2']
+        tests_per_file = {'tests/a.py': 2, 'tests/b.py': 3}
+
+        assert collapse_to_files(nodeids, tests_per_file) == ['tests/a.py', 'tests/b.py::test_1']
+
+
+@pytest.mark.unit
+class TestCollection:
+    """Test node id collection for the sharded run"""
+
+    OUTPUT = (
+        "tests/unit/test_a.py::TestA::test_one\n"
+        "tests/unit/test_a.py::test_param[a b]\n"
+        "tests/unit/test_a.py::test_param[c]\n"
+        "\n"
+        "=============================== warnings summary ===============================\n"
+        "tests/unit/test_a.py::TestA::test_one\n"
+        "  DeprecationWarning: old api\n"
+        "\n"
+        "3 tests collected in 0.01s\n"
+    )
+
+    def test_parse_collected_keeps_parametrized_ids_with_spaces(self):
+        """Test ids are read up to the summary, including ids containing spaces"""
+        assert parse_collected(self.OUTPUT) == [
+            'tests/unit/test_a.py::TestA::test_one',
+            'tests/unit/test_a.py::test_param[a b]',
+            'tests/unit/test_a.py::test_param[c]',
+        ]
+
+    def test_failed_collection_falls_back_to_a_single_run(self):
+        """Test a collection error runs the unsharded check instead of a partial one"""
+        checker = coverage_check.CoverageChecker(shards=4)
+        failed = subprocess.CompletedProcess([], 2, stdout="ERROR tests/unit/test_b.py\n" + self.OUTPUT)
+        finished = subprocess.CompletedProcess([], 0, stdout='')
+
+        with patch.object(coverage_check, 'coverage', object()), \
+                patch.object(coverage_check.subprocess, 'run', return_value=failed), \
+                patch.object(checker, '_run_pytest', return_value=finished) as run_pytest, \
+                patch.object(checker, '_evaluate_report', return_value=True), \
+                patch.object(checker, '_run_shard') as run_shard:
+            assert checker.check_coverage() is True
+
+        run_shard.assert_not_called()
+        assert run_pytest.call_args[0][0][-1] == 'tests/'
+
+
+@pytest.mark.unit
+class TestStoredDurations:
+    """Test durations merged from --durations=0 output"""
+
+    def test_update_sums_phases_keeps_history_and_drops_removed_tests(self, tmp_path):
+        """Test measured tests are replaced, unmeasured ones kept and deleted ones removed"""
+        path = tmp_path / 'durations.json'
+        path.write_text(json.dumps({'t.py::kept': 1.5, 't.py::old': 9.0, 't.py::gone': 2.0}))
+        durations = coverage_check.TestDurations(path)
+
+        outputs = [
+            "0.10s setup    t.py::old\n0.50s call     t.py::old\n0.05s teardown t.py::old\n",
+            "0.20s call     t.py::new\nsome other line\n",
+        ]
+        durations.update(outputs, ['t.py::kept', 't.py::old', 't.py::new'])
+
+        expected = {'t.py::kept': 1.5, 't.py::old': 0.65, 't.py::new': 0.2}
+        assert durations.durations == expected
+        assert json.loads(path.read_text()) == expected
+
+    def test_unreadable_file_starts_empty(self, tmp_path):
+        """Test a missing or corrupt durations file is treated as no history"""
+        path = tmp_path / 'durations.json'
+        path.write_text('{not json')
+
+        assert coverage_check.TestDurations(path).durations == {}
+        assert coverage_check.TestDurations(tmp_path / 'missing.json').durations == {}
+
+
+DIFF = """\
+diff --git a/app/mod.py b/app/mod.py
+index 1111111..2222222 100644
+--- a/app/mod.py
++++ b/app/mod.py
+@@ -2,0 +3,2 @@ b = 2
++c = 3
++d = 4
+@@ -5 +7 @@ f = 6
+-g = 7
++g = 70
+diff --git a/app/new.py b/app/new.py
+new file mode 100644
+--- /dev/null
++++ b/app/new.py
+@@ -0,0 +1 @@
++x = 1
+diff --git a/app/gone.py b/app/gone.py
+deleted file mode 100644
+--- a/app/gone.py
++++ /dev/null
+@@ -1,2 +0,0 @@
+-y = 1
+-z = 2
+"""
+
+OLD_SOURCE = "a = 1\nb = 2\ne = 5\nf = 6\ng = 7\nh = 8\n"
+NEW_SOURCE = "a = 1\nb = 2\nc = 3\nd = 4\ne = 5\nf = 6\ng = 70\nh = 8\n"
+
+
+@pytest.mark.unit
+class TestDiffRemapping:
+    """Test git diff -U0 parsing and line remapping of the recorded run"""
+
+    def test_parse_diff(self):
+        """Test paths, added and deleted files and hunks without counts"""
+        changes = parse_diff(DIFF)
+
+        assert [(change.old_path, change.new_path) for change in changes] == [
+            ('app/mod.py', 'app/mod.py'), (None, 'app/new.py'), ('app/gone.py', None),
+        ]
+        assert changes[0].hunks == [(2, 0, 3, 2), (5, 1, 7, 1)]
+        assert changes[1].hunks == [(0, 0, 1, 1)]
+        assert changes[2].hunks == [(1, 2, 0, 0)]
+        # Pure insertions mark their neighbours, modifications their own lines
+        assert changes[0].changed_old_lines() == {2, 3, 5}
+
+    def test_remap_line_across_insertions_and_deletions(self):
+        """Test lines shift by the hunks before them and changed lines map to None"""
+        change = parse_diff(DIFF)[0]
+        assert [change.remap_line(line) for line in range(1, 7)] == [1, 2, 5, 6, None, 8]
+
+        deletion = FileChange('app/m.py', 'app/m.py', hunks=[(2, 2, 1, 0), (6, 0, 5, 1)])
+        assert [deletion.remap_line(line) for line in range(1, 8)] == [1, None, None, 2, 3, 4, 6]
+
+    def test_remap_arc_ends_keep_entry_and_exit_signs(self):
+        """Test negative arc ends (code object entry/exit) are remapped by their absolute line"""
+        change = parse_diff(DIFF)[0]
+        remap = coverage_check.CoverageChecker._remap_arc_end
+
+        assert [remap(change, line) for line in (-1, 3, -4, -6, 5)] == [-1, 5, -6, -8, None]
+
+
+@pytest.mark.unit
+class TestImpactMapQueries:
+    """Test tests selected from the recorded line contexts"""
+
+    def record(self, tmp_path):
+        module = str(tmp_path / 'app' / 'mod.py')
+        data = coverage.CoverageData(no_disk=True)
+        data.set_context('')
+        data.add_lines({module: [1, 10]})
+        data.set_context('tests/test_a.py::test_one|run')
+        data.add_lines({module: [2, 3]})
+        data.set_context('tests/test_a.py::test_two|setup')
+        data.add_lines({module: [3, 4]})
+        data.set_context('tests/test_b.py::test_other|run')
+        data.add_lines({str(tmp_path / 'app' / 'other.py'): [1]})
+
+        impact_map = coverage_check.TestImpactMap(tmp_path / 'impact.sqlite3')
+        impact_map.record(data, tmp_path, 'abc123')
+        return impact_map
+
+    def test_tests_for_changed_lines(self, tmp_path):
+        """Test only the tests executing the lines are returned, in batches"""
+        impact_map = self.record(tmp_path)
+
+        assert impact_map.commit == 'abc123'
+        assert impact_map.tests_for('app/mod.py', {2}) == {'tests/test_a.py::test_one'}
+        with patch.object(coverage_check.TestImpactMap, 'QUERY_BATCH', 1):
+            assert impact_map.tests_for('app/mod.py', {2, 4, 99}) == {
+                'tests/test_a.py::test_one', 'tests/test_a.py::test_two'
+            }
+        assert impact_map.tests_for('app/mod.py', {99}) == set()
+
+    def test_import_time_lines_select_every_test_of_the_file(self, tmp_path):
+        """Test a line run at import time widens the selection to the whole file"""
+        impact_map = self.record(tmp_path)
+
+        assert impact_map.tests_for('app/mod.py', {10}) == {
+            'tests/test_a.py::test_one', 'tests/test_a.py::test_two'
+        }
+
+
+@pytest.mark.unit
+class TestCombinedReport:
+    """Test the recorded full run merged with the impact run"""
+
+    def checker(self, tmp_path, monkeypatch):
+        (tmp_path / 'app').mkdir()
+        (tmp_path / 'app' / 'mod.py').write_text(NEW_SOURCE)
+        (tmp_path / 'app' / 'other.py').write_text("o = 1\np = 2\n")
+        monkeypatch.setattr(coverage_check, 'BASELINE_DATA', tmp_path / 'coverage.baseline')
+        monkeypatch.setattr(coverage_check, 'COMBINED_DATA', tmp_path / 'coverage.combined')
+        checker = coverage_check.CoverageChecker()
+        checker.project_root = tmp_path
+        return checker
+
+    def read_combined(self, tmp_path, arcs=False):
+        data = coverage.CoverageData(basename=str(tmp_path / 'coverage.combined'))
+        data.read()
+        files = {Path(path).relative_to(tmp_path).as_posix(): path for path in data.measured_files()}
+        if arcs:
+            return {name: sorted(data.arcs(path)) for name, path in files.items()}
+        return {name: sorted(data.lines(path)) for name, path in files.items()}
+
+    def test_lines_are_remapped_and_merged_with_the_impact_run(self, tmp_path, monkeypatch):
+        """Test shifted baseline lines, changed lines from the impact run and deleted files"""
+        checker = self.checker(tmp_path, monkeypatch)
+        root = tmp_path.resolve()
+        baseline = coverage.CoverageData(basename=str(tmp_path / 'coverage.baseline'))
+        baseline.add_lines({str(root / 'app' / 'mod.py'): [1, 2, 3, 4, 5, 6],
+                            str(root / 'app' / 'other.py'): [1, 2],
+                            str(root / 'app' / 'gone.py'): [1, 2]})
+        baseline.write()
+        impact = coverage.CoverageData(basename=str(tmp_path / 'coverage.impact'))
+        impact.add_lines({str(root / 'app' / 'mod.py'): [3, 7]})
+        impact.write()
+
+        checker._write_combined_report(parse_diff(DIFF), tmp_path / 'coverage.impact')
+
+        # A purged file keeps an empty entry and is left out of the report
+        assert self.read_combined(tmp_path) == {
+            'app/mod.py': [1, 2, 3, 5, 6, 7, 8],
+            'app/other.py': [1, 2],
+            'app/gone.py': [],
+        }
+        report = json.loads((tmp_path / 'coverage.json').read_text())
+        files = {Path(path).resolve().relative_to(tmp_path.resolve()).as_posix(): summary
+                 for path, summary in report['files'].items()}
+        assert sorted(files) == ['app/mod.py', 'app/other.py']
+        assert files['app/mod.py']['missing_lines'] == [4]
+        assert files['app/other.py']['summary']['percent_covered'] == 100.0
+
+    def test_arcs_are_remapped(self, tmp_path, monkeypatch):
+        """Test arcs touching a changed line are dropped and the rest shifted"""
+        checker = self.checker(tmp_path, monkeypatch)
+        module = str(tmp_path.resolve() / 'app' / 'mod.py')
+        baseline = coverage.CoverageData(basename=str(tmp_path / 'coverage.baseline'))
+        baseline.add_arcs({module: [(-1, 1), (1, 2), (2, 3), (3, 4), (4, 5), (5, 6), (6, -1)]})
+        baseline.write()
+
+        checker._write_combined_report(parse_diff(DIFF)[:1], None)
+
+        assert self.read_combined(tmp_path, arcs=True) == {
+            'app/mod.py': [(-1, 1), (1, 2), (2, 5), (5, 6), (8, -1)],
+        }
+
+
+@pytest.mark.unit
+class TestQualityCheck:
+    """Test the test-file quality step that main() runs after coverage"""
+
+    def checker(self, tmp_path, source):
+        (tmp_path / 'tests').mkdir()
+        (tmp_path / 'tests' / 'test_sample.py').write_text(source)
+        checker = coverage_check.CoverageChecker()
+        checker.project_root = tmp_path
+        return checker
+
+    def test_good_test_file_passes(self, tmp_path):
+        """Test a file with enough assertions passes"""
+        checker = self.checker(tmp_path, "def test_a():\n    assert 1 + 1 == 2\n    assert 2 * 2 == 4\n")
+
+        assert checker.check_test_quality() is True
+
+    def test_fake_tests_are_reported(self, tmp_path):
+        """Test placeholder tests and missing assertions are reported per file"""
+        checker = self.checker(tmp_path, "def test_a():\n    assert True\n\ndef test_b():\n    pass\n")
+
+        issues = checker._check_test_file_quality(tmp_path / 'tests' / 'test_sample.py')
+
+        assert "اختبار وهمي محتمل: assert True" in issues
+        assert "عدد assertions قليل نسبة للاختبارات" in issues
+        assert checker.check_test_quality() is False